@@ -0,0 +1,67 @@
+"""
+Measures crossovers per second of Genome and ArrayGenome for genomes of realistic sizes.
+Run from repository root: python -m benchmarks.crossoverbenchmark
+"""
+import random
+import timeit
+
+from evolution.arraygenome import ArrayGenome
+from evolution.genome import Genome
+
+# (input size, output size): XOR-like and Tetris-sized genomes
+SIZES = ((8, 4), (220, 4))
+# genes added to every parent on top of the common ones, so parents have disjoint and excess genes
+OWN_GENES = 10
+
+
+def create_parents(input_size, output_size):
+    """
+    Returns two fully connected genomes with the same common genes, different weights and a few own genes.
+    """
+    pairs = [(s, d) for s in range(1, input_size + 1) for d in range(input_size + 1, input_size + output_size + 1)]
+    common = [[source, destination, random.normalvariate(mu=0.0, sigma=1.0), True, innovation]
+              for innovation, (source, destination) in enumerate(pairs)]
+    innovation = len(common)
+    node_id = input_size + output_size
+
+    parents = []
+    for i in range(2):
+        connections = [[s, d, w + random.normalvariate(mu=0.0, sigma=0.1), e, innov] for s, d, w, e, innov in common]
+        for connection in random.sample(connections, OWN_GENES // 2):
+            node_id += 1
+            connection[3] = False
+            connections.append([connection[0], node_id, 1.0, True, innovation])
+            connections.append([node_id, connection[1], connection[2], True, innovation + 1])
+            innovation += 2
+        parents.append(connections)
+    return parents
+
+
+def measure(genome_class, connections1, connections2, input_size, output_size, repeats):
+    """
+    Returns crossovers per second for equally and differently fit parents.
+    """
+    parent1 = genome_class(connections1, input_size, output_size)
+    parent2 = genome_class(connections2, input_size, output_size)
+    results = []
+    for fitness1, fitness2 in ((1.0, 1.0), (2.0, 1.0)):
+        parent1.fitness, parent2.fitness = fitness1, fitness2
+        seconds = min(timeit.repeat(lambda: genome_class.reproduce(parent1, parent2), number=repeats, repeat=3))
+        results.append(repeats / seconds)
+    return results
+
+
+def main():
+    random.seed(0)
+    print("{:>6} {:>14} {:>14} {:>14} {:>14}".format('genes', 'Genome equal', 'Genome fitter',
+                                                      'Array equal', 'Array fitter'))
+    for input_size, output_size in SIZES:
+        connections1, connections2 = create_parents(input_size, output_size)
+        repeats = max(20, 20000 // len(connections1))
+        results = (measure(Genome, connections1, connections2, input_size, output_size, repeats) +
+                   measure(ArrayGenome, connections1, connections2, input_size, output_size, repeats))
+        print("{:>6} {:>14.0f} {:>14.0f} {:>14.0f} {:>14.0f}".format(len(connections1), *results))
+
+
+if __name__ == '__main__':
+    main()
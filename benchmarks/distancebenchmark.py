@@ -0,0 +1,152 @@
+"""
+Measures compatibility distance computations and compatibility checks per second of Genome for 500-gene genomes and
+time of computing distance matrices of whole populations. Distances per second are compared to the former computation by
+three separate counting helpers, the one with nested loop over both genomes.
+Run from repository root: python -m benchmarks.distancebenchmark
+"""
+import random
+import time
+import timeit
+
+from evolution.distance import compatibility_distances
+from evolution.genome import Genome
+
+# 100 inputs and 5 outputs give 500 connections
+INPUT_SIZE, OUTPUT_SIZE = 100, 5
+# structural mutations applied to every genome, so genomes have disjoint and excess genes
+SPLITS = 10
+COEFFICIENTS = dict(excess_factor=2.0, disjoint_factor=2.0, weight_difference_factor=1.0)
+# the last one is the default compatibility threshold of Generation
+THRESHOLDS = (1.0, 3.0, 6.0)
+POPULATION_SIZES = (150, 1000)
+# rows of the pairwise matrix computed one by one, time of the rest is extrapolated
+PAIRWISE_ROWS = 100
+MUTATION_COEFFICIENTS = dict(add_connection=0.3, split_connection=0.3, change_weight=1.0,
+                             new_connection_abs_max_weight=1.0, max_weight_mutation=1.0)
+
+
+def create_genomes():
+    """
+    Returns two genomes with the same 500 common genes with different weights and a few own genes.
+    """
+    connections = [[s, d, random.normalvariate(mu=0.0, sigma=1.0), True, 2 * innovation]
+                   for innovation, (s, d) in enumerate((s, d) for s in range(1, INPUT_SIZE + 1)
+                                                        for d in range(INPUT_SIZE + 1, INPUT_SIZE + OUTPUT_SIZE + 1))]
+    genomes = []
+    for i in range(2):
+        genome = Genome([[s, d, w + random.normalvariate(mu=0.0, sigma=0.1), e, innovation]
+                         for s, d, w, e, innovation in connections], INPUT_SIZE, OUTPUT_SIZE)
+        for j in range(SPLITS):
+            genome._mutate_split_connection()
+        genomes.append(genome)
+    return genomes
+
+
+def create_different_genome():
+    """
+    Returns genome with the same nodes as genomes of create_genomes, but with none of their innovation numbers.
+    Its innovation numbers are interleaved with theirs, like in genomes which evolved apart.
+    """
+    connections = [[s, d, random.normalvariate(mu=0.0, sigma=1.0), True, 2 * innovation + 1]
+                   for innovation, (s, d) in enumerate((s, d) for s in range(1, INPUT_SIZE + 1)
+                                                        for d in range(INPUT_SIZE + 1, INPUT_SIZE + OUTPUT_SIZE + 1))]
+    return Genome(connections, INPUT_SIZE, OUTPUT_SIZE)
+
+
+def create_population(size):
+    """
+    Returns list of XOR-like genomes (8 inputs, 4 outputs) of one lineage, with about 100 genes.
+    """
+    genome = Genome([[s, d, random.normalvariate(mu=0.0, sigma=1.0), True] for s in range(1, 9) for d in range(9, 13)],
+                    8, 4)
+    population = [genome]
+    while len(population) < size:
+        parent = random.choice(population[-50:])
+        parent.fitness = 1.0
+        child = Genome.reproduce(parent, parent)
+        for i in range(3):
+            child.mutate(MUTATION_COEFFICIENTS)
+        population.append(child)
+    return population
+
+
+def baseline_compatibility_distance(genome_a, genome_b, coefficients):
+    """
+    Returns compatibility distance computed like before the merge pass of evolution.util.compare_connection_genes, by
+    former count_excess_connection_genes, count_disjoint_connection_genes and count_avg_weight_difference, the last one
+    comparing every pair of genes. Baseline for Genome.compatibility_distance.
+    """
+    connections_a = genome_a._connection_genes.values()
+    connections_b = genome_b._connection_genes.values()
+
+    innovations = []
+    for i in range(2):
+        # excess and disjoint genes were counted by two calls, each building the same sets
+        innovations_a = [c.innovation_number for c in connections_a]
+        innovations_b = [c.innovation_number for c in connections_b]
+        common_max_innov = min(max(innovations_a), max(innovations_b))
+        innovations.append((common_max_innov, set(innovations_a) ^ set(innovations_b)))
+    excess_number = sum(1 for i in innovations[0][1] if i > innovations[0][0])
+    disjoint_number = sum(1 for i in innovations[1][1] if i <= innovations[1][0])
+
+    weight_differences = [abs(a.weight - b.weight)
+                          for a in connections_a
+                          for b in connections_b
+                          if a.innovation_number == b.innovation_number]
+    avg_weight_difference = sum(weight_differences) / float(len(weight_differences)) if weight_differences else 0
+    normalization_factor = float(max(len(connections_a), len(connections_b)))
+    if normalization_factor < 20.0:
+        normalization_factor = 1.0
+
+    excess_component = coefficients['excess_factor'] * excess_number / normalization_factor
+    disjoint_component = coefficients['disjoint_factor'] * disjoint_number / normalization_factor
+    weight_difference_component = coefficients['weight_difference_factor'] * avg_weight_difference
+    return excess_component + disjoint_component + weight_difference_component
+
+
+def measure_population(population):
+    """
+    Returns seconds of computing distance matrix of population one pair at a time and by compatibility_distances.
+    """
+    rows = min(PAIRWISE_ROWS, len(population))
+    start = time.perf_counter()
+    for genome in population[:rows]:
+        for partner in population:
+            genome.compatibility_distance(partner, COEFFICIENTS)
+    pairwise = (time.perf_counter() - start) * len(population) / rows
+
+    start = time.perf_counter()
+    compatibility_distances(population, COEFFICIENTS)
+    return pairwise, time.perf_counter() - start
+
+
+def measure(function, repeats=2000):
+    return repeats / min(timeit.repeat(function, number=repeats, repeat=3))
+
+
+def main():
+    random.seed(0)
+    genome1, genome2 = create_genomes()
+    different_genome = create_different_genome()
+    print("{} and {} genes".format(len(genome1.get_connections()), len(genome2.get_connections())))
+    print("{:>10} {:>16} {:>16}".format('pair', 'baseline dist/s', 'distances/s') +
+          "".join(" {:>16}".format('t={} checks/s'.format(threshold)) for threshold in THRESHOLDS))
+    for name, partner in (('similar', genome2), ('different', different_genome)):
+        baseline = baseline_compatibility_distance(genome1, partner, COEFFICIENTS)
+        if abs(baseline - genome1.compatibility_distance(partner, COEFFICIENTS)) > 1e-9:
+            raise Exception("Baseline distance differs from compatibility_distance")
+        results = [measure(lambda: baseline_compatibility_distance(genome1, partner, COEFFICIENTS), repeats=20),
+                   measure(lambda: genome1.compatibility_distance(partner, COEFFICIENTS))]
+        for threshold in THRESHOLDS:
+            results.append(measure(lambda: genome1.is_compatible(partner, COEFFICIENTS, threshold)))
+        print("{:>10}".format(name) + "".join(" {:>16.0f}".format(r) for r in results))
+
+    print("{:>10} {:>12} {:>12} {:>12}".format('genomes', 'genes', 'pairwise [s]', 'matrix [s]'))
+    for size in POPULATION_SIZES:
+        population = create_population(size)
+        genes = sum(len(genome.get_connections()) for genome in population) / size
+        print("{:>10} {:>12.0f} {:>12.2f} {:>12.2f}".format(size, genes, *measure_population(population)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Measures evaluation of a Tetris population by TetrisEvaluator with different numbers of worker processes.
+Every network plays a headless Tetris game frame by frame.
+Run from repository root: python -m benchmarks.evaluationbenchmark
+"""
+import os
+import random
+import time
+
+from evolution.evaluator import TetrisEvaluator
+from evolution.generation import Generation, Group
+from evolution.genome import Genome
+from evolution.tetris import ROWS, COLS, ACTIONS
+
+POPULATION_SIZE = 100
+INPUT_SIZE, OUTPUT_SIZE = ROWS * COLS, len(ACTIONS)
+# frames played by every network at most
+FRAMES = 200
+
+
+def create_generation():
+    group = Group()
+    for i in range(POPULATION_SIZE):
+        connections = [[s, d, random.normalvariate(mu=0.0, sigma=1.0), True]
+                       for s in range(1, INPUT_SIZE + 1) for d in range(INPUT_SIZE + 1, INPUT_SIZE + OUTPUT_SIZE + 1)]
+        group.add_genome(Genome(connections, INPUT_SIZE, OUTPUT_SIZE))
+    generation = Generation([group])
+    generation.create_phenotypes()
+    return generation
+
+
+def main():
+    random.seed(0)
+    generation = create_generation()
+    workers_counts = sorted({1, 2, 4, 8, 16, 32, os.cpu_count()})
+    print("{} CPUs".format(os.cpu_count()))
+    print("{:>8} {:>10} {:>10}".format('workers', 'time [s]', 'speedup'))
+    single = None
+    for workers in workers_counts:
+        if workers > 2 * os.cpu_count():
+            break
+        start = time.perf_counter()
+        generation.evaluator = TetrisEvaluator(max_frames=FRAMES, workers=workers)
+        generation.run_evaluator()
+        seconds = time.perf_counter() - start
+        single = single or seconds
+        print("{:>8} {:>10.2f} {:>10.2f}".format(workers, seconds, single / seconds))
+
+
+if __name__ == '__main__':
+    main()
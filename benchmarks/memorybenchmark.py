@@ -0,0 +1,129 @@
+"""
+Measures memory taken by populations of Tetris-sized genomes, in bytes per connection gene.
+Run from repository root: python -m benchmarks.memorybenchmark
+"""
+import gc
+import random
+import time
+import tracemalloc
+
+from evolution.arraygenome import ArrayGenome
+from evolution.genome import Genome
+from evolution.innovationregistry import InnovationRegistry
+from evolution.mutation import mutate_population
+
+# 10x22 board cells as inputs, moves (left, right, rotate, drop) as outputs
+INPUT_SIZE = 220
+OUTPUT_SIZE = 4
+HIDDEN_SPLITS = 20
+
+
+def create_connections():
+    """
+    Returns connections with innovation numbers of a fully connected genome with a few split connections.
+    """
+    connections = []
+    innovation = 0
+    for source in range(1, INPUT_SIZE + 1):
+        for destination in range(INPUT_SIZE + 1, INPUT_SIZE + OUTPUT_SIZE + 1):
+            connections.append([source, destination, random.normalvariate(mu=0.0, sigma=1.0), True, innovation])
+            innovation += 1
+
+    node_id = INPUT_SIZE + OUTPUT_SIZE
+    for connection in random.sample(connections, HIDDEN_SPLITS):
+        node_id += 1
+        connection[3] = False
+        connections.append([connection[0], node_id, 1.0, True, innovation])
+        connections.append([node_id, connection[1], connection[2], True, innovation + 1])
+        innovation += 2
+    return connections
+
+
+def measure(genome_class, population_size, connections):
+    """
+    Returns bytes per connection gene taken by population of genomes of given class.
+    """
+    gc.collect()
+    tracemalloc.start()
+    population = [genome_class(connections, INPUT_SIZE, OUTPUT_SIZE) for i in range(population_size)]
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del population
+    return allocated / float(population_size * len(connections))
+
+
+def reproduce_with_copies(parent1, parent2):
+    """
+    Reproduces Genome objects the way crossover did before offsprings shared genes with their parents: every
+    inherited gene is copied and adjacency index is built at once. Baseline for Genome.reproduce.
+    """
+    child = Genome.reproduce(parent1, parent2)
+    child._materialize_genes()
+    # views still refer to the shared genes
+    child._clear_views()
+    child._get_successors()
+    return child
+
+
+def measure_offspring(genome_class, population_size, connections, coefficients, reproduce=None):
+    """
+    Returns bytes per connection gene and microseconds per offspring taken by offsprings of two parents, reproduced
+    and mutated with given coefficients.
+    :param reproduce: function reproducing two genomes, genome_class.reproduce by default
+    """
+    if reproduce is None:
+        reproduce = genome_class.reproduce
+    parent1 = genome_class(connections, INPUT_SIZE, OUTPUT_SIZE)
+    parent2 = genome_class(connections, INPUT_SIZE, OUTPUT_SIZE)
+    parent1.fitness, parent2.fitness = 2.0, 1.0
+    # registry seeded from the parents like in Generation, so mutations don't reuse their innovation numbers
+    registry = InnovationRegistry(max(connection[4] for connection in connections) + 1,
+                                  max(max(connection[:2]) for connection in connections) + 1)
+
+    def create_offsprings():
+        population = [reproduce(parent1, parent2) for i in range(population_size)]
+        mutate_population(population, coefficients, registry)
+        registry.next_generation()
+        return population
+
+    start = time.perf_counter()
+    create_offsprings()
+    seconds = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    population = create_offsprings()
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del population
+    return allocated / float(population_size * len(connections)), seconds * 1e6 / population_size
+
+
+def main():
+    random.seed(0)
+    connections = create_connections()
+    print("{} genes per genome".format(len(connections)))
+    print("{:>12} {:>16} {:>16}".format('population', 'Genome[B/gene]', 'ArrayGenome'))
+    for population_size in (150, 500, 2000):
+        print("{:>12} {:>16.1f} {:>16.1f}".format(population_size, measure(Genome, population_size, connections),
+                                                  measure(ArrayGenome, population_size, connections)))
+
+    # offsprings are mostly near copies of their parents
+    coefficients = dict(add_connection=0.1, split_connection=0.3, change_weight=0.8,
+                        new_connection_abs_max_weight=1.0, max_weight_mutation=0.5)
+    print("offsprings of 2 parents, copying is Genome with every inherited gene copied (see reproduce_with_copies)")
+    print("{:>12} {:>16} {:>16} {:>16} {:>16} {:>16} {:>16}".format(
+        'population', 'copying[B/gene]', 'copying[us]', 'Genome[B/gene]', 'Genome[us]', 'ArrayGenome',
+        'ArrayGenome[us]'))
+    for population_size in (150, 500, 2000):
+        print("{:>12} {:>16.1f} {:>16.1f} {:>16.1f} {:>16.1f} {:>16.1f} {:>16.1f}".format(
+            population_size, *(measure_offspring(Genome, population_size, connections, coefficients,
+                                                 reproduce_with_copies) +
+                               measure_offspring(Genome, population_size, connections, coefficients) +
+                               measure_offspring(ArrayGenome, population_size, connections, coefficients))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares evaluation modes of NeuralNetwork on evolved networks of different sizes.
+Run from repository root: python -m benchmarks.networkbenchmark
+"""
+import random
+import timeit
+
+from evolution.genome import Genome
+from nn.neuralnetwork import NeuralNetwork
+
+MUTATION_COEFFICIENTS = {
+    'add_connection': 0.8,
+    'split_connection': 0.5,
+    'change_weight': 0.0,
+    'new_connection_abs_max_weight': 1.0,
+    'max_weight_mutation': 0.5
+}
+
+
+def create_genome(input_size, output_size, mutations):
+    """
+    Returns fully connected genome mutated given number of times.
+    """
+    connections = [[source, destination, random.normalvariate(mu=0.0, sigma=1.0), True]
+                   for source in range(1, input_size + 1)
+                   for destination in range(input_size + 1, input_size + output_size + 1)]
+    genome = Genome(connections, input_size, output_size)
+    for i in range(mutations):
+        genome.mutate(MUTATION_COEFFICIENTS)
+    return genome
+
+
+def benchmark_modes(genome, repeats):
+    """
+    Returns dictionary of microseconds per forward call for every evaluation mode.
+    """
+    X = [random.uniform(-1.0, 1.0) for i in range(genome.input_size)]
+    results = {}
+    for mode in ('dfs', 'compiled', 'layered', 'codegen'):
+        nn = NeuralNetwork(genome, mode=mode)
+        results[mode] = timeit.timeit(lambda: nn.forward(X), number=repeats) / repeats * 1e6
+    return results
+
+
+def main():
+    random.seed(0)
+    print("{:>8} {:>8} {:>8} {:>10} {:>10} {:>10} {:>10} {:>9}".format(
+        'inputs', 'nodes', 'genes', 'dfs[us]', 'compiled', 'layered', 'codegen', 'speedup'))
+    for input_size, output_size, mutations, repeats in ((2, 1, 10, 5000), (8, 4, 50, 2000), (16, 4, 200, 500),
+                                                        (32, 8, 500, 200)):
+        genome = create_genome(input_size, output_size, mutations)
+        results = benchmark_modes(genome, repeats)
+        print("{:>8} {:>8} {:>8} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>8.1f}x".format(
+            input_size, len(genome.node_ids), len(genome.connection_genes), results['dfs'], results['compiled'],
+            results['layered'], results['codegen'], results['dfs'] / results['codegen']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Compares JSON and binary serialization of populations: time to write and read all genomes and size of the data.
+Run from repository root: python -m benchmarks.serializationbenchmark
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from evolution.generation import Generation, Group
+from evolution.genome import Genome
+from evolution.populationfile import PopulationWriter, PopulationReader
+
+POPULATION_SIZE = 1000
+# (input size, output size, split mutations): XOR-like and Tetris-sized genomes
+SIZES = ((8, 4, 20), (220, 4, 50))
+
+
+def create_generation(input_size, output_size, splits):
+    """
+    Returns generation of POPULATION_SIZE fully connected genomes with a few hidden nodes, in 10 groups.
+    """
+    connections = [[s, d, random.normalvariate(mu=0.0, sigma=1.0), True]
+                   for s in range(1, input_size + 1) for d in range(input_size + 1, input_size + output_size + 1)]
+    genome = Genome(connections, input_size, output_size)
+    for i in range(splits):
+        genome._mutate_split_connection()
+    genome.fitness = 1.0
+
+    groups = [Group() for i in range(10)]
+    for i in range(POPULATION_SIZE):
+        offspring = Genome.reproduce(genome, genome)
+        offspring._mutate_change_weight(1.0)
+        offspring.fitness = random.random()
+        groups[i % len(groups)].add_genome(offspring)
+    return Generation(groups)
+
+
+def measure_json(generation, path):
+    start = time.perf_counter()
+    with open(path, 'w') as file:
+        for group in generation.groups.values():
+            for genome in group.genomes:
+                file.write(genome.to_json() + '\n')
+    written = time.perf_counter()
+    with open(path) as file:
+        genomes = [Genome.from_json(line) for line in file]
+    read = time.perf_counter()
+    return written - start, read - written, os.path.getsize(path)
+
+
+def measure_binary(generation, path):
+    start = time.perf_counter()
+    with PopulationWriter(path) as writer:
+        writer.write_generation(generation)
+    written = time.perf_counter()
+    with PopulationReader(path) as reader:
+        genomes = [genome for group_id, genome in reader]
+    read = time.perf_counter()
+    return written - start, read - written, os.path.getsize(path)
+
+
+def main():
+    random.seed(0)
+    directory = tempfile.mkdtemp()
+    try:
+        print("{:>6} {:>8} {:>10} {:>10} {:>12}".format('genes', 'format', 'write [s]', 'read [s]', 'size [kB]'))
+        for input_size, output_size, splits in SIZES:
+            generation = create_generation(input_size, output_size, splits)
+            genes = input_size * output_size + 2 * splits
+            for name, measure in (('json', measure_json), ('binary', measure_binary)):
+                write_time, read_time, size = measure(generation, os.path.join(directory, name))
+                print("{:>6} {:>8} {:>10.3f} {:>10.3f} {:>12.0f}".format(genes, name, write_time, read_time,
+                                                                         size / 1024))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,497 @@
+import random
+import json
+
+import numpy as np
+
+from evolution.genome import Genome, NodeGene, ConnectionGene, GENOME_HEADER, GENE_DTYPE, GENES_KEY_HEADER, \
+    GENES_KEY_DTYPE, get_fingerprint, get_random_bits, to_binary_fitness, read_binary_genome
+
+
+class ArrayGenome:
+    """
+    Genome in NEAT with connection genes stored as a structure of arrays instead of ConnectionGene and NodeGene
+    objects. Source, destination, weight, enabled flag and innovation number of every gene are kept in contiguous
+    NumPy arrays sorted by innovation number, which takes much less memory and makes vectorized operators possible.
+    Public API is the same as Genome's.
+    """
+
+    def __init__(self, connections, input_size, output_size):
+        """
+        Create genome from given informations.
+        :param connections: List of tuples representing connection genes, the same as for Genome:
+            [(source, destination, weight, enabled),...] or [(source, destination, weight, enabled, innovation),...]
+        :param input_size: (Integer) - How many input nodes are in the genome (IDs from 1 to input_size)
+        :param output_size: (Integer) - How many output nodes are in the genome (IDs from input_size + 1 to
+            input_size + output_size)
+        """
+        self.input_size = input_size
+        self.output_size = output_size
+        self.input_node_ids = list(range(1, input_size + 1))
+        self.output_node_ids = list(range(input_size + 1, input_size + output_size + 1))
+        self.fitness = None
+        self.adjusted_fitness = None
+        self.parent = None
+        self.mutations = []
+
+        if len(connections[0]) == 4:
+            innovations = [ConnectionGene._get_new_innovation_number() for connection in connections]
+        elif len(connections[0]) == 5:
+            innovations = [connection[4] for connection in connections]
+        else:
+            raise Exception('Connection does not contain all necessary information')
+
+        for connection in connections:
+            self._check_nodes(connection[0], connection[1])
+
+        self._set_genes(np.array([connection[0] for connection in connections], dtype=np.int32),
+                        np.array([connection[1] for connection in connections], dtype=np.int32),
+                        np.array([connection[2] for connection in connections], dtype=np.float64),
+                        np.array([connection[3] for connection in connections], dtype=bool),
+                        np.array(innovations, dtype=np.int64))
+        self._check_connections_uniqueness()
+        ConnectionGene._skip_innovation_numbers(int(self.innovations[-1]))
+
+    def _set_genes(self, sources, destinations, weights, enabled, innovations):
+        order = np.argsort(innovations, kind='stable')
+        innovations = innovations[order]
+        # genes are matched by innovation number (see compatibility_distance and reproduce), so two genes with the
+        # same number would be matched with wrong genes. Genes are checked first, so genome is not changed on error
+        if np.any(innovations[1:] == innovations[:-1]):
+            raise Exception('Innovation numbers must be unique')
+        self.sources = sources[order]
+        self.destinations = destinations[order]
+        self.weights = weights[order]
+        self.enabled = enabled[order]
+        self.innovations = innovations
+        # node IDs do not have to be contiguous (see InnovationRegistry)
+        self._max_node_id = int(max(self.sources.max(), self.destinations.max()))
+        # adjacency index built when add connection mutation needs it (see _get_successors)
+        self._successors = None
+
+    @staticmethod
+    def _check_nodes(source_node_id, dest_node_id):
+        if source_node_id is None and dest_node_id is None:
+            raise Exception("Both nodes are empty")
+
+        if source_node_id is None or dest_node_id is None:
+            raise Exception('One node is empty')
+
+        if source_node_id == dest_node_id:
+            raise Exception('ID\'s are equal')
+
+    def _check_connections_uniqueness(self):
+        if len(np.unique(self._connection_keys())) != len(self.sources):
+            raise Exception('Connections must be unique')
+
+    def _get_max_node_id(self):
+        return self._max_node_id
+
+    def _connection_keys(self, max_node_id=None):
+        # (source, destination) pairs encoded as single integers
+        if max_node_id is None:
+            max_node_id = self._max_node_id
+        return self.sources.astype(np.int64) * (max_node_id + 2) + self.destinations
+
+    @staticmethod
+    def from_genome(genome):
+        """
+        Returns ArrayGenome with the same genes (including innovation numbers) and fitness as given Genome.
+        :type genome: Genome
+        """
+        array_genome = ArrayGenome(genome._get_connections_with_innovations(), genome.input_size, genome.output_size)
+        array_genome.fitness = genome.fitness
+        array_genome.adjusted_fitness = genome.adjusted_fitness
+        return array_genome
+
+    def to_genome(self):
+        """
+        Returns Genome built of ConnectionGene objects with the same genes and fitness as this genome.
+        """
+        genome = Genome(self._get_connections_with_innovations(), self.input_size, self.output_size)
+        genome.fitness = self.fitness
+        genome.adjusted_fitness = self.adjusted_fitness
+        return genome
+
+    def _get_connections_with_innovations(self):
+        return list(zip(self.sources.tolist(), self.destinations.tolist(), self.weights.tolist(),
+                        self.enabled.tolist(), self.innovations.tolist()))
+
+    def get_connections_ids(self):
+        """
+        Returns list of tuples representing connection IDs sorted by source and destination node ID.
+        """
+        return sorted(zip(self.sources.tolist(), self.destinations.tolist()))
+
+    def get_connections(self):
+        """
+        Returns list of tuples (source, destination, weight, enabled) sorted by source and destination node ID.
+        """
+        return sorted(zip(self.sources.tolist(), self.destinations.tolist(), self.weights.tolist(),
+                          self.enabled.tolist()))
+
+    def get_nodes(self):
+        """
+        Returns ordered (by ID) list of NodeGene objects that are in the genome.
+        """
+        nodes = []
+        for node_id in np.union1d(self.sources, self.destinations).tolist():
+            if node_id in self.input_node_ids:
+                nodes.append(NodeGene(node_id, 'input'))
+            elif node_id in self.output_node_ids:
+                nodes.append(NodeGene(node_id, 'output'))
+            else:
+                nodes.append(NodeGene(node_id))
+        return nodes
+
+    def fingerprint(self):
+        """
+        Returns canonical fingerprint of this genome, equal to fingerprint of Genome with the same genes.
+        """
+        return get_fingerprint(self.get_genes_key())
+
+    def get_genes_key(self):
+        """
+        Returns canonical form of this genome as bytes, equal to genes key of Genome with the same genes (see
+        Genome.get_genes_key).
+        """
+        key = np.empty(len(self.innovations), dtype=GENES_KEY_DTYPE)
+        key['innovation_number'] = self.innovations
+        key['source_id'] = self.sources
+        key['destination_id'] = self.destinations
+        key['enabled'] = self.enabled
+        key['weight'] = self.weights
+        return GENES_KEY_HEADER.pack(self.input_size, self.output_size) + key.tobytes()
+
+    def mutate(self, coefficients, registry=None):
+        """
+        Mutates genome, the same way as Genome.mutate.
+        :param coefficients: dictionary with mutation coefficients
+        :param registry: (InnovationRegistry) - optional registry assigning innovation numbers and node IDs
+        """
+        if random.uniform(0.0, 1.0) <= coefficients['add_connection']:
+            self._mutate_new_connection(coefficients['new_connection_abs_max_weight'], registry)
+
+        if random.uniform(0.0, 1.0) <= coefficients['split_connection']:
+            self._mutate_split_connection(registry)
+
+        if random.uniform(0.0, 1.0) <= coefficients['change_weight']:
+            self._mutate_change_weight(coefficients['max_weight_mutation'])
+
+    def _append_genes(self, sources, destinations, weights, innovations=None):
+        if innovations is None:
+            innovations = [ConnectionGene._get_new_innovation_number() for source in sources]
+        innovations = np.array(innovations, dtype=np.int64)
+        sources = np.append(self.sources, np.array(sources, dtype=np.int32))
+        destinations = np.append(self.destinations, np.array(destinations, dtype=np.int32))
+        weights = np.append(self.weights, np.array(weights, dtype=np.float64))
+        enabled = np.append(self.enabled, np.ones(len(innovations), dtype=bool))
+
+        # new innovation numbers are usually the greatest ones, registry may give out older ones though
+        if len(self.innovations) == 0 or innovations.min() > self.innovations[-1]:
+            self.sources, self.destinations, self.weights, self.enabled = sources, destinations, weights, enabled
+            self.innovations = np.append(self.innovations, innovations)
+            self._max_node_id = int(max(self._max_node_id, sources[-len(innovations):].max(),
+                                        destinations[-len(innovations):].max()))
+            if self._successors is not None:
+                for source_id, destination_id in zip(sources[-len(innovations):].tolist(),
+                                                     destinations[-len(innovations):].tolist()):
+                    self._successors.setdefault(source_id, set()).add(destination_id)
+                    self._successors.setdefault(destination_id, set())
+        else:
+            self._set_genes(sources, destinations, weights, enabled, np.append(self.innovations, innovations))
+
+    def _mutate_new_connection(self, max_weight, registry=None):
+        new_connection = self._sample_new_connection()
+
+        # if no new connection possible, end mutation
+        if new_connection is None:
+            return
+
+        source_id, destination_id = new_connection
+        weight = random.normalvariate(mu=0.0, sigma=max_weight / 2)
+        innovations = None
+        if registry is not None:
+            innovations = [registry.get_connection_innovation(source_id, destination_id)]
+        self._append_genes([source_id], [destination_id], [weight], innovations)
+        self.mutations.append(('connection', source_id, destination_id, weight))
+
+    def _sample_new_connection(self):
+        """
+        Returns random (source, destination) pair which is not in the genome yet and would not create a loop,
+        or None if there is no such pair, the same way as Genome._sample_new_connection.
+        """
+        successors = self._get_successors()
+        node_ids = np.union1d(self.sources, self.destinations)
+        source_ids = node_ids[(node_ids <= self.input_size) | (node_ids > self.input_size + self.output_size)].tolist()
+        destination_ids = node_ids[node_ids > self.input_size].tolist()
+
+        # in sparse genomes a random pair is very likely to be valid
+        for _ in range(Genome.NEW_CONNECTION_ATTEMPTS):
+            source_id = random.choice(source_ids)
+            destination_id = random.choice(destination_ids)
+            if self._is_new_connection_valid(source_id, destination_id):
+                return source_id, destination_id
+
+        # (nearly) saturated genome, search candidates of every source in random order
+        predecessors = self._get_predecessors()
+        random.shuffle(source_ids)
+        for source_id in source_ids:
+            ancestors = Genome._get_reachable(source_id, predecessors)
+            possible_destinations = [d for d in destination_ids
+                                     if d not in successors[source_id] and d not in ancestors]
+            if possible_destinations:
+                return source_id, random.choice(possible_destinations)
+
+        return None
+
+    def _is_new_connection_valid(self, source_id, destination_id):
+        successors = self._get_successors()
+        if source_id == destination_id or destination_id in successors[source_id]:
+            return False
+
+        # connection source -> destination closes a loop if source is reachable from destination
+        return source_id not in Genome._get_reachable(destination_id, successors, source_id)
+
+    def _get_successors(self):
+        if self._successors is None:
+            node_ids = np.union1d(self.sources, self.destinations).tolist()
+            self._successors = dict((node_id, set()) for node_id in node_ids)
+            for source_id, destination_id in zip(self.sources.tolist(), self.destinations.tolist()):
+                self._successors[source_id].add(destination_id)
+        return self._successors
+
+    def _get_predecessors(self):
+        predecessors = dict((node_id, []) for node_id in np.union1d(self.sources, self.destinations).tolist())
+        for source_id, destination_id in zip(self.sources.tolist(), self.destinations.tolist()):
+            predecessors[destination_id].append(source_id)
+        return predecessors
+
+    def _get_random_enabled_connection(self):
+        enabled_indexes = np.flatnonzero(self.enabled)
+        if len(enabled_indexes) == 0:
+            return None
+        return int(enabled_indexes[random.randrange(len(enabled_indexes))])
+
+    def _mutate_split_connection(self, registry=None):
+        index = self._get_random_enabled_connection()
+
+        if index is None:
+            return
+
+        self.enabled[index] = False
+        old_source_id = int(self.sources[index])
+        old_dest_id = int(self.destinations[index])
+        old_weight = float(self.weights[index])
+
+        innovations = None
+        if registry is not None:
+            new_node_id, first_innovation, second_innovation = registry.get_split(old_source_id, old_dest_id,
+                                                                                  self._max_node_id + 1)
+            innovations = [first_innovation, second_innovation]
+        else:
+            new_node_id = self._max_node_id + 1
+        self._append_genes([old_source_id, new_node_id], [new_node_id, old_dest_id], [1.0, old_weight], innovations)
+        self.mutations.append(('split', old_source_id, old_dest_id, new_node_id, old_weight))
+
+    def _mutate_change_weight(self, max_weight_change):
+        index = self._get_random_enabled_connection()
+
+        if index is None:
+            return
+
+        self.weights[index] += random.normalvariate(mu=0.0, sigma=max_weight_change / 2)
+        self.mutations.append(('weight', int(self.sources[index]), int(self.destinations[index]),
+                               float(self.weights[index])))
+
+    def _change_random_weight(self, positions, change):
+        """
+        Adds change to weight of random enabled connection, picked by positions[0] from [0;1).
+        """
+        enabled_indexes = np.flatnonzero(self.enabled)
+        if len(enabled_indexes) == 0:
+            return
+
+        index = int(enabled_indexes[int(positions[0] * len(enabled_indexes))])
+        self.weights[index] += change
+        self.mutations.append(('weight', int(self.sources[index]), int(self.destinations[index]),
+                               float(self.weights[index])))
+
+    def compatibility_distance(self, partner, coefficients):
+        """
+        Returns compatibility distance between this genome and partner, the same as Genome.compatibility_distance.
+        :param partner:(ArrayGenome) Genome to compare with
+        :param coefficients: dictionary with compatibility distance factors
+        """
+        common, indexes_a, indexes_b = np.intersect1d(self.innovations, partner.innovations, assume_unique=True,
+                                                      return_indices=True)
+        common_max_innov = min(self.innovations[-1], partner.innovations[-1])
+        not_matching = len(self.innovations) + len(partner.innovations) - 2 * len(common)
+        # genes not matching up to common max innovation are disjoint, the rest are excess
+        disjoint_number = (np.count_nonzero(self.innovations <= common_max_innov) +
+                           np.count_nonzero(partner.innovations <= common_max_innov) - 2 * len(common))
+        excess_number = not_matching - disjoint_number
+        if len(common):
+            avg_weight_difference = float(np.mean(np.abs(self.weights[indexes_a] - partner.weights[indexes_b])))
+        else:
+            avg_weight_difference = 0
+
+        normalization_factor = float(max(len(self.innovations), len(partner.innovations)))
+
+        # "N can be set to 1 if both genomes are small, i.e. consist of fewer than 20 genes"
+        if normalization_factor < 20.0:
+            normalization_factor = 1.0
+
+        excess_component = coefficients['excess_factor'] * excess_number / normalization_factor
+        disjoint_component = coefficients['disjoint_factor'] * disjoint_number / normalization_factor
+        weight_difference_component = coefficients['weight_difference_factor'] * avg_weight_difference
+
+        return excess_component + disjoint_component + weight_difference_component
+
+    def _get_innovations_and_weights(self):
+        # innovation numbers and weights of genes sorted by innovation number, used by evolution.distance
+        return self.innovations, self.weights
+
+    def is_compatible(self, partner, coefficients, threshold):
+        """
+        Tells whether compatibility distance between this genome and partner is lower than threshold, the same as
+        Genome.is_compatible. Distance of arrays is computed at once, so there is no early exit.
+        """
+        return self.compatibility_distance(partner, coefficients) < threshold
+
+    @staticmethod
+    def reproduce(parent1, parent2):
+        """
+        Produces new genome as a result of reproduction of 2 genomes, the same way as Genome.reproduce.
+        :type parent1: ArrayGenome
+        :type parent2: ArrayGenome
+        :return: new ArrayGenome, a child of parent1 and parent2
+        """
+        assert parent1.input_size == parent2.input_size, "parents' input_size differ"
+        assert parent1.output_size == parent2.output_size, "parents' output_size differ"
+
+        if parent1.fitness == parent2.fitness:
+            child = ArrayGenome._crossover(parent1, parent2, True)
+        elif parent1.fitness > parent2.fitness:
+            child = ArrayGenome._crossover(parent1, parent2, False)
+        else:
+            child = ArrayGenome._crossover(parent2, parent1, False)
+
+        for parent in (parent1, parent2):
+            if child._has_same_genes(parent):
+                child.parent = parent
+                break
+        return child
+
+    @staticmethod
+    def _crossover(parent1, parent2, take_all):
+        """
+        Matching genes are inherited randomly from either parent, not matching genes are inherited from parent1 and,
+        if take_all is set, from parent2 too.
+        """
+        common, indexes_1, indexes_2 = np.intersect1d(parent1.innovations, parent2.innovations, assume_unique=True,
+                                                      return_indices=True)
+        weights = parent1.weights.copy()
+        enabled = parent1.enabled.copy()
+        # one random draw for all matching genes
+        from_parent2 = np.frombuffer(get_random_bits(len(common)).encode('ascii'), dtype=np.uint8) == ord('1')
+        weights[indexes_1[from_parent2]] = parent2.weights[indexes_2[from_parent2]]
+        enabled[indexes_1[from_parent2]] = parent2.enabled[indexes_2[from_parent2]]
+
+        sources, destinations, innovations = parent1.sources, parent1.destinations, parent1.innovations
+        if take_all:
+            only_2 = np.ones(len(parent2.innovations), dtype=bool)
+            only_2[indexes_2] = False
+            # the same connection can have different innovation numbers in parents, parent1's gene is kept then
+            max_node_id = max(parent1._max_node_id, parent2._max_node_id)
+            only_2 &= ~np.isin(parent2._connection_keys(max_node_id), parent1._connection_keys(max_node_id))
+            sources = np.concatenate((sources, parent2.sources[only_2]))
+            destinations = np.concatenate((destinations, parent2.destinations[only_2]))
+            weights = np.concatenate((weights, parent2.weights[only_2]))
+            enabled = np.concatenate((enabled, parent2.enabled[only_2]))
+            innovations = np.concatenate((innovations, parent2.innovations[only_2]))
+
+        child = ArrayGenome.__new__(ArrayGenome)
+        child.input_size = parent1.input_size
+        child.output_size = parent1.output_size
+        child.input_node_ids = list(parent1.input_node_ids)
+        child.output_node_ids = list(parent1.output_node_ids)
+        child.fitness = None
+        child.adjusted_fitness = None
+        child.parent = None
+        child.mutations = []
+        child._set_genes(sources.copy(), destinations.copy(), weights, enabled, innovations.copy())
+        return child
+
+    def compact(self, disabled_before):
+        """
+        ArrayGenome has no archive and keeps all its genes, see Genome.compact.
+        :return: number of archived genes, always 0
+        """
+        return 0
+
+    def _has_same_genes(self, other):
+        return (np.array_equal(self.innovations, other.innovations) and np.array_equal(self.weights, other.weights)
+                and np.array_equal(self.enabled, other.enabled))
+
+    def to_json(self):
+        """
+        Produces JSON content from this genome, in the same format as Genome.to_json.
+        :return: string in JSON format
+        """
+        genome_dict = dict(input_size=self.input_size,
+                           output_size=self.output_size,
+                           connections=self.get_connections())
+        return json.dumps(genome_dict)
+
+    def to_bytes(self):
+        """
+        Produces compact binary content from this genome, in the same format as Genome.to_bytes.
+        :return: bytes
+        """
+        genes = np.empty(len(self.innovations), dtype=GENE_DTYPE)
+        genes['source_id'] = self.sources
+        genes['destination_id'] = self.destinations
+        genes['weight'] = self.weights
+        genes['enabled'] = self.enabled
+        genes['innovation_number'] = self.innovations
+        # ArrayGenome does not know when genes were disabled, disabled genes are taken as disabled just now
+        genes['disabled_at'] = np.where(self.enabled, -1, ConnectionGene._innovation_number)
+        header = GENOME_HEADER.pack(self.input_size, self.output_size, len(genes), 0,
+                                    to_binary_fitness(self.fitness), to_binary_fitness(self.adjusted_fitness))
+        return header + genes.tobytes()
+
+    @staticmethod
+    def from_bytes(content):
+        """
+        Constructs new ArrayGenome from binary content produced by to_bytes (of Genome or ArrayGenome), archived
+        genes are kept with the other ones.
+        :param content: bytes-like object
+        :return: ArrayGenome object constructed from binary content
+        """
+        input_size, output_size, _, _, fitness, adjusted_fitness, genes = read_binary_genome(content)
+        genome = ArrayGenome.__new__(ArrayGenome)
+        genome.input_size = input_size
+        genome.output_size = output_size
+        genome.input_node_ids = list(range(1, input_size + 1))
+        genome.output_node_ids = list(range(input_size + 1, input_size + output_size + 1))
+        genome.fitness = fitness
+        genome.adjusted_fitness = adjusted_fitness
+        genome.parent = None
+        genome.mutations = []
+        genome._set_genes(genes['source_id'].astype(np.int32), genes['destination_id'].astype(np.int32),
+                          genes['weight'].astype(np.float64), genes['enabled'].astype(bool),
+                          genes['innovation_number'].astype(np.int64))
+        ConnectionGene._skip_innovation_numbers(int(genome.innovations[-1]))
+        return genome
+
+    @staticmethod
+    def from_json(json_content):
+        """
+        Constructs new ArrayGenome from JSON formatted string.
+        :param json_content: string formatted as JSON
+        :return: ArrayGenome object constructed from JSON
+        """
+        genome_dict = json.loads(json_content)
+        # ArrayGenome has no archive, archived connections are kept with the other ones
+        return ArrayGenome(genome_dict["connections"] + genome_dict.get("archived_connections", []),
+                           genome_dict["input_size"], genome_dict["output_size"])
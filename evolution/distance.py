@@ -0,0 +1,182 @@
+import multiprocessing
+
+import numpy as np
+
+# the most elements of temporary (genomes x representatives x innovations) arrays computed at once
+CHUNK_ELEMENTS = 2 ** 22
+
+# gene matrices of the population, set in every worker process by _set_worker_matrices
+_worker_matrices = None
+
+
+def compatibility_distances(genomes, coefficients, representatives=None, processes=None):
+    """
+    Returns matrix of compatibility distances between genomes and representatives, element [i, j] is (up to rounding)
+    genomes[i].compatibility_distance(representatives[j], coefficients). Genes of all genomes are kept in flat arrays
+    (genes of one genome after another, like rows of a CSR matrix), so memory grows with the number of genes, not
+    with genomes x innovations. For every chunk of rows only innovations of genomes in the chunk are put into dense
+    matrices of gene presence and weights and all excess, disjoint and weight difference terms are computed with
+    array operations. Works for Genome and ArrayGenome objects.
+    :param genomes: list of genomes
+    :param coefficients: dictionary with compatibility distance factors
+    :param representatives: list of genomes, by default distances between every two genomes are computed
+    :param processes: (Integer) - number of worker processes the rows of the matrix are split between, by default
+        the matrix is computed in this process
+    :return: numpy array of shape (len(genomes), len(representatives))
+    """
+    if representatives is None:
+        representatives = genomes
+    if not genomes or not representatives:
+        return np.zeros((len(genomes), len(representatives)))
+
+    matrices = _build_gene_matrices(genomes, representatives, coefficients)
+    chunks = _get_chunks(matrices)
+    if processes is None or processes <= 1 or len(chunks) == 1:
+        return np.concatenate([_compute_rows(matrices, start, stop) for start, stop in chunks])
+
+    with multiprocessing.Pool(processes, initializer=_set_worker_matrices, initargs=(matrices,)) as pool:
+        return np.concatenate(pool.starmap(_compute_worker_rows, chunks))
+
+
+def _build_gene_matrices(genomes, representatives, coefficients):
+    genes = [genome._get_innovations_and_weights() for genome in genomes]
+    representative_genes = genes if representatives is genomes else \
+        [genome._get_innovations_and_weights() for genome in representatives]
+
+    # columns are all innovation numbers, sorted, so genes of every genome keep their order
+    innovations = [np.asarray(innovation_numbers, dtype=np.int64) for innovation_numbers, _ in genes]
+    representative_innovations = innovations if representative_genes is genes else \
+        [np.asarray(innovation_numbers, dtype=np.int64) for innovation_numbers, _ in representative_genes]
+    columns = np.unique(np.concatenate(innovations + representative_innovations))
+
+    matrices = dict(coefficients=coefficients, columns_count=len(columns))
+    for prefix, genome_genes, genome_innovations in (('', genes, innovations),
+                                                     ('representative_', representative_genes,
+                                                      representative_innovations)):
+        if prefix and representative_genes is genes:
+            for key in ('lengths', 'offsets', 'columns', 'weights', 'keys', 'last_columns'):
+                matrices[prefix + key] = matrices[key]
+            continue
+
+        lengths = np.array([len(innovation_numbers) for innovation_numbers in genome_innovations])
+        # genes of genome i are at offsets[i]:offsets[i + 1]
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        gene_columns = np.searchsorted(columns, np.concatenate(genome_innovations))
+        matrices[prefix + 'lengths'] = lengths
+        matrices[prefix + 'offsets'] = offsets
+        matrices[prefix + 'columns'] = gene_columns
+        matrices[prefix + 'weights'] = np.concatenate([np.asarray(gene_weights, dtype=np.float64)
+                                                       for _, gene_weights in genome_genes])
+        # (genome, column) of every gene as one increasing number, see _count_genes_up_to
+        matrices[prefix + 'keys'] = np.repeat(np.arange(len(lengths)), lengths) * (len(columns) + 1) + gene_columns
+        # column of the greatest innovation number of every genome, -1 for genome without genes
+        matrices[prefix + 'last_columns'] = np.where(lengths > 0, gene_columns[np.maximum(offsets[1:] - 1, 0)], -1)
+    return matrices
+
+
+def _get_chunks(matrices):
+    """
+    Splits genomes into chunks of consecutive rows, so that (rows x representatives x innovations of the chunk) is
+    at most CHUNK_ELEMENTS (or the chunk has only one row).
+    """
+    offsets = matrices['offsets']
+    gene_columns = matrices['columns']
+    representatives_count = len(matrices['representative_lengths'])
+    seen = np.zeros(matrices['columns_count'], dtype=bool)
+    chunks = []
+    start = 0
+    width = 0
+    for row in range(len(matrices['lengths'])):
+        row_columns = gene_columns[offsets[row]:offsets[row + 1]]
+        new_columns = np.count_nonzero(~seen[row_columns])
+        if row > start and (row + 1 - start) * representatives_count * (width + new_columns) > CHUNK_ELEMENTS:
+            chunks.append((start, row))
+            start = row
+            seen[:] = False
+            width = 0
+            new_columns = len(row_columns)
+        seen[row_columns] = True
+        width += new_columns
+    chunks.append((start, len(matrices['lengths'])))
+    return chunks
+
+
+def _get_dense_rows(matrices, prefix, start, stop, column_positions, width):
+    """
+    Returns dense matrices of gene presence and weights of genomes from start to stop, only columns with
+    column_positions not lower than 0 are kept, at these positions.
+    """
+    offsets = matrices[prefix + 'offsets']
+    positions = column_positions[matrices[prefix + 'columns'][offsets[start]:offsets[stop]]]
+    rows = np.repeat(np.arange(stop - start), matrices[prefix + 'lengths'][start:stop])
+    kept = positions >= 0
+    present = np.zeros((stop - start, width), dtype=bool)
+    weights = np.zeros((stop - start, width))
+    present[rows[kept], positions[kept]] = True
+    weights[rows[kept], positions[kept]] = matrices[prefix + 'weights'][offsets[start]:offsets[stop]][kept]
+    return present, weights
+
+
+def _count_genes_up_to(matrices, prefix, start, stop, last_columns):
+    """
+    Returns matrix of numbers of genes of genomes from start to stop in columns up to last_columns (inclusive),
+    element [i, j] for genome start + i and last_columns[j]. Keys of genes are sorted, so counts are found by binary
+    search.
+    """
+    queries = np.arange(start, stop)[:, np.newaxis] * (matrices['columns_count'] + 1) + last_columns[np.newaxis, :]
+    return (np.searchsorted(matrices[prefix + 'keys'], queries, side='right') -
+            matrices[prefix + 'offsets'][start:stop, np.newaxis])
+
+
+def _compute_rows(matrices, start, stop):
+    """
+    Returns distances between genomes from start to stop and all representatives.
+    """
+    offsets = matrices['offsets']
+    lengths = matrices['lengths'][start:stop, np.newaxis]
+    representatives_count = len(matrices['representative_lengths'])
+    representative_lengths = matrices['representative_lengths'][np.newaxis, :]
+
+    # only innovations present in genomes of this chunk can match
+    used = np.unique(matrices['columns'][offsets[start]:offsets[stop]])
+    column_positions = np.full(matrices['columns_count'], -1, dtype=np.intp)
+    column_positions[used] = np.arange(len(used))
+    present, weights = _get_dense_rows(matrices, '', start, stop, column_positions, len(used))
+    representative_present, representative_weights = _get_dense_rows(matrices, 'representative_', 0,
+                                                                      representatives_count, column_positions,
+                                                                      len(used))
+
+    matching = present.astype(np.float64) @ representative_present.T.astype(np.float64)
+    weight_differences = weights[:, np.newaxis, :] - representative_weights[np.newaxis, :, :]
+    np.abs(weight_differences, out=weight_differences)
+    weight_differences *= present[:, np.newaxis, :] & representative_present[np.newaxis, :, :]
+    weight_difference = weight_differences.sum(axis=2)
+    avg_weight_difference = np.divide(weight_difference, matching, out=np.zeros_like(weight_difference),
+                                      where=matching > 0)
+
+    # genes after the last gene of the other genome are excess, other not matching genes are disjoint
+    excess_number = (lengths - _count_genes_up_to(matrices, '', start, stop, matrices['representative_last_columns']) +
+                     representative_lengths -
+                     _count_genes_up_to(matrices, 'representative_', 0, representatives_count,
+                                        matrices['last_columns'][start:stop]).T)
+    disjoint_number = lengths + representative_lengths - 2 * matching - excess_number
+
+    normalization_factor = np.maximum(lengths, representative_lengths).astype(np.float64)
+    # "N can be set to 1 if both genomes are small, i.e. consist of fewer than 20 genes"
+    normalization_factor[normalization_factor < 20.0] = 1.0
+
+    coefficients = matrices['coefficients']
+    excess_component = coefficients['excess_factor'] * excess_number / normalization_factor
+    disjoint_component = coefficients['disjoint_factor'] * disjoint_number / normalization_factor
+    weight_difference_component = coefficients['weight_difference_factor'] * avg_weight_difference
+
+    return excess_component + disjoint_component + weight_difference_component
+
+
+def _set_worker_matrices(matrices):
+    global _worker_matrices
+    _worker_matrices = matrices
+
+
+def _compute_worker_rows(start, stop):
+    return _compute_rows(_worker_matrices, start, stop)
@@ -0,0 +1,151 @@
+import functools
+import itertools
+import math
+import multiprocessing
+import os
+
+import numpy as np
+
+from evolution.genome import Genome
+from evolution.tetris import play_tetris
+from nn.neuralnetwork import NeuralNetwork
+from nn.populationnetwork import PopulationNetwork
+
+# chunks of genomes per worker process when chunk size is not given, more chunks even out slower and faster genomes
+CHUNKS_PER_WORKER = 4
+
+
+def xor_fitness(phenotype):
+    """
+    Returns XOR fitness of the phenotype, 4 minus sum of squared errors on the four XOR cases (the same as
+    XorEvaluator gives).
+    :param phenotype: (NeuralNetwork) - network with 2 inputs and 1 output
+    """
+    X = np.array([[0.0, 0.0], [0.0, 1.0], [1.0, 0.0], [1.0, 1.0]])
+    y_d = np.array([0.0, 1.0, 1.0, 0.0])
+    return 4.0 - float(np.sum((phenotype.forward_batch(X)[:, 0] - y_d) ** 2))
+
+
+def _evaluate_genomes(fitness_function, genome_contents, mode):
+    # runs in worker process, genomes come in binary format (see Genome.to_bytes) and only fitness values go back
+    return [float(fitness_function(NeuralNetwork(Genome.from_bytes(content), mode=mode)))
+            for content in genome_contents]
+
+
+class Evaluator:
+    """
+    Computes fitness of the whole population at once. Generation gives all genomes to evaluate in one call, so an
+    evaluator can evaluate them together, skip already evaluated ones or split them between processes.
+    """
+
+    def evaluate(self, genomes, phenotypes=None):
+        """
+        Returns fitness of every genome.
+        :param genomes: list of Genome objects
+        :param phenotypes: optional list of NeuralNetwork objects of the genomes (in the same order), which can be used
+            instead of building new networks
+        :return: list of fitness values in order of genomes
+        """
+        raise Exception("Evaluator has to implement evaluate method")
+
+
+class XorEvaluator(Evaluator):
+    """
+    Evaluates networks on XOR of two binary numbers. All phenotypes get the same inputs, so the whole population is
+    evaluated by one PopulationNetwork pass. Fitness is number of output bits of all cases minus sum of squared errors.
+    """
+
+    def __init__(self, bits=1, cache=None):
+        """
+        :param bits: (Integer) - bits of every number, network has 2 * bits inputs and bits outputs and is evaluated
+            on all 2 ** (2 * bits) cases
+        :param cache: optional PhenotypeCache, XOR fitness is deterministic, so genomes evaluated before are skipped
+        """
+        self.bits = bits
+        self.cache = cache
+        self._X = np.array(list(itertools.product([0.0, 1.0], repeat=2 * bits)))
+        self._y_d = np.logical_xor(self._X[:, :bits], self._X[:, bits:]).astype(np.float64)
+
+    def evaluate(self, genomes, phenotypes=None):
+        if phenotypes is None:
+            phenotypes = genomes
+        if self.cache is None:
+            fitnesses = [None] * len(genomes)
+        else:
+            fitnesses = [self.cache.get_fitness(genome) for genome in genomes]
+
+        to_evaluate = [phenotype for phenotype, fitness in zip(phenotypes, fitnesses) if fitness is None]
+        if to_evaluate:
+            Y = PopulationNetwork(to_evaluate).forward_batch(self._X)
+            new_fitnesses = iter(self._y_d.size - np.sum((Y - self._y_d) ** 2, axis=(1, 2)))
+            fitnesses = [next(new_fitnesses) if fitness is None else fitness for fitness in fitnesses]
+
+        if self.cache is not None:
+            for genome, fitness in zip(genomes, fitnesses):
+                self.cache.add_fitness(genome, fitness)
+        return fitnesses
+
+
+class ProcessEvaluator(Evaluator):
+    """
+    Evaluates phenotypes in worker processes. Genomes are sent to workers in compact binary format (see
+    Genome.to_bytes), workers build phenotypes from them, run the fitness function and send back only fitness
+    values. Fitness function does not have to be deterministic.
+    """
+
+    def __init__(self, fitness_function, workers=None, chunk_size=None, mode='compiled', pool=None):
+        """
+        :param fitness_function: function taking NeuralNetwork and returning its fitness, it has to be picklable
+            (defined at module level), for example xor_fitness
+        :param workers: (Integer) - number of worker processes, by default number of CPUs. With 1 worker and no pool
+            phenotypes are evaluated in this process
+        :param chunk_size: (Integer) - number of genomes sent to a worker at once, by default genomes are split into
+            CHUNKS_PER_WORKER chunks per worker
+        :param mode: (String) - evaluation mode of phenotypes built by workers (see NeuralNetwork.MODES)
+        :param pool: multiprocessing.Pool to use instead of a new one, so workers can be kept between generations
+        """
+        self.fitness_function = fitness_function
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.pool = pool
+
+    def evaluate(self, genomes, phenotypes=None):
+        if not genomes:
+            return []
+        if self.workers == 1 and self.pool is None:
+            if phenotypes is None:
+                phenotypes = [NeuralNetwork(genome, mode=self.mode) for genome in genomes]
+            return [float(self.fitness_function(phenotype)) for phenotype in phenotypes]
+
+        chunk_size = self.chunk_size
+        if chunk_size is None:
+            chunk_size = max(1, math.ceil(len(genomes) / (self.workers * CHUNKS_PER_WORKER)))
+        contents = [genome.to_bytes() for genome in genomes]
+        tasks = [(self.fitness_function, contents[start:start + chunk_size], self.mode)
+                 for start in range(0, len(contents), chunk_size)]
+        if self.pool is not None:
+            results = self.pool.starmap(_evaluate_genomes, tasks)
+        else:
+            with multiprocessing.Pool(self.workers) as pool:
+                results = pool.starmap(_evaluate_genomes, tasks)
+        return [fitness for chunk_fitnesses in results for fitness in chunk_fitnesses]
+
+
+class TetrisEvaluator(ProcessEvaluator):
+    """
+    Lets every network play Tetris (see evolution.tetris.play_tetris). Games of different networks don't share inputs,
+    so the population is split between worker processes instead.
+    """
+
+    def __init__(self, games=1, max_frames=1000, seed=0, workers=None, chunk_size=None, pool=None):
+        """
+        :param games: (Integer) - games played by every network, fitness is their average
+        :param max_frames: (Integer) - game is stopped after this many frames
+        :param seed: (Integer) - seed of stones, all networks get the same stones
+        :param workers: (Integer) - number of worker processes (see ProcessEvaluator)
+        :param chunk_size: (Integer) - number of genomes sent to a worker at once (see ProcessEvaluator)
+        :param pool: multiprocessing.Pool to use instead of a new one
+        """
+        fitness_function = functools.partial(play_tetris, games=games, max_frames=max_frames, seed=seed)
+        super().__init__(fitness_function, workers, chunk_size, pool=pool)
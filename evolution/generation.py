@@ -1,15 +1,20 @@
 import random
 from nn.neuralnetwork import NeuralNetwork
-from evolution.genome import Genome
+from evolution.genome import ConnectionGene
+from evolution.innovationregistry import InnovationRegistry
+from evolution.mutation import mutate_population
+from evolution.distance import compatibility_distances
+from evolution.evaluator import XorEvaluator, ProcessEvaluator, xor_fitness
 import math
 import numpy as np
 
 
 class PhenotypesHandler:
-    def __init__(self, phenotypes):
+    def __init__(self, phenotypes, cache=None):
         self._input = input
         self._neural_networks = phenotypes
         self._signal_provider = None
+        self._cache = cache
 
         self._connect_to_signals_provider()
 
@@ -23,24 +28,35 @@ class PhenotypesHandler:
 
 
     def run_all_phenotypes2(self):
-        if Generation.best_genome is None:
-            Generation.best_genome = self._neural_networks[0]._genome
-
-        for nn in self._neural_networks:
-            fitness = 4.0
+        self.run_evaluator(XorEvaluator(cache=self._cache))
 
-            Y1 = nn.forward([0.0, 0.0])
-            fitness -= ((Y1[0] - 0) ** 2)
-
-            Y2 = nn.forward([0.0, 1.0])
-            fitness -= ((Y2[0] - 1) ** 2)
+    def run_evaluator(self, evaluator):
+        """
+        Evaluates all phenotypes by one call of the evaluator and sets fitness of their genomes.
+        :param evaluator: (Evaluator) - for example XorEvaluator or TetrisEvaluator
+        """
+        genomes = [nn._genome for nn in self._neural_networks]
+        if not genomes:
+            return
+        if Generation.best_genome is None:
+            Generation.best_genome = genomes[0]
 
-            Y3 = nn.forward([1.0, 0.0])
-            fitness -= ((Y3[0] - 1) ** 2)
+        fitnesses = evaluator.evaluate(genomes, self._neural_networks)
+        if len(fitnesses) != len(genomes):
+            raise Exception("Evaluator returned {!s} fitness values for {!s} genomes".format(len(fitnesses),
+                                                                                           len(genomes)))
+        self._set_fitnesses(fitnesses)
 
-            Y4 = nn.forward([1.0, 1.0])
-            fitness -= ((Y4[0] - 0) ** 2)
+    def run_all_phenotypes_in_processes(self, fitness_function, workers=None, chunk_size=None, mode='compiled',
+                                        pool=None):
+        """
+        Evaluates phenotypes in worker processes, parameters are the same as of ProcessEvaluator. Fitness cache is not
+        used, fitness function does not have to be deterministic.
+        """
+        self.run_evaluator(ProcessEvaluator(fitness_function, workers, chunk_size, mode, pool))
 
+    def _set_fitnesses(self, fitnesses):
+        for nn, fitness in zip(self._neural_networks, fitnesses):
             nn._genome.fitness = (fitness)
             if fitness > Generation.best_genome.fitness:
                 Generation.best_genome = nn._genome
@@ -48,29 +64,7 @@ class PhenotypesHandler:
 
 
     def run_all_phenotypes4(self):
-        if Generation.best_genome is None:
-            Generation.best_genome = self._neural_networks[0]._genome
-
-        for nn in self._neural_networks:
-            fitness = 256.0 * 4
-
-            bits = [0.0, 1.0]
-            for i in range(256):
-                Y = []
-                for j in range(8):
-                    Y.append(np.random.choice(bits))
-                out = nn.forward(Y)
-                y_d = np.logical_xor(Y[:4], Y[4:8])
-                fitness -= ((out[0] - y_d[0]) ** 2)
-                fitness -= ((out[1] - y_d[1]) ** 2)
-                fitness -= ((out[2] - y_d[2]) ** 2)
-                fitness -= ((out[3] - y_d[3]) ** 2)
-
-            nn._genome.fitness = (fitness)
-            if fitness > Generation.best_genome.fitness:
-                Generation.best_genome = nn._genome
-                Generation.best_fitnesses[Generation._GENERATION_ID - 1] = fitness
-
+        self.run_evaluator(XorEvaluator(bits=4))
 
     def get_phenotypes_fitness_scores(self):
         phenotypes_fitnesses = []
@@ -94,10 +88,22 @@ class Generation:
     best_fitnesses = {}
     _GENERATION_ID = 0
 
-    def __init__(self, groups=None, mutation_coefficients=None, compatibility_coefficients=None, compatibility_threshold=6.0, logger=None):
+    def __init__(self, groups=None, mutation_coefficients=None, compatibility_coefficients=None, compatibility_threshold=6.0, logger=None,
+                 parent_phenotypes=None, phenotype_cache=None, innovation_registry=None, compaction_age=None,
+                 evaluator=None):
 
         self.groups = {}
         self.phenotypes = []
+        # phenotypes of previous generation by genome, offsprings copied from those genomes are patched from them
+        self.parent_phenotypes = parent_phenotypes if parent_phenotypes is not None else {}
+        # optional PhenotypeCache shared by all generations
+        self.phenotype_cache = phenotype_cache
+        # InnovationRegistry shared by all generations, gives the same numbers to the same mutations in a generation
+        self.innovation_registry = innovation_registry
+        # genes disabled for at least this many generations are archived before reproduction, None turns it off
+        self.compaction_age = compaction_age
+        # Evaluator computing fitness of all phenotypes at once, XOR by default
+        self.evaluator = evaluator if evaluator is not None else XorEvaluator(cache=phenotype_cache)
         self.logger = None
         self.handler = None
 
@@ -108,14 +114,35 @@ class Generation:
         self.id = self.get_unique_generation_id()
 
         self._initialize_groups(groups)
+        self._initialize_innovation_registry()
         self._initialize_coefficients(mutation_coefficients, compatibility_coefficients, compatibility_threshold)
         self._initialize_logger(logger)
 
     def _initialize_groups(self, groups):
         if groups is not None:
             for group in groups:
+                # groups with the same ID would replace each other together with their genomes
+                if group.get_id() in self.groups:
+                    raise Exception("Group IDs must be unique, there are two groups with ID {!s}".format(
+                        group.get_id()))
                 self.groups[group.get_id()] = group
 
+    def _initialize_innovation_registry(self):
+        max_node_id = max((genome._get_max_node_id() for group in self.groups.values() for genome in group.genomes),
+                          default=0)
+        if self.innovation_registry is None:
+            # genomes can come with innovation numbers the global counter hasn't given out (read from a file or
+            # created with explicit numbers), new genes must not reuse them
+            max_innovation_number = max((connection[4] for group in self.groups.values() for genome in group.genomes
+                                         for connection in genome._get_connections_with_innovations()), default=-1)
+            ConnectionGene._skip_innovation_numbers(max_innovation_number)
+            self.innovation_registry = InnovationRegistry(next_innovation_number=ConnectionGene._innovation_number,
+                                                          next_node_id=max_node_id + 1)
+        else:
+            # registry given by caller may not know nodes of this population, genome constructors keep the global
+            # innovation counter ahead of innovation numbers, which registry never goes below
+            self.innovation_registry.advance(next_node_id=max_node_id + 1)
+
     def _initialize_logger(self, logger):
         if logger is not None:
             self.logger = logger
@@ -152,7 +179,7 @@ class Generation:
         self.create_phenotypes()
         if self.logger is not None:
             self.logger.log_phenotypes(self.id, self.phenotypes)
-        self.run_phenotypes2()
+        self.run_evaluator()
 
         if self.logger is not None:
             self.logger.log_phenotypes_fitness_scores(self.id)
@@ -175,6 +202,8 @@ class Generation:
         self._remove_stale_groups(offspring_count)
 
         # And now we create offsprings for every group
+        self.innovation_registry.next_generation()
+        self.compact_genomes()
         new_groups = []
         left_genomes = []
         for (group_key, group_offspring_amount) in offspring_count.items():
@@ -183,23 +212,73 @@ class Generation:
             new_groups.append(Group(group_key, self.get_offsprings_from_group(group_key, group_offspring_amount, left_genomes)))
         self._handle_left_genomes(new_groups, left_genomes)
         # And return new generation
+        parent_phenotypes = dict((phenotype.get_genome(), phenotype) for phenotype in self.phenotypes)
         return Generation(new_groups, self.mutation_coefficients, self.compatibility_coefficients,
-                          self.compatibility_threshold, self.logger)
+                          self.compatibility_threshold, self.logger, parent_phenotypes, self.phenotype_cache,
+                          self.innovation_registry, self.compaction_age, self.evaluator)
+
+    def compact_genomes(self):
+        """
+        Archives genes of all genomes, which were disabled for at least compaction_age generations (see
+        Genome.compact), and logs number of genes before and after the compaction.
+        """
+        if self.compaction_age is None:
+            return
+        disabled_before = self.innovation_registry.get_generation_clock(self.compaction_age)
+        if disabled_before is None:
+            return
+
+        genes_before, archived = 0, 0
+        for group in self.groups.values():
+            for genome in group.genomes:
+                genes_before += len(genome.get_connections())
+                archived += genome.compact(disabled_before)
+        if self.logger is not None:
+            self.logger.log_gene_counts(self.id, genes_before, genes_before - archived)
 
     def create_phenotypes(self):
         for group in self.groups.values():
             for genome in group.genomes:
-                self.phenotypes.append(NeuralNetwork(genome))
+                self.phenotypes.append(self._create_phenotype(genome))
+                # drop references to previous generation
+                genome.parent = None
+                genome.mutations = []
+        self.parent_phenotypes = {}
+
+    def _create_phenotype(self, genome):
+        phenotype = None
+        if self.phenotype_cache is not None:
+            phenotype = self.phenotype_cache.get_phenotype(genome)
+        if phenotype is not None:
+            return phenotype
+
+        parent_phenotype = self.parent_phenotypes.get(genome.parent) if genome.parent is not None else None
+        if parent_phenotype is not None:
+            phenotype = parent_phenotype.derive(genome)
+        else:
+            phenotype = NeuralNetwork(genome)
+
+        if self.phenotype_cache is not None:
+            self.phenotype_cache.add_phenotype(phenotype)
+        return phenotype
 
     def run_phenotypes(self):
         self.handler = PhenotypesHandler(self.phenotypes)
         self.handler.run_all_phenotypes()
 
+    def run_evaluator(self):
+        self.handler = PhenotypesHandler(self.phenotypes, self.phenotype_cache)
+        self.handler.run_evaluator(self.evaluator)
+
     def run_phenotypes2(self):
-        self.handler = PhenotypesHandler(self.phenotypes)
+        self.handler = PhenotypesHandler(self.phenotypes, self.phenotype_cache)
         self.handler.run_all_phenotypes2()
 
 
+    def run_phenotypes_in_processes(self, fitness_function=xor_fitness, workers=None, chunk_size=None, pool=None):
+        self.handler = PhenotypesHandler(self.phenotypes)
+        self.handler.run_all_phenotypes_in_processes(fitness_function, workers, chunk_size, pool=pool)
+
     def run_phenotypes4(self):
         self.handler = PhenotypesHandler(self.phenotypes)
         self.handler.run_all_phenotypes4()
@@ -277,35 +356,38 @@ class Generation:
         offsprings = []
 
         while(len(offsprings) != group_offspring_amount):
-            first_parent = random.choice(parents)
-            second_parent = random.choice(parents)
-            # Make a child
-            offspring = Genome.reproduce(first_parent, second_parent)
-            # Mutate it
-            offspring.mutate(self.mutation_coefficients)
-            # Now try to fit it into this group
-            if self._is_group_fitting_for_offspring(group_to_reproduce.get_representative(), offspring):
-                offsprings.append(offspring)
-            else:
-                left_genomes.append(offspring)
+            # Make as many children as are still missing
+            cohort = []
+            for i in range(group_offspring_amount - len(offsprings)):
+                first_parent = random.choice(parents)
+                second_parent = random.choice(parents)
+                cohort.append(type(first_parent).reproduce(first_parent, second_parent))
+            # Mutate them all at once
+            mutate_population(cohort, self.mutation_coefficients, self.innovation_registry)
+            # Now try to fit them into this group
+            for offspring in cohort:
+                if self._is_group_fitting_for_offspring(group_to_reproduce.get_representative(), offspring):
+                    offsprings.append(offspring)
+                else:
+                    left_genomes.append(offspring)
 
         return offsprings
 
     def _is_group_fitting_for_offspring(self, representative, offspring):
         #print(str(offspring.compatibility_distance(representative, self.compatibility_coefficients)))
-        return offspring.compatibility_distance(representative, self.compatibility_coefficients) < self.compatibility_threshold
+        return offspring.is_compatible(representative, self.compatibility_coefficients, self.compatibility_threshold)
 
     def _handle_left_genomes(self, new_groups, left_genomes):
         genomes_to_remove = []
-        # Check if genome fits in one of existing groups
-
-        for genome in left_genomes:
-            for group in new_groups:
-                # If it fits add genome to group and to list of genomes already handled
-                if self._is_group_fitting_for_offspring(genome, group.get_representative()):
-                    group.add_genome(genome)
-                    genomes_to_remove.append(genome)
-                    break
+        # Check if genome fits in one of existing groups, distances to all groups representatives are computed at once
+        representatives = [group.get_representative() for group in new_groups]
+        distances = compatibility_distances(left_genomes, self.compatibility_coefficients, representatives)
+        for genome, genome_distances in zip(left_genomes, distances):
+            fitting_groups = np.flatnonzero(genome_distances < self.compatibility_threshold)
+            # If it fits add genome to the first such group and to list of genomes already handled
+            if len(fitting_groups):
+                new_groups[fitting_groups[0]].add_genome(genome)
+                genomes_to_remove.append(genome)
 
         # Remove genomes that have been assigned to already existing groups
         for genome in genomes_to_remove:
@@ -1,13 +1,35 @@
 import evolution.util
+import bisect
+import math
 import random
 import copy
+import hashlib
 import json
+import struct
+from operator import attrgetter
+
+import numpy as np
+
+# binary format of genome (see Genome.to_bytes): header followed by array of genes, genes in use go first and then
+# archived genes. Header: input size, output size, number of genes in use, number of archived genes, fitness and
+# adjusted fitness (NaN for None)
+GENOME_HEADER = struct.Struct('<IIIIdd')
+# disabled_at of enabled gene is -1
+GENE_DTYPE = np.dtype([('source_id', '<u4'), ('destination_id', '<u4'), ('weight', '<f8'), ('enabled', '?'),
+                       ('innovation_number', '<u4'), ('disabled_at', '<i4')])
+# canonical form of genome (see Genome.fingerprint): header with input and output size followed by array of genes
+# sorted by innovation number
+GENES_KEY_HEADER = struct.Struct('<II')
+GENES_KEY_DTYPE = np.dtype([('innovation_number', '<i8'), ('source_id', '<i8'), ('destination_id', '<i8'),
+                            ('enabled', '?'), ('weight', '<f8')])
 
 
 class Genome:
     """
     Class representing genome in NEAT.
     """
+    # random (source, destination) pairs tried by add connection mutation before searching every candidate
+    NEW_CONNECTION_ATTEMPTS = 20
 
     def __init__(self, connections, input_size, output_size):
         """
@@ -26,14 +48,7 @@ class Genome:
             (for example for input_size 3 and output size 4, there will be 3 input nodes with IDs 1, 2 and 3 and
             4 output nodes with IDs 4, 5, 6 and 7)
         """
-        self.node_genes = {}
-        self.connection_genes = {}
-        self.input_size = input_size
-        self.output_size = output_size
-        self.input_node_ids = []
-        self.output_node_ids = []
-        self.fitness = None
-        self.adjusted_fitness = None
+        self._initialize_attributes(input_size, output_size)
 
         # standard creation of new genome
         if len(connections[0]) == 4:
@@ -48,50 +63,106 @@ class Genome:
 
         self._set_up_node_genes_types(input_size, output_size)
 
+    def _initialize_attributes(self, input_size, output_size):
+        # IDs of nodes in the genome, node types follow from input_size and output_size (see get_node_type)
+        self.node_ids = set()
+        # connection genes by (source, destination), genes can be shared with other genomes (see ConnectionGene.shared)
+        self._connection_genes = {}
+        # whether some of the genes may be shared, genes are copied before they are changed or given away
+        self._has_shared_genes = False
+        # long disabled genes moved out of _connection_genes by compact(), by (source, destination). The dictionary
+        # is shared with offsprings, so it is never changed, changed archive is a new dictionary
+        self._archive = {}
+        self.input_size = input_size
+        self.output_size = output_size
+        self.input_node_ids = []
+        self.output_node_ids = []
+        # adjacency index: node ID -> set of destination IDs of its outgoing connections (enabled or not),
+        # built when add connection mutation needs it (see _get_successors)
+        self._successors = None
+        # nodes that can be source/destination of a new connection, lists allow sampling in constant time
+        self._source_ids = []
+        self._destination_ids = []
+        # sorted views of genes and nodes, built on first use and then updated with every change (see _build_views)
+        self._genes_view = None
+        self._innovations_view = None
+        self._connections_view = None
+        self._connection_ids_view = None
+        self._nodes_view = None
+        self._node_ids_view = None
+        # digest of genes, computed by fingerprint and dropped with every change of genes
+        self._fingerprint = None
+        self.fitness = None
+        self.adjusted_fitness = None
+        # genome this one is an exact copy of (before mutation), set during reproduction
+        self.parent = None
+        # changes made by mutate(), used to patch parent's phenotype instead of building a new one
+        self.mutations = []
+
     def _create_connection_genes(self, connections):
         for connection in connections:
             source_node_id, dest_node_id, weight, enabled = connection
-            self._check_nodes(source_node_id, dest_node_id)
-
-            source_node = self.node_genes.get(source_node_id)
-            dest_node = self.node_genes.get(dest_node_id)
-
-            if source_node is None:
-                source_node = self._create_new_node(source_node_id)
-            if dest_node is None:
-                dest_node = self._create_new_node(dest_node_id)
-
-            self._check_connections_uniqueness(source_node, dest_node)
-
-            new_connection = ConnectionGene(source_node, dest_node, weight, enabled)
-            self.connection_genes[(source_node_id, dest_node_id)] = new_connection
+            self._add_connection_gene(source_node_id, dest_node_id, weight, enabled)
 
     def _create_connection_genes_with_innovation_numbers(self, connections):
         for connection in connections:
             source_node_id, dest_node_id, weight, enabled, innovation_number = connection
-            self._check_nodes(source_node_id, dest_node_id)
-
-            source_node = self.node_genes.get(source_node_id)
-            dest_node = self.node_genes.get(dest_node_id)
-
-            if source_node is None:
-                source_node = self._create_new_node(source_node_id)
-            if dest_node is None:
-                dest_node = self._create_new_node(dest_node_id)
-
-            self._check_connections_uniqueness(source_node, dest_node)
+            self._add_connection_gene(source_node_id, dest_node_id, weight, enabled, innovation_number)
+        ConnectionGene._skip_innovation_numbers(max(connection[4] for connection in connections))
+
+    def _add_connection_gene(self, source_node_id, dest_node_id, weight, enabled, innovation_number=None):
+        self._check_nodes(source_node_id, dest_node_id)
+        self._check_connections_uniqueness(source_node_id, dest_node_id)
+
+        self._add_node(source_node_id)
+        self._add_node(dest_node_id)
+
+        self._insert_connection_gene(ConnectionGene(source_node_id, dest_node_id, weight, enabled, innovation_number))
+
+    def _insert_connection_gene(self, connection):
+        # connection is not validated, it has to be unique and must not connect node with itself
+        self._add_node(connection.source_id)
+        self._add_node(connection.destination_id)
+        self._connection_genes[(connection.source_id, connection.destination_id)] = connection
+        if self._successors is not None:
+            self._successors[connection.source_id].add(connection.destination_id)
+        if self._genes_view is not None:
+            position = bisect.bisect(self._innovations_view, connection.innovation_number)
+            self._innovations_view.insert(position, connection.innovation_number)
+            self._genes_view.insert(position, connection)
+            bisect.insort(self._connections_view, connection.get_connection())
+            bisect.insort(self._connection_ids_view, (connection.source_id, connection.destination_id))
+        self._fingerprint = None
+
+    def _add_node(self, node_id):
+        if node_id in self.node_ids:
+            return
 
-            new_connection = ConnectionGene(source_node, dest_node, weight, enabled, innovation_number)
-            self.connection_genes[(source_node_id, dest_node_id)] = new_connection
+        self.node_ids.add(node_id)
+        if self._successors is not None:
+            self._successors[node_id] = set()
+        node_type = self.get_node_type(node_id)
+        if self._nodes_view is not None:
+            position = bisect.bisect(self._node_ids_view, node_id)
+            self._node_ids_view.insert(position, node_id)
+            self._nodes_view.insert(position, NodeGene(node_id, node_type))
+        if node_type != 'output':
+            self._source_ids.append(node_id)
+        if node_type != 'input':
+            self._destination_ids.append(node_id)
 
     def _set_up_node_genes_types(self, input_size, output_size):
         for index in range(1, input_size + 1):
-            self.node_genes[index].node_type = 'input'
+            self._check_node_exists(index)
             self.input_node_ids.append(index)
         for index in range(input_size + 1, input_size + 1 + output_size):
-            self.node_genes[index].node_type = 'output'
+            self._check_node_exists(index)
             self.output_node_ids.append(index)
 
+    def _check_node_exists(self, node_id):
+        if node_id not in self.node_ids:
+            raise Exception('Node {!s} is not connected'.format(node_id))
+
     def _check_nodes(self, source_node_id, dest_node_id):
         if source_node_id is None and dest_node_id is None:
             raise Exception("Both nodes are empty")
@@ -102,120 +173,345 @@ class Genome:
         if source_node_id == dest_node_id:
             raise Exception('ID\'s are equal')
 
-    def _check_connections_uniqueness(self, source_node, dest_node):
-        if (source_node.node_id, dest_node.node_id) in self.connection_genes:
+    def _check_connections_uniqueness(self, source_node_id, dest_node_id):
+        if (source_node_id, dest_node_id) in self._connection_genes or (source_node_id, dest_node_id) in self._archive:
             raise Exception('Connections must be unique')
 
     def _create_new_node(self, node_id=None):
         if node_id is None:
-            node_id = len(self.node_genes) + 1
-        self.node_genes[node_id] = NodeGene(node_id=node_id)
+            node_id = self._get_max_node_id() + 1
+        self._add_node(node_id)
 
-        return self.node_genes[node_id]
+        return node_id
+
+    def _get_max_node_id(self):
+        return max(self.node_ids)
+
+    def get_node_type(self, node_id):
+        """
+        Returns type of node with given ID: 'input', 'output' or 'hidden'.
+        """
+        if node_id <= self.input_size:
+            return 'input'
+        if node_id <= self.input_size + self.output_size:
+            return 'output'
+        return 'hidden'
 
     def get_connections_ids(self):
         """
-        Returns unordered list of tuples representing connection IDs( [(x, y),...] where
+        Returns sorted list of tuples representing connection IDs( [(x, y),...] where
                                                                                 x - source noce ID(Integer),
                                                                                 y - destination node ID(Integer)
+        Returned list is kept by the genome and must not be modified.
         """
-        return sorted([(s_id, d_id) for s_id, d_id in self.connection_genes.keys()])
+        self._build_views()
+        return self._connection_ids_view
 
     def get_connections(self):
         """
-        Returns unordered list of tuples representing connections( [(x, y, w, e)] where
+        Returns sorted list of tuples representing connections( [(x, y, w, e)] where
                                                                             x - source node ID(Integer),
                                                                             y - destination node ID(Integer),
                                                                             w - weight of connection(float),
                                                                             e - flag if connection is enabled(boolean)
+        Returned list is kept by the genome and must not be modified.
         """
-        return sorted([connection.get_connection() for connection in self.connection_genes.values()])
+        self._build_views()
+        return self._connections_view
 
     def get_nodes(self):
         """
         Returns ordered (by NodeGene ID) list of NodeGene objects that are in the genome.
+        Returned list is kept by the genome and must not be modified.
+        """
+        self._build_views()
+        return self._nodes_view
+
+    def _build_views(self):
+        if self._genes_view is not None:
+            return
+
+        self._genes_view = sorted(self._connection_genes.values(), key=attrgetter('innovation_number'))
+        self._innovations_view = [connection.innovation_number for connection in self._genes_view]
+        self._connections_view = sorted(connection.get_connection() for connection in self._genes_view)
+        self._connection_ids_view = [(s_id, d_id) for s_id, d_id, _, _ in self._connections_view]
+        self._node_ids_view = sorted(self.node_ids)
+        self._nodes_view = [NodeGene(node_id, self.get_node_type(node_id)) for node_id in self._node_ids_view]
+
+    def _clear_views(self):
+        self._genes_view = None
+        self._innovations_view = None
+        self._connections_view = None
+        self._connection_ids_view = None
+        self._nodes_view = None
+        self._node_ids_view = None
+        self._fingerprint = None
+
+    def _copy_views(self, other):
+        if other._genes_view is None:
+            return
+
+        self._genes_view = list(other._genes_view)
+        self._innovations_view = list(other._innovations_view)
+        self._connections_view = list(other._connections_view)
+        self._connection_ids_view = list(other._connection_ids_view)
+        self._node_ids_view = list(other._node_ids_view)
+        self._nodes_view = list(other._nodes_view)
+        self._fingerprint = other._fingerprint
+
+    def _replace_in_views(self, old_connection, new_connection):
+        # connections have the same source, destination and innovation number, weight or enabled flag can differ
+        self._fingerprint = None
+        if self._genes_view is None:
+            return
+
+        position = bisect.bisect_left(self._innovations_view, old_connection.innovation_number)
+        while self._genes_view[position] is not old_connection:
+            position += 1
+        self._genes_view[position] = new_connection
+        position = bisect.bisect_left(self._connections_view, (old_connection.source_id,
+                                                               old_connection.destination_id))
+        self._connections_view[position] = new_connection.get_connection()
+
+    @property
+    def connection_genes(self):
+        """
+        Dictionary of ConnectionGene objects by (source, destination). Genes shared with other genomes are copied
+        first, so returned genes can be changed without affecting other genomes. Archived genes are not included.
+        Returned genes can be changed by anyone, so views and adjacency index are built again when needed.
+        """
+        self._materialize_genes()
+        self._clear_views()
+        self._successors = None
+        return self._connection_genes
+
+    def _materialize_genes(self):
+        if not self._has_shared_genes:
+            return
+
+        for key, connection in self._connection_genes.items():
+            if connection.shared:
+                self._connection_genes[key] = connection.copy()
+        self._has_shared_genes = False
+
+    def _change_connection(self, connection, weight, enabled):
+        """
+        Sets weight and enabled flag of connection and returns it. Shared connection is replaced by this genome's own
+        copy first (copy on write).
+        """
+        new_connection = connection.copy() if connection.shared else connection
+        new_connection.weight = weight
+        if connection.enabled and not enabled:
+            new_connection.disabled_at = ConnectionGene._innovation_number
+        elif enabled:
+            new_connection.disabled_at = None
+        new_connection.enabled = enabled
+        self._connection_genes[(new_connection.source_id, new_connection.destination_id)] = new_connection
+        self._replace_in_views(connection, new_connection)
+        return new_connection
+
+    def _get_connections_with_innovations(self):
+        # archived genes are included
+        return [connection.get_connection() + (connection.innovation_number,)
+                for genes in (self._connection_genes, self._archive) for connection in genes.values()]
+
+    def compact(self, disabled_before):
+        """
+        Moves genes which were disabled for a long time to the archive. Archived genes are not used by phenotypes,
+        compatibility distance, fingerprint and get_connections, but their connections can not be added again and
+        crossover can take them from the archive (see _crossover), so they can be enabled again.
+        :param disabled_before: (Integer) - genes disabled when ConnectionGene._innovation_number was lower than this
+            value are archived (see InnovationRegistry.get_generation_clock)
+        :return: number of archived genes
+        """
+        keys = [key for key, connection in self._connection_genes.items()
+                if not connection.enabled and connection.disabled_at < disabled_before]
+        self._move_to_archive(keys)
+        return len(keys)
+
+    def get_archived_connections(self):
+        """
+        Returns sorted list of tuples representing archived connections, in the same format as get_connections.
+        """
+        return sorted(connection.get_connection() for connection in self._archive.values())
+
+    def _move_to_archive(self, keys):
+        if not keys:
+            return
+
+        archive = dict(self._archive)
+        for key in keys:
+            connection = self._connection_genes.pop(key)
+            # archive is shared with offsprings
+            connection.shared = True
+            archive[key] = connection
+        self._archive = archive
+        self._clear_views()
+
+    def fingerprint(self):
         """
-        return [node for (key, node) in sorted(self.node_genes.items())]
+        Returns canonical fingerprint of this genome, digest of its genes key (see get_genes_key). Genomes with the same
+        input and output sizes and the same connection genes (innovation number, source, destination, enabled flag and
+        weight) have equal fingerprints, different genomes have different fingerprints (unless a collision of 128 bit
+        digests happens).
+        """
+        if self._fingerprint is None:
+            self._fingerprint = get_fingerprint(self.get_genes_key())
+        return self._fingerprint
 
-    def mutate(self, coefficients):
+    def get_genes_key(self):
+        """
+        Returns canonical form of this genome as bytes, input and output sizes and connection genes sorted by
+        innovation number (see GENES_KEY_DTYPE). Genomes have equal keys if and only if they have the same genes.
+        Archived genes are not included.
+        """
+        genes = self._get_sorted_genes()
+        key = np.array([(c.innovation_number, c.source_id, c.destination_id, c.enabled, c.weight) for c in genes],
+                       dtype=GENES_KEY_DTYPE)
+        return GENES_KEY_HEADER.pack(self.input_size, self.output_size) + key.tobytes()
+
+    def mutate(self, coefficients, registry=None):
         """
         Mutates genome. Mutation can:
         1. add a connection,
         2. add a node (4 -> 5 ==> 4 -> 9 -> 5),
         3. change connection weight.
         :param coefficients: dictionary with mutation coefficients
+        :param registry: (InnovationRegistry) - optional registry assigning innovation numbers and node IDs, so the same
+            structural mutation gets the same numbers in every genome of the generation
         """
         # each coefficient represent probability between [0;1]
         if random.uniform(0.0, 1.0) <= coefficients['add_connection']:
-            self._mutate_new_connection(coefficients['new_connection_abs_max_weight'])
+            self._mutate_new_connection(coefficients['new_connection_abs_max_weight'], registry)
 
         if random.uniform(0.0, 1.0) <= coefficients['split_connection']:
-            self._mutate_split_connection()
+            self._mutate_split_connection(registry)
 
         if random.uniform(0.0, 1.0) <= coefficients['change_weight']:
             self._mutate_change_weight(coefficients['max_weight_mutation'])
 
-    def _mutate_new_connection(self, max_weight):
-        # build lists of possible indexes
-        possible_source_indexes = [idx for idx in range(1, len(self.node_genes) + 1)
-                                   if idx not in self.output_node_ids]
-        possible_destination_indexes = [idx for idx in range(1, len(self.node_genes) + 1)
-                                        if idx not in self.input_node_ids]
-
-        # produce every possible connection not already in connection_genes
-        possible_connections = [(s, d)
-                                for s in possible_source_indexes
-                                for d in possible_destination_indexes
-                                if s != d and (s, d) not in self.connection_genes]
+    def _mutate_new_connection(self, max_weight, registry=None):
+        new_connection = self._sample_new_connection()
 
         # if no new connection possible, end mutation
-        if not possible_connections:
+        if new_connection is None:
             return
 
-        # choose random new connection
-        new_connection = random.choice(possible_connections)
-
         # get connection parameters
         source_id = new_connection[0]
-        source_node = self.node_genes[source_id]
         destination_id = new_connection[1]
-        destination_node = self.node_genes[destination_id]
         weight = random.normalvariate(mu=0.0, sigma=max_weight / 2)
         enable = True
+        innovation_number = None
+        if registry is not None:
+            innovation_number = registry.get_connection_innovation(source_id, destination_id)
 
         # create new connection
-        self.connection_genes[(source_id, destination_id)] = ConnectionGene(source_node, destination_node, weight,
-                                                                            enable)
+        self._insert_connection_gene(ConnectionGene(source_id, destination_id, weight, enable, innovation_number))
+        self.mutations.append(('connection', source_id, destination_id, weight))
 
-    def _mutate_split_connection(self):
+    def _sample_new_connection(self):
+        """
+        Returns random (source, destination) pair which is not in the genome yet and would not create a loop,
+        or None if there is no such pair.
+        """
+        successors = self._get_successors()
+        # in sparse genomes a random pair is very likely to be valid
+        for _ in range(Genome.NEW_CONNECTION_ATTEMPTS):
+            source_id = random.choice(self._source_ids)
+            destination_id = random.choice(self._destination_ids)
+            if self._is_new_connection_valid(source_id, destination_id):
+                return source_id, destination_id
+
+        # (nearly) saturated genome, search candidates of every source in random order
+        predecessors = self._get_predecessors()
+        source_ids = list(self._source_ids)
+        random.shuffle(source_ids)
+        for source_id in source_ids:
+            ancestors = self._get_reachable(source_id, predecessors)
+            possible_destinations = [d for d in self._destination_ids
+                                     if d not in successors[source_id] and d not in ancestors]
+            if possible_destinations:
+                return source_id, random.choice(possible_destinations)
+
+        return None
+
+    def _is_new_connection_valid(self, source_id, destination_id):
+        successors = self._get_successors()
+        if source_id == destination_id or destination_id in successors[source_id]:
+            return False
+
+        # connection source -> destination closes a loop if source is reachable from destination
+        return source_id not in self._get_reachable(destination_id, successors, source_id)
+
+    def _get_successors(self):
+        if self._successors is None:
+            self._successors = dict((node_id, set()) for node_id in self.node_ids)
+            # archived connections can be enabled again by crossover, so they can not be added nor close a loop
+            for genes in (self._connection_genes, self._archive):
+                for (source_id, dest_id) in genes:
+                    self._successors[source_id].add(dest_id)
+        return self._successors
+
+    @staticmethod
+    def _get_reachable(start_id, adjacency, target_id=None):
+        """
+        Returns set of nodes reachable from start_id (including it) in given adjacency index.
+        Search stops early when target_id is reached.
+        """
+        reachable = {start_id}
+        stack = [start_id]
+        while stack:
+            for next_id in adjacency[stack.pop()]:
+                if next_id not in reachable:
+                    reachable.add(next_id)
+                    if next_id == target_id:
+                        return reachable
+                    stack.append(next_id)
+        return reachable
+
+    def _get_predecessors(self):
+        predecessors = dict((node_id, []) for node_id in self.node_ids)
+        for genes in (self._connection_genes, self._archive):
+            for (source_id, dest_id) in genes:
+                predecessors[dest_id].append(source_id)
+        return predecessors
+
+    def _mutate_split_connection(self, registry=None):
         connection = self._get_random_enabled_connection()
 
         if connection is None:
             return
 
         # disable this connection
-        connection.enabled = False
+        connection = self._change_connection(connection, connection.weight, False)
 
         # get old connection parameters
         (old_source_id, old_dest_id, old_weight, _) = connection.get_connection()
-        old_source_node = self.node_genes[old_source_id]
-        old_dest_node = self.node_genes[old_dest_id]
 
         # create new node
-        new_node = self._create_new_node()
-        new_node_id = new_node.node_id
+        first_innovation, second_innovation = None, None
+        if registry is not None:
+            new_node_id, first_innovation, second_innovation = registry.get_split(old_source_id, old_dest_id,
+                                                                                  self._get_max_node_id() + 1)
+            self._create_new_node(new_node_id)
+        else:
+            new_node_id = self._create_new_node()
 
         # create connection source -> new_node
-        first_connection = ConnectionGene(old_source_node, new_node, weight=1.0, enabled=True)
-        self.connection_genes[(old_source_id, new_node_id)] = first_connection
+        first_connection = ConnectionGene(old_source_id, new_node_id, weight=1.0, enabled=True,
+                                          innovation_number=first_innovation)
+        self._insert_connection_gene(first_connection)
 
         # create connection new_node -> destination
-        second_connection = ConnectionGene(new_node, old_dest_node, weight=old_weight, enabled=True)
-        self.connection_genes[(new_node_id, old_dest_id)] = second_connection
+        second_connection = ConnectionGene(new_node_id, old_dest_id, weight=old_weight, enabled=True,
+                                           innovation_number=second_innovation)
+        self._insert_connection_gene(second_connection)
+        self.mutations.append(('split', old_source_id, old_dest_id, new_node_id, old_weight))
 
     def _get_random_enabled_connection(self):
         # build enabled connection pool
-        enabled_connections = [c for key, c in self.connection_genes.items() if c.enabled]
+        enabled_connections = [c for c in self._connection_genes.values() if c.enabled]
 
         if not enabled_connections:
             return None
@@ -231,26 +527,48 @@ class Genome:
 
         # generate new weight by adding value from N(0, MAX/2) -> chance for value exceeding MAX is ~2%
         # chance for value exceeding MAX twice is 0.003%
-        connection.weight = connection.weight + random.normalvariate(mu=0.0, sigma=max_weight_change / 2)
+        connection = self._change_connection(connection,
+                                             connection.weight + random.normalvariate(mu=0.0, sigma=max_weight_change / 2),
+                                             connection.enabled)
+        (source_id, dest_id, weight, _) = connection.get_connection()
+        self.mutations.append(('weight', source_id, dest_id, weight))
+
+    def _change_random_weight(self, positions, change):
+        """
+        Adds change to weight of random enabled connection, used by evolution.mutation.mutate_population.
+        :param positions: numbers from [0;1) picking connections, the first enabled one is changed
+        """
+        # sorted view is kept up to date by mutations, so no list of genes is built here
+        connections = self._get_sorted_genes()
+        if not connections:
+            return
+        for position in positions:
+            connection = connections[int(position * len(connections))]
+            if connection.enabled:
+                break
+        else:
+            # mostly disabled connections, pick from enabled ones
+            connection = self._get_random_enabled_connection()
+            if connection is None:
+                return
+
+        connection = self._change_connection(connection, connection.weight + change, connection.enabled)
+        (source_id, dest_id, weight, _) = connection.get_connection()
+        self.mutations.append(('weight', source_id, dest_id, weight))
 
     def compatibility_distance(self, partner, coefficients):
         """
         Returns compatibility distance between this genome and partner.
-        The greater, the more the genomes differ.
+        The greater, the more the genomes differ. Archived genes are not compared.
         :param partner:(Genome) Genome object to mate with
         :param coefficients: dictionary with compatibility distance factors
         """
-        connections_a = self.connection_genes.values()
-        connections_b = partner.connection_genes.values()
+        connections_a = self._get_sorted_genes()
+        connections_b = partner._get_sorted_genes()
 
-        excess_number = evolution.util.count_excess_connection_genes(connections_a, connections_b)
-        disjoint_number = evolution.util.count_disjoint_connection_genes(connections_a, connections_b)
-        avg_weight_difference = evolution.util.count_avg_weight_difference(connections_a, connections_b)
-        normalization_factor = float(max(len(connections_a), len(connections_b)))
-
-        # "N can be set to 1 if both genomes are small, i.e. consist of fewer than 20 genes"
-        if normalization_factor < 20.0:
-            normalization_factor = 1.0
+        excess_number, disjoint_number, avg_weight_difference = evolution.util.compare_connection_genes(connections_a,
+                                                                                                       connections_b)
+        normalization_factor = Genome._get_normalization_factor(connections_a, connections_b)
 
         excess_component = coefficients['excess_factor'] * excess_number / normalization_factor
         disjoint_component = coefficients['disjoint_factor'] * disjoint_number / normalization_factor
@@ -258,6 +576,35 @@ class Genome:
 
         return excess_component + disjoint_component + weight_difference_component
 
+    def is_compatible(self, partner, coefficients, threshold):
+        """
+        Tells whether compatibility distance between this genome and partner is lower than threshold, the same as
+        compatibility_distance(partner, coefficients) < threshold. Comparison of genes stops as soon as the answer
+        is known, so clearly different genomes are rejected quickly.
+        :param partner:(Genome) Genome object to compare with
+        :param coefficients: dictionary with compatibility distance factors
+        :param threshold: (float) - compatibility threshold
+        """
+        connections_a = self._get_sorted_genes()
+        connections_b = partner._get_sorted_genes()
+        return evolution.util.is_compatibility_distance_lower(
+            connections_a, connections_b, coefficients, Genome._get_normalization_factor(connections_a, connections_b),
+            threshold)
+
+    def _get_innovations_and_weights(self):
+        # innovation numbers and weights of genes sorted by innovation number, used by evolution.distance
+        self._build_views()
+        return self._innovations_view, [connection.weight for connection in self._genes_view]
+
+    @staticmethod
+    def _get_normalization_factor(connections_a, connections_b):
+        normalization_factor = float(max(len(connections_a), len(connections_b)))
+
+        # "N can be set to 1 if both genomes are small, i.e. consist of fewer than 20 genes"
+        if normalization_factor < 20.0:
+            normalization_factor = 1.0
+        return normalization_factor
+
     @staticmethod
     def reproduce(parent1, parent2):
         """
@@ -278,58 +625,132 @@ class Genome:
 
     @staticmethod
     def _reproduce_equal_genomes(parent1, parent2):
-        child_connections_with_innovs = {}
-
-        # generate dictionaries as (innovation_number, connection)
-        parent1_connections = dict((conn.innovation_number, conn) for (key, conn) in parent1.connection_genes.items())
-        parent2_connections = dict((conn.innovation_number, conn) for (key, conn) in parent2.connection_genes.items())
-
-        # get set of every innovation number existing in either collection
-        innovation_numbers = set(parent1_connections.keys()).union(set(parent2_connections.keys()))
-
-        # generate child connections with innovation numbers
-        for innov in innovation_numbers:
-            connection_gene = None
-            if innov in parent1_connections and innov in parent2_connections:
-                connection_gene = random.choice([parent1_connections[innov], parent2_connections[innov]])
-            elif innov in parent1_connections:
-                connection_gene = parent1_connections[innov]
-            elif innov in parent2_connections:
-                connection_gene = parent2_connections[innov]
-
-            (source_id, dest_id, weight, enabled) = connection_gene.get_connection()
-            connection_with_innov = (source_id, dest_id, weight, enabled, innov)
-            child_connections_with_innovs[(source_id, dest_id)] = connection_with_innov
-
-        # both parents have to have the same input and output sizes
-        input_size = parent1.input_size
-        output_size = parent1.output_size
-
-        return Genome(list(child_connections_with_innovs.values()), input_size, output_size)
+        return Genome._crossover(parent1, parent2, take_all=True)
 
     @staticmethod
     def _reproduce_stronger_with_weaker(stronger, weaker):
-        child_connections_with_innovs = {}
+        return Genome._crossover(stronger, weaker, take_all=False)
 
-        # generate dictionaries as (innovation_number, connection)
-        stronger_connections = dict((conn.innovation_number, conn) for (key, conn) in stronger.connection_genes.items())
-        weaker_connections = dict((conn.innovation_number, conn) for (key, conn) in weaker.connection_genes.items())
-
-        # generate child connections with innovation numbers
-        for innov, stronger_conn in stronger_connections.items():
-            if innov in weaker_connections:
-                connection_gene = random.choice([stronger_conn, weaker_connections[innov]])
+    @staticmethod
+    def _crossover(parent1, parent2, take_all):
+        """
+        Merges connection genes of both parents, sorted by innovation number, in one pass. Matching genes are inherited
+        from random parent, disjoint and excess genes are inherited from parent1 and, if take_all is set, from parent2.
+        Gene archived by one parent (see compact) matches the same gene of the other parent, so archived gene can be
+        enabled again in the child. Child's genes are not validated, genes of valid parents are valid.
+        """
+        genes1 = parent1._get_sorted_genes()
+        genes2 = parent2._get_sorted_genes()
+        # one random draw for all possibly matching genes, '1' means gene is inherited from parent2
+        from_parent2 = get_random_bits(min(len(genes1), len(genes2)))
+
+        # child starts as a copy of parent1 sharing its genes (and dictionary keys), genes are copied only when they
+        # are changed (see _change_connection)
+        child = Genome.__new__(Genome)
+        child._initialize_attributes(parent1.input_size, parent1.output_size)
+        child.input_node_ids = list(parent1.input_node_ids)
+        child.output_node_ids = list(parent1.output_node_ids)
+        child.node_ids = set(parent1.node_ids)
+        child._source_ids = list(parent1._source_ids)
+        child._destination_ids = list(parent1._destination_ids)
+        child._connection_genes = connection_genes = dict(parent1._connection_genes)
+        child._archive = archive1 = parent1._archive
+        archive2 = parent2._archive
+        child._copy_views(parent1)
+        for gene in genes1:
+            gene.shared = True
+
+        # whether child's genes are exactly the same as parent's, see Genome.parent
+        copy_of_1, copy_of_2 = True, True
+        only_in_parent2 = []
+        len1, len2 = len(genes1), len(genes2)
+        i, j, matching = 0, 0, 0
+        while i < len1 and j < len2:
+            gene1, gene2 = genes1[i], genes2[j]
+            if gene1.innovation_number == gene2.innovation_number:
+                if gene1.weight != gene2.weight or gene1.enabled != gene2.enabled:
+                    if from_parent2[matching] == '1':
+                        gene2.shared = True
+                        connection_genes[(gene2.source_id, gene2.destination_id)] = gene2
+                        child._replace_in_views(gene1, gene2)
+                        copy_of_1 = False
+                    else:
+                        copy_of_2 = False
+                matching += 1
+                i += 1
+                j += 1
+            elif gene1.innovation_number < gene2.innovation_number:
+                copy_of_2 = False
+                i += 1
             else:
-                connection_gene = stronger_conn
-
-            (source_id, dest_id, weight, enabled) = connection_gene.get_connection()
-            connection_with_innov = (source_id, dest_id, weight, enabled, innov)
-            child_connections_with_innovs[(source_id, dest_id)] = connection_with_innov
-
-        input_size = stronger.input_size
-        output_size = stronger.output_size
-
-        return Genome(list(child_connections_with_innovs.values()), input_size, output_size)
+                only_in_parent2.append(gene2)
+                j += 1
+
+        # excess genes
+        if i < len1:
+            copy_of_2 = False
+        only_in_parent2.extend(genes2[j:])
+
+        if archive2:
+            # parent1's genes matching genes archived by parent2
+            for key, gene2 in archive2.items():
+                gene1 = connection_genes.get(key)
+                if gene1 is not None and gene1.innovation_number == gene2.innovation_number and random.random() < 0.5:
+                    connection_genes[key] = gene2
+                    child._replace_in_views(gene1, gene2)
+                    copy_of_1 = False
+
+        for gene in only_in_parent2:
+            key = (gene.source_id, gene.destination_id)
+            archived = archive1.get(key)
+            if archived is not None and archived.innovation_number == gene.innovation_number:
+                # parent2's gene matching gene archived by parent1
+                if random.random() < 0.5:
+                    if child._archive is archive1:
+                        child._archive = dict(archive1)
+                    del child._archive[key]
+                    gene.shared = True
+                    child._insert_connection_gene(gene)
+                    copy_of_1 = False
+                else:
+                    copy_of_2 = False
+            elif take_all:
+                # the same connection can have different innovation numbers in parents, parent1's gene is kept then
+                copy_of_1 = False
+                if key in connection_genes or key in child._archive:
+                    continue
+                gene.shared = True
+                child._insert_connection_gene(gene)
+            else:
+                copy_of_2 = False
+
+        if take_all and archive2 and archive2 is not archive1:
+            # genes archived only by parent2 are its disjoint and excess genes
+            for key, gene in archive2.items():
+                if key in connection_genes or key in child._archive:
+                    continue
+                if child._archive is archive1:
+                    child._archive = dict(archive1)
+                child._archive[key] = gene
+                child._add_node(gene.source_id)
+                child._add_node(gene.destination_id)
+                copy_of_1 = False
+        copy_of_2 = copy_of_2 and child._archive.keys() == archive2.keys()
+
+        parent1._has_shared_genes = True
+        parent2._has_shared_genes = True
+        child._has_shared_genes = True
+
+        if copy_of_1:
+            child.parent = parent1
+        elif copy_of_2:
+            child.parent = parent2
+        return child
+
+    def _get_sorted_genes(self):
+        # genes sorted by innovation number, returned list must not be modified
+        self._build_views()
+        return self._genes_view
 
     def to_json(self):
         """
@@ -339,6 +760,8 @@ class Genome:
         genome_dict = dict(input_size=self.input_size,
                            output_size=self.output_size,
                            connections=self.get_connections())
+        if self._archive:
+            genome_dict['archived_connections'] = self.get_archived_connections()
         return json.dumps(genome_dict)
 
     @staticmethod
@@ -349,11 +772,106 @@ class Genome:
         :return: Genome object constructed from JSON
         """
         genome_dict = json.loads(json_content)
-        return Genome(genome_dict["connections"], genome_dict["input_size"], genome_dict["output_size"])
+        archived_connections = genome_dict.get("archived_connections", [])
+        genome = Genome(genome_dict["connections"] + archived_connections, genome_dict["input_size"],
+                        genome_dict["output_size"])
+        genome._move_to_archive([(s_id, d_id) for s_id, d_id, _, _ in archived_connections])
+        return genome
+
+    def to_bytes(self):
+        """
+        Produces compact binary content from this genome. Unlike to_json it keeps innovation numbers, fitness scores
+        and archived genes, node types follow from input and output size.
+        :return: bytes, format is described by GENOME_HEADER and GENE_DTYPE
+        """
+        genes = np.array([(c.source_id, c.destination_id, c.weight, c.enabled, c.innovation_number,
+                           -1 if c.disabled_at is None else c.disabled_at)
+                          for genes in (self._connection_genes, self._archive) for c in genes.values()],
+                         dtype=GENE_DTYPE)
+        header = GENOME_HEADER.pack(self.input_size, self.output_size, len(self._connection_genes),
+                                    len(self._archive), to_binary_fitness(self.fitness),
+                                    to_binary_fitness(self.adjusted_fitness))
+        return header + genes.tobytes()
+
+    @staticmethod
+    def from_bytes(content):
+        """
+        Constructs new Genome from binary content produced by to_bytes (of Genome or ArrayGenome).
+        :param content: bytes-like object
+        :return: Genome object constructed from binary content
+        """
+        input_size, output_size, genes_count, archived_count, fitness, adjusted_fitness, genes = read_binary_genome(
+            content)
+
+        genome = Genome.__new__(Genome)
+        genome._initialize_attributes(input_size, output_size)
+        for node_id in np.union1d(genes['source_id'], genes['destination_id']).tolist():
+            genome._add_node(node_id)
+        for index, (source_id, dest_id, weight, enabled, innovation_number, disabled_at) in enumerate(genes.tolist()):
+            connection = ConnectionGene.__new__(ConnectionGene)
+            connection.source_id = source_id
+            connection.destination_id = dest_id
+            connection.weight = weight
+            connection.enabled = enabled
+            connection.innovation_number = innovation_number
+            connection.disabled_at = None if disabled_at < 0 else disabled_at
+            # archived genes are shared with offsprings
+            connection.shared = index >= genes_count
+            if connection.shared:
+                genome._archive[(source_id, dest_id)] = connection
+            else:
+                genome._connection_genes[(source_id, dest_id)] = connection
+        genome._set_up_node_genes_types(input_size, output_size)
+        if len(genes):
+            ConnectionGene._skip_innovation_numbers(int(genes['innovation_number'].max()))
+        genome.fitness = fitness
+        genome.adjusted_fitness = adjusted_fitness
+        return genome
+
+
+def get_random_bits(count):
+    """
+    Returns string of count random '0' and '1' characters. All of them come from one call of the random module, so
+    seeding random makes crossover reproducible, the same as the other random choices.
+    """
+    if count == 0:
+        return ''
+    return format(random.getrandbits(count), '0{!s}b'.format(count))
+
+
+def get_fingerprint(genes_key):
+    """
+    Returns fingerprint of genome with given genes key (see Genome.get_genes_key), 16 bytes long digest.
+    """
+    return hashlib.blake2b(genes_key, digest_size=16).digest()
+
+
+def to_binary_fitness(fitness):
+    return math.nan if fitness is None else float(fitness)
+
+
+def read_binary_genome(content):
+    """
+    Returns (input size, output size, number of genes in use, number of archived genes, fitness, adjusted fitness,
+    array of genes) read from content produced by Genome.to_bytes.
+    """
+    if len(content) < GENOME_HEADER.size:
+        raise Exception('Binary genome is too short')
+    input_size, output_size, genes_count, archived_count, fitness, adjusted_fitness = GENOME_HEADER.unpack_from(
+        content)
+    if len(content) != GENOME_HEADER.size + (genes_count + archived_count) * GENE_DTYPE.itemsize:
+        raise Exception('Binary genome has wrong size')
+    genes = np.frombuffer(content, dtype=GENE_DTYPE, offset=GENOME_HEADER.size)
+    fitness = None if math.isnan(fitness) else fitness
+    adjusted_fitness = None if math.isnan(adjusted_fitness) else adjusted_fitness
+    return input_size, output_size, genes_count, archived_count, fitness, adjusted_fitness, genes
 
 
 class NodeGene:
-    """This class may actually be kinda redundant but OOP is OOP"""
+    """
+    Node of a genome. Genomes keep only IDs of their nodes, NodeGene objects are created by Genome.get_nodes.
+    """
+    __slots__ = ('node_id', 'node_type')
 
     def __init__(self, node_id=-1, node_type='hidden'):
         self.node_id = node_id
@@ -361,18 +879,23 @@ class NodeGene:
 
 
 class ConnectionGene:
+    """
+    Connection between two nodes, which are referred to by their IDs.
+    Gene can be shared by several genomes, shared gene must not be changed, genomes change their own copies.
+    """
+    __slots__ = ('source_id', 'destination_id', 'weight', 'enabled', 'innovation_number', 'shared', 'disabled_at')
     _innovation_number = 0
 
     def __init__(self, source_node=None, destination_node=None, weight=1.0, enabled=False, innovation_number=None):
         """
-        :type source_node: NodeGene
-        :type destination_node: NodeGene
+        :type source_node: int or NodeGene
+        :type destination_node: int or NodeGene
         :type weight: float
         :type enabled: bool
         :type innovation_number: int
         """
-        self.source_node = source_node
-        self.destination_node = destination_node
+        self.source_id = getattr(source_node, 'node_id', source_node)
+        self.destination_id = getattr(destination_node, 'node_id', destination_node)
         self._check_connection_vialability()
         self.weight = weight
         self.enabled = enabled
@@ -380,17 +903,39 @@ class ConnectionGene:
             self.innovation_number = self._get_new_innovation_number()
         else:
             self.innovation_number = innovation_number
+        self.shared = False
+        # value of the innovation counter when the gene was disabled, None for enabled gene (see Genome.compact)
+        self.disabled_at = None if enabled else ConnectionGene._innovation_number
 
     def _check_connection_vialability(self):
-        if self.source_node is None and self.destination_node is None:
+        if self.source_id is None and self.destination_id is None:
             raise Exception("Both nodes are empty")
-        if self.source_node is None or self.destination_node is None:
+        if self.source_id is None or self.destination_id is None:
             raise Exception("One node is empty")
 
     def get_connection(self):
-        return self.source_node.node_id, self.destination_node.node_id, self.weight, self.enabled
+        return self.source_id, self.destination_id, self.weight, self.enabled
+
+    def copy(self):
+        """
+        Returns copy of this gene with the same innovation number.
+        """
+        connection = ConnectionGene.__new__(ConnectionGene)
+        connection.source_id = self.source_id
+        connection.destination_id = self.destination_id
+        connection.weight = self.weight
+        connection.enabled = self.enabled
+        connection.innovation_number = self.innovation_number
+        connection.shared = False
+        connection.disabled_at = self.disabled_at
+        return connection
 
     @staticmethod
     def _get_new_innovation_number():
         ConnectionGene._innovation_number += 1
         return ConnectionGene._innovation_number - 1
+
+    @staticmethod
+    def _skip_innovation_numbers(innovation_number):
+        # explicitly given innovation numbers (e.g. of genomes read from a file) must not be given out to new genes
+        ConnectionGene._innovation_number = max(ConnectionGene._innovation_number, innovation_number + 1)
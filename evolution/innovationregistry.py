@@ -0,0 +1,163 @@
+import json
+
+from evolution.genome import ConnectionGene
+
+
+class InnovationRegistry:
+    """
+    Assigns innovation numbers and node IDs to structural mutations. Within one generation the same mutation gets the
+    same numbers in every genome: new connection (source, destination) always gets the same innovation number and
+    split of connection (source, destination) always creates the same node with the same two connection genes.
+    Registry is picklable, so it can be passed to worker processes. Registry created by InnovationRegistry.shared keeps
+    its state in a multiprocessing manager, so workers reproducing at the same time get consistent numbers.
+    """
+
+    def __init__(self, next_innovation_number=None, next_node_id=1):
+        """
+        :param next_innovation_number: (Integer) - Innovation number of the next new gene. By default the next number
+            of the global ConnectionGene counter is used. Numbers already given out by the global counter are skipped.
+        :param next_node_id: (Integer) - ID of the next new node. It should be greater than IDs of every node in the
+            population, Generation raises it above node IDs of its genomes (see advance).
+        """
+        if next_innovation_number is None:
+            next_innovation_number = ConnectionGene._innovation_number
+
+        # (source, destination) -> innovation number of new connection
+        self._connections = {}
+        # (source, destination) -> (node ID, innovation of source -> node, innovation of node -> destination)
+        self._splits = {}
+        self._counters = {'innovation_number': next_innovation_number, 'node_id': next_node_id}
+        # values of the global innovation counter at the start of every generation, see get_generation_clock
+        self._generation_clocks = []
+        self._lock = None
+
+    @staticmethod
+    def shared(manager, next_innovation_number=None, next_node_id=1):
+        """
+        Returns registry keeping its state in given multiprocessing manager.
+        :param manager: multiprocessing.Manager() (it has to be running as long as the registry is used)
+        """
+        registry = InnovationRegistry(next_innovation_number, next_node_id)
+        registry._connections = manager.dict()
+        registry._splits = manager.dict()
+        registry._counters = manager.dict(registry._counters)
+        registry._generation_clocks = manager.list()
+        registry._lock = manager.Lock()
+        return registry
+
+    def get_connection_innovation(self, source_id, destination_id):
+        """
+        Returns innovation number of new connection source -> destination.
+        """
+        key = (source_id, destination_id)
+        self._acquire()
+        try:
+            if key not in self._connections:
+                self._connections[key] = self._get_new_innovation_number()
+            return self._connections[key]
+        finally:
+            self._release()
+
+    def get_split(self, source_id, destination_id, min_node_id=1):
+        """
+        Returns (node ID, first innovation, second innovation) for split of connection source -> destination, where
+        first innovation is the innovation number of connection source -> node and second of node -> destination.
+        :param min_node_id: (Integer) - the least ID the new node can get, used when split is registered
+        """
+        key = (source_id, destination_id)
+        self._acquire()
+        try:
+            if key not in self._splits:
+                node_id = max(self._counters['node_id'], min_node_id)
+                self._counters['node_id'] = node_id + 1
+                self._splits[key] = (node_id, self._get_new_innovation_number(), self._get_new_innovation_number())
+            return tuple(self._splits[key])
+        finally:
+            self._release()
+
+    def advance(self, next_innovation_number=None, next_node_id=None):
+        """
+        Makes sure that innovation numbers and node IDs given out later are not lower than given ones, for example
+        when registry is used with genomes it has not seen before.
+        :param next_innovation_number: (Integer) - the least innovation number of the next new gene
+        :param next_node_id: (Integer) - the least ID of the next new node
+        """
+        self._acquire()
+        try:
+            if next_innovation_number is not None:
+                self._counters['innovation_number'] = max(self._counters['innovation_number'], next_innovation_number)
+            if next_node_id is not None:
+                self._counters['node_id'] = max(self._counters['node_id'], next_node_id)
+        finally:
+            self._release()
+
+    def next_generation(self):
+        """
+        Forgets mutations of the previous generation. Counters are kept, so numbers given out later are still new.
+        """
+        self._acquire()
+        try:
+            self._connections.clear()
+            self._splits.clear()
+            self._generation_clocks.append(ConnectionGene._innovation_number)
+        finally:
+            self._release()
+
+    def get_generation_clock(self, generations_ago):
+        """
+        Returns value of the global innovation counter at the start of generation, which started given number of
+        generations ago (1 is the current generation), or None if there were not so many generations. Genes disabled
+        before that generation have ConnectionGene.disabled_at lower than the returned value.
+        :param generations_ago: (Integer) - number of calls of next_generation since the generation started
+        """
+        if generations_ago < 1 or generations_ago > len(self._generation_clocks):
+            return None
+        return self._generation_clocks[-generations_ago]
+
+    def _get_new_innovation_number(self):
+        # genes created without registry (e.g. new genomes) get numbers from the global counter, so neither of them
+        # can reuse numbers given out by the other
+        innovation_number = max(self._counters['innovation_number'], ConnectionGene._innovation_number)
+        self._counters['innovation_number'] = innovation_number + 1
+        ConnectionGene._innovation_number = innovation_number + 1
+        return innovation_number
+
+    def _acquire(self):
+        if self._lock is not None:
+            self._lock.acquire()
+
+    def _release(self):
+        if self._lock is not None:
+            self._lock.release()
+
+    def to_json(self):
+        """
+        Produces JSON content from this registry, so it can be saved with a checkpoint.
+        :return: string in JSON format
+        """
+        self._acquire()
+        try:
+            registry_dict = dict(next_innovation_number=self._counters['innovation_number'],
+                                 next_node_id=self._counters['node_id'],
+                                 connections=[[s, d, innov] for (s, d), innov in self._connections.items()],
+                                 splits=[[s, d] + list(split) for (s, d), split in self._splits.items()],
+                                 generation_clocks=list(self._generation_clocks))
+        finally:
+            self._release()
+        return json.dumps(registry_dict)
+
+    @staticmethod
+    def from_json(json_content):
+        """
+        Constructs new (not shared) InnovationRegistry from JSON formatted string.
+        :param json_content: string formatted as JSON
+        :return: InnovationRegistry object constructed from JSON
+        """
+        registry_dict = json.loads(json_content)
+        registry = InnovationRegistry(registry_dict['next_innovation_number'], registry_dict['next_node_id'])
+        for s, d, innov in registry_dict['connections']:
+            registry._connections[(s, d)] = innov
+        for s, d, node_id, first_innov, second_innov in registry_dict['splits']:
+            registry._splits[(s, d)] = (node_id, first_innov, second_innov)
+        registry._generation_clocks = registry_dict.get('generation_clocks', [])
+        return registry
@@ -24,6 +24,10 @@ class Logger:
     def log_groups_fitness_scores(self, id):
         self.log[id].fetch_and_log_groups_fitness_scores()
 
+    def log_gene_counts(self, id, genes_before_compaction, genes_after_compaction):
+        self._check_if_record_exists(id)
+        self.log[id].add_gene_counts_to_log(genes_before_compaction, genes_after_compaction)
+
     def _check_if_record_exists(self, id):
         if id not in self.log:
             self.log[id] = Generation_Log(id)
@@ -36,12 +40,17 @@ class Generation_Log:
         self.groups_fitness_scores_log = {}
         self.phenotypes_log = []
         self.phenotypes_fitness_scores = []
+        # (genes before compaction, genes after compaction) of all genomes in the generation
+        self.gene_counts_log = []
 
     def add_coefficients_to_log(self, mutation_coefficients, compatibility_coefficients,
                                 compatibility_threshold, r_factor, population_size):
         self.coefficients_log.append((mutation_coefficients, compatibility_coefficients,
                                       compatibility_threshold, r_factor, population_size))
 
+    def add_gene_counts_to_log(self, genes_before_compaction, genes_after_compaction):
+        self.gene_counts_log.append((genes_before_compaction, genes_after_compaction))
+
     def add_groups_to_log(self, groups):
         for group in groups.values():
             self.groups_log[group.id] = group
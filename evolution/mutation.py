@@ -0,0 +1,39 @@
+import random
+
+import numpy as np
+
+# random connections tried for every weight mutation before falling back to building the list of enabled connections
+WEIGHT_PICK_ATTEMPTS = 4
+
+
+def mutate_population(genomes, coefficients, registry=None):
+    """
+    Mutates every genome the same way as Genome.mutate does. Mutation probability draws, picks of connections and
+    weight changes for all genomes are done by a few NumPy calls, structural mutations are applied genome by genome.
+    NumPy generator is seeded from the random module, so seeding random makes mutations reproducible.
+    Works for Genome and ArrayGenome objects.
+    :param genomes: list of genomes to mutate
+    :param coefficients: dictionary with mutation coefficients, the same as for Genome.mutate
+    :param registry: (InnovationRegistry) - optional registry assigning innovation numbers and node IDs
+    """
+    if not genomes:
+        return
+
+    generator = np.random.default_rng(random.getrandbits(64))
+    # each coefficient represent probability between [0;1]
+    draws = generator.random((len(genomes), 3))
+    add_connection = (draws[:, 0] <= coefficients['add_connection']).tolist()
+    split_connection = (draws[:, 1] <= coefficients['split_connection']).tolist()
+    change_weight = np.flatnonzero(draws[:, 2] <= coefficients['change_weight']).tolist()
+
+    for genome, add, split in zip(genomes, add_connection, split_connection):
+        if add:
+            genome._mutate_new_connection(coefficients['new_connection_abs_max_weight'], registry)
+        if split:
+            genome._mutate_split_connection(registry)
+
+    # weight changes from N(0, MAX/2), the same as in Genome._mutate_change_weight
+    changes = generator.normal(0.0, coefficients['max_weight_mutation'] / 2, len(change_weight)).tolist()
+    positions = generator.random((len(change_weight), WEIGHT_PICK_ATTEMPTS)).tolist()
+    for index, change, genome_positions in zip(change_weight, changes, positions):
+        genomes[index]._change_random_weight(genome_positions, change)
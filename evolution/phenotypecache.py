@@ -0,0 +1,92 @@
+from collections import OrderedDict
+
+
+class PhenotypeCache:
+    """
+    Bounded LRU cache of compiled phenotypes and fitness scores keyed by genome fingerprint (see Genome.fingerprint).
+    Identical genomes, which often come out of crossover, share one compiled network and, if the fitness function
+    is deterministic, are evaluated only once. Every entry keeps genes key of its genome (see Genome.get_genes_key),
+    which is compared on a hit, so a genome never gets network or fitness of a different genome.
+    """
+
+    def __init__(self, max_size=1000):
+        """
+        :param max_size: (Integer) - how many fingerprints are kept before least recently used ones are dropped
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.fitness_hits = 0
+        self.fitness_misses = 0
+
+    def get_phenotype(self, genome):
+        """
+        Returns network of a genome identical to given one or None if there is no such network in the cache.
+        Returned network is bound to given genome.
+        :type genome: Genome
+        """
+        entry = self._get_entry(genome)
+        if entry is None or entry[1] is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1].share(genome)
+
+    def add_phenotype(self, phenotype):
+        """
+        Stores network of a genome.
+        :type phenotype: NeuralNetwork
+        """
+        self._set_entry(phenotype.get_genome(), 1, phenotype)
+
+    def get_fitness(self, genome):
+        """
+        Returns fitness of a genome identical to given one or None if it wasn't evaluated yet.
+        :type genome: Genome
+        """
+        entry = self._get_entry(genome)
+        if entry is None or entry[2] is None:
+            self.fitness_misses += 1
+            return None
+        self.fitness_hits += 1
+        return entry[2]
+
+    def add_fitness(self, genome, fitness):
+        """
+        Stores fitness of a genome. Use only with deterministic fitness functions.
+        :type genome: Genome
+        """
+        self._set_entry(genome, 2, fitness)
+
+    def get_statistics(self):
+        return dict(size=len(self._entries), hits=self.hits, misses=self.misses,
+                    fitness_hits=self.fitness_hits, fitness_misses=self.fitness_misses)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _get_entry(self, genome):
+        # entry is [genes key, phenotype, fitness], entry of a different genome with the same fingerprint is not used
+        fingerprint = genome.fingerprint()
+        entry = self._entries.get(fingerprint)
+        if entry is None or entry[0] != genome.get_genes_key():
+            return None
+        self._entries.move_to_end(fingerprint)
+        return entry
+
+    def _set_entry(self, genome, index, value):
+        fingerprint = genome.fingerprint()
+        genes_key = genome.get_genes_key()
+        entry = self._entries.get(fingerprint)
+        if entry is None or entry[0] != genes_key:
+            entry = [genes_key, None, None]
+            self._entries[fingerprint] = entry
+        entry[index] = value
+        self._entries.move_to_end(fingerprint)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
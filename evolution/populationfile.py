@@ -0,0 +1,109 @@
+import struct
+
+from evolution.generation import Group
+from evolution.genome import Genome
+
+# population file starts with this marker and then contains records of genomes one after another
+POPULATION_FILE_MARKER = b'NEATPOP1'
+# record header: ID of genome's group (-1 for genome without group) and size of binary genome which follows
+RECORD_HEADER = struct.Struct('<qI')
+
+
+class PopulationWriter:
+    """
+    Writes genomes to population file one by one, so the whole population does not have to be serialized at once.
+    Genomes are stored in binary format of Genome.to_bytes. Writer can be used as a context manager.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: (String) - path of population file, existing file is overwritten
+        """
+        self._file = open(path, 'wb')
+        self._file.write(POPULATION_FILE_MARKER)
+
+    def write_genome(self, genome, group_id=-1):
+        """
+        Appends genome (Genome or ArrayGenome) to the file.
+        :param group_id: (Integer) - ID of group the genome belongs to
+        """
+        content = genome.to_bytes()
+        self._file.write(RECORD_HEADER.pack(group_id, len(content)))
+        self._file.write(content)
+
+    def write_generation(self, generation):
+        """
+        Appends all genomes of the generation to the file together with IDs of their groups.
+        """
+        for group in generation.groups.values():
+            for genome in group.genomes:
+                self.write_genome(genome, group.id)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PopulationReader:
+    """
+    Reads genomes written by PopulationWriter. Iterating over the reader yields (group ID, genome) pairs and reads only
+    one genome at a time. Reader can be used as a context manager.
+    """
+
+    def __init__(self, path, genome_class=Genome):
+        """
+        :param path: (String) - path of population file
+        :param genome_class: Genome or ArrayGenome, class of read genomes
+        """
+        self._file = open(path, 'rb')
+        self.genome_class = genome_class
+        if self._file.read(len(POPULATION_FILE_MARKER)) != POPULATION_FILE_MARKER:
+            self._file.close()
+            raise Exception('File is not a population file')
+
+    def __iter__(self):
+        self._file.seek(len(POPULATION_FILE_MARKER))
+        while True:
+            header = self._file.read(RECORD_HEADER.size)
+            if not header:
+                return
+            if len(header) != RECORD_HEADER.size:
+                raise Exception('Population file is truncated')
+            group_id, size = RECORD_HEADER.unpack(header)
+            content = self._file.read(size)
+            if len(content) != size:
+                raise Exception('Population file is truncated')
+            yield group_id, self.genome_class.from_bytes(content)
+
+    def read_groups(self):
+        """
+        Reads all genomes and returns list of groups with the same IDs as written groups, so generation can be created
+        from them. Genomes written without group are put into one new group. Counter of group IDs is moved past the
+        read IDs, so groups created later don't reuse them.
+        """
+        genomes_by_group = {}
+        for group_id, genome in self:
+            genomes_by_group.setdefault(group_id, []).append(genome)
+        Group._GROUP_ID = max([Group._GROUP_ID] + [group_id + 1 for group_id in genomes_by_group])
+
+        groups = []
+        for group_id, genomes in genomes_by_group.items():
+            group = Group() if group_id < 0 else Group(group_id, [])
+            for genome in genomes:
+                group.add_genome(genome)
+            groups.append(group)
+        return groups
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,174 @@
+import random
+
+import numpy as np
+
+from nn.controller import NetworkController
+
+# the same board and stones as in gist.py, which needs pygame and can't be played without a window
+COLS = 10
+ROWS = 22
+TETRIS_SHAPES = [np.array(shape, dtype=bool) for shape in (
+    [[1, 1, 1],
+     [0, 1, 0]],
+
+    [[0, 1, 1],
+     [1, 1, 0]],
+
+    [[1, 1, 0],
+     [0, 1, 1]],
+
+    [[1, 0, 0],
+     [1, 1, 1]],
+
+    [[0, 0, 1],
+     [1, 1, 1]],
+
+    [[1, 1, 1, 1]],
+
+    [[1, 1],
+     [1, 1]]
+)]
+LINE_SCORES = [0, 40, 100, 300, 1200]
+
+# network outputs in order of actions, the action with the greatest output is taken
+ACTIONS = ('left', 'right', 'rotate', 'drop')
+
+
+class TetrisGame:
+    """
+    Headless Tetris with the rules of gist.py. Instead of a timer, stone falls by one row after every move, so the game
+    is played frame by frame without waiting. Board is a boolean array with a full dummy row at the bottom.
+    """
+
+    def __init__(self, seed=None):
+        """
+        :param seed: seed of the sequence of stones, games with the same seed get the same stones
+        """
+        self._random = random.Random(seed)
+        self.board = np.zeros((ROWS + 1, COLS), dtype=bool)
+        self.board[ROWS] = True
+        self.score = 0
+        self.lines = 0
+        self.level = 1
+        self.stones = 0
+        self.gameover = False
+        self.next_stone = self._random.choice(TETRIS_SHAPES)
+        self._new_stone()
+
+    def _new_stone(self):
+        self.stone = self.next_stone
+        self.next_stone = self._random.choice(TETRIS_SHAPES)
+        self.stone_x = int(COLS / 2 - self.stone.shape[1] / 2)
+        self.stone_y = 0
+        if self._check_collision(self.stone, self.stone_x, self.stone_y):
+            self.gameover = True
+
+    def _check_collision(self, stone, x, y):
+        height, width = stone.shape
+        if x < 0 or x + width > COLS or y + height > ROWS + 1:
+            return True
+        return bool(np.any(self.board[y:y + height, x:x + width] & stone))
+
+    def _add_cleared_lines(self, n):
+        self.lines += n
+        self.score += LINE_SCORES[n] * self.level
+        if self.lines >= self.level * 6:
+            self.level += 1
+
+    def move(self, delta_x):
+        new_x = min(max(self.stone_x + delta_x, 0), COLS - self.stone.shape[1])
+        if not self.gameover and not self._check_collision(self.stone, new_x, self.stone_y):
+            self.stone_x = new_x
+
+    def rotate(self):
+        # the same as rotate_clockwise of gist.py
+        new_stone = np.rot90(self.stone, -1)
+        if not self.gameover and not self._check_collision(new_stone, self.stone_x, self.stone_y):
+            self.stone = new_stone
+
+    def drop(self, manual=False):
+        """
+        Moves stone one row down. Stone which can't move is joined with the board, full rows are removed and next stone
+        appears.
+        :return: (Boolean) - True if stone was joined with the board
+        """
+        if self.gameover:
+            return False
+        self.score += 1 if manual else 0
+        if not self._check_collision(self.stone, self.stone_x, self.stone_y + 1):
+            self.stone_y += 1
+            return False
+
+        height, width = self.stone.shape
+        self.board[self.stone_y:self.stone_y + height, self.stone_x:self.stone_x + width] |= self.stone
+        self.stones += 1
+        full_rows = np.flatnonzero(self.board[:ROWS].all(axis=1))
+        if len(full_rows):
+            rows = np.delete(self.board[:ROWS], full_rows, axis=0)
+            self.board[:len(full_rows)] = False
+            self.board[len(full_rows):ROWS] = rows
+        self._add_cleared_lines(len(full_rows))
+        self._new_stone()
+        return True
+
+    def insta_drop(self):
+        while not self.gameover and not self.drop(True):
+            pass
+
+    def play(self, action):
+        """
+        Takes one of ACTIONS and lets the stone fall by one row.
+        """
+        if action == 'left':
+            self.move(-1)
+        elif action == 'right':
+            self.move(1)
+        elif action == 'rotate':
+            self.rotate()
+        elif action == 'drop':
+            self.insta_drop()
+            return
+        self.drop()
+
+    def write_features(self, features):
+        """
+        Writes board with falling stone, ROWS x COLS cells row by row, into features (1.0 for a block, 0.0 for empty
+        cell).
+        :param features: array of ROWS * COLS floats
+        """
+        cells = features.reshape(ROWS, COLS)
+        cells[:] = self.board[:ROWS]
+        height, width = self.stone.shape
+        cells[self.stone_y:self.stone_y + height, self.stone_x:self.stone_x + width] += self.stone
+
+    def get_fitness(self):
+        """
+        Returns score of the game and number of placed stones, so networks which don't clear lines still differ in how
+        long they survive.
+        """
+        return float(self.score + self.stones)
+
+
+def play_tetris(phenotype, games=1, max_frames=1000, seed=0):
+    """
+    Lets the network play Tetris and returns average fitness of the games (see TetrisGame.get_fitness). Network sees
+    the board with falling stone (ROWS * COLS inputs) and chooses one of ACTIONS (len(ACTIONS) outputs) every frame.
+    :param phenotype: (NeuralNetwork) - compiled network
+    :param games: (Integer) - number of played games, game i gets stones from seed + i
+    :param max_frames: (Integer) - game is stopped after this many frames
+    :param seed: (Integer) - seed of the first game, the same seed gives the same fitness
+    """
+    if phenotype._input_size != ROWS * COLS or phenotype._output_size != len(ACTIONS):
+        raise Exception("Tetris network needs {!s} inputs and {!s} outputs".format(ROWS * COLS, len(ACTIONS)))
+
+    controller = NetworkController(phenotype)
+    total = 0.0
+    for game_number in range(games):
+        game = TetrisGame(seed + game_number)
+        for frame in range(max_frames):
+            if game.gameover:
+                break
+            game.write_features(controller.inputs)
+            game.play(ACTIONS[int(np.argmax(controller.step()))])
+        total += game.get_fitness()
+    return total / games
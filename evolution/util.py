@@ -1,7 +1,115 @@
+import math
+
+# relative difference between bound of compatibility distance and threshold, which is enough to decide without
+# computing the distance, see is_compatibility_distance_lower
+COMPATIBILITY_BOUND_MARGIN = 1e-9
+
+
 def sort_connections_by_innovation_number(connections):
     return sorted(connections.values(), key=lambda connection: connection.innovation_number)
 
 
+def compare_connection_genes(connections_a, connections_b):
+    """
+    Counts excess genes, disjoint genes and average weight difference of matching genes of two lists of connections
+    in one merge pass.
+    :param connections_a: list(ConnectionGene) sorted by innovation number
+    :param connections_b: list(ConnectionGene) sorted by innovation number
+    :return: (number of excess genes, number of disjoint genes, average weight difference)
+    """
+    len_a, len_b = len(connections_a), len(connections_b)
+    i, j = 0, 0
+    disjoint_number, matching_number = 0, 0
+    weight_difference = 0.0
+    while i < len_a and j < len_b:
+        connection_a, connection_b = connections_a[i], connections_b[j]
+        if connection_a.innovation_number == connection_b.innovation_number:
+            weight_difference += abs(connection_a.weight - connection_b.weight)
+            matching_number += 1
+            i += 1
+            j += 1
+        elif connection_a.innovation_number < connection_b.innovation_number:
+            disjoint_number += 1
+            i += 1
+        else:
+            disjoint_number += 1
+            j += 1
+
+    # genes left in one of the lists are greater than the common max innovation number
+    excess_number = (len_a - i) + (len_b - j)
+    if not matching_number:
+        return excess_number, disjoint_number, 0
+
+    return excess_number, disjoint_number, weight_difference / matching_number
+
+
+def is_compatibility_distance_lower(connections_a, connections_b, coefficients, normalization_factor, threshold):
+    """
+    Tells whether compatibility distance of two lists of connections is lower than threshold. Lists which differ
+    in length too much are rejected at once and merge of the lists stops as soon as disjoint genes found so far make
+    the distance reach the threshold.
+    :param connections_a: list(ConnectionGene) sorted by innovation number
+    :param connections_b: list(ConnectionGene) sorted by innovation number
+    :param coefficients: dictionary with compatibility distance factors
+    :param normalization_factor: (float) - number of genes excess and disjoint genes are divided by
+    :param threshold: (float) - compatibility threshold
+    """
+    excess_factor = coefficients['excess_factor']
+    disjoint_factor = coefficients['disjoint_factor']
+    weight_difference_factor = coefficients['weight_difference_factor']
+    # every not matching gene is excess or disjoint
+    least_factor = min(excess_factor, disjoint_factor)
+    len_a, len_b = len(connections_a), len(connections_b)
+    # bounds are rounded differently than the distance, answer is computed exactly when bound is too close to threshold
+    margin = COMPATIBILITY_BOUND_MARGIN * max(abs(threshold), 1.0)
+
+    # at least as many genes as the lists differ in length are not matching
+    if least_factor * abs(len_a - len_b) / normalization_factor >= threshold + margin:
+        return False
+    # weight difference can not make the distance greater
+    greatest_factor = max(excess_factor, disjoint_factor)
+    if weight_difference_factor == 0 and greatest_factor * (len_a + len_b) / normalization_factor < threshold - margin:
+        return True
+
+    # number of disjoint genes which alone make the distance reach the threshold
+    disjoint_limit = len_a + len_b + 1
+    if disjoint_factor > 0 and math.isfinite(threshold):
+        disjoint_limit = min(disjoint_limit, math.ceil((threshold + margin) * normalization_factor / disjoint_factor))
+
+    i, j = 0, 0
+    disjoint_number, matching_number = 0, 0
+    weight_difference = 0.0
+    while i < len_a and j < len_b:
+        connection_a, connection_b = connections_a[i], connections_b[j]
+        if connection_a.innovation_number == connection_b.innovation_number:
+            weight_difference += abs(connection_a.weight - connection_b.weight)
+            matching_number += 1
+            i += 1
+            j += 1
+            continue
+
+        disjoint_number += 1
+        if disjoint_number >= disjoint_limit:
+            return False
+        if connection_a.innovation_number < connection_b.innovation_number:
+            i += 1
+        else:
+            j += 1
+
+    excess_number = (len_a - i) + (len_b - j)
+    avg_weight_difference = weight_difference / matching_number if matching_number else 0
+    excess_component = excess_factor * excess_number / normalization_factor
+    disjoint_component = disjoint_factor * disjoint_number / normalization_factor
+    weight_difference_component = weight_difference_factor * avg_weight_difference
+
+    return excess_component + disjoint_component + weight_difference_component < threshold
+
+
+def _compare_unsorted_connection_genes(connections_a, connections_b):
+    key = lambda connection: connection.innovation_number
+    return compare_connection_genes(sorted(connections_a, key=key), sorted(connections_b, key=key))
+
+
 def count_disjoint_connection_genes(connections_a, connections_b):
     """
     Counts disjoint genes of two lists of connections.
@@ -9,21 +117,7 @@ def count_disjoint_connection_genes(connections_a, connections_b):
     :type connections_a: list(ConnectionGene)
     :return: number of disjoint connection genes
     """
-    innovations_a = [c.innovation_number for c in connections_a]
-    innovations_b = [c.innovation_number for c in connections_b]
-
-    max_innov_a = max(innovations_a)
-    max_innov_b = max(innovations_b)
-
-    # obtain the common max innovation number
-    common_max_innov = min(max_innov_a, max_innov_b)
-
-    # get innovation numbers present only in either a or b's innovation numbers
-    innovations_xor = set(innovations_a) ^ set(innovations_b)
-
-    # count innovation_xor elements which are LE than common max innovation number
-    # (greater innovation numbers are excess connections)
-    return sum(1 for i in innovations_xor if i <= common_max_innov)
+    return _compare_unsorted_connection_genes(connections_a, connections_b)[1]
 
 
 def count_excess_connection_genes(connections_a, connections_b):
@@ -33,21 +127,7 @@ def count_excess_connection_genes(connections_a, connections_b):
     :type connections_b: list(ConnectionGene)
     :return: number of excess connection genes
     """
-    innovations_a = [c.innovation_number for c in connections_a]
-    innovations_b = [c.innovation_number for c in connections_b]
-
-    max_innov_a = max(innovations_a)
-    max_innov_b = max(innovations_b)
-
-    # obtain the common max innovation number
-    common_max_innov = min(max_innov_a, max_innov_b)
-
-    # get innovation numbers present only in either a or b's innovation numbers
-    innovations_xor = set(innovations_a) ^ set(innovations_b)
-
-    # count innovation_xor elements which are greater than common max innovation number
-    # (LE innovation numbers are disjoint connections)
-    return sum(1 for i in innovations_xor if i > common_max_innov)
+    return _compare_unsorted_connection_genes(connections_a, connections_b)[0]
 
 
 def count_avg_weight_difference(connections_a, connections_b):
@@ -57,11 +137,4 @@ def count_avg_weight_difference(connections_a, connections_b):
     :type connections_b: list(ConnectionGene)
     :return: average weight difference
     """
-    weight_differences = [abs(a.weight - b.weight)
-                          for a in connections_a
-                          for b in connections_b
-                          if a.innovation_number == b.innovation_number]
-    if not weight_differences:
-        return 0
-
-    return sum(weight_differences) / float(len(weight_differences))
+    return _compare_unsorted_connection_genes(connections_a, connections_b)[2]
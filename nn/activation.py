@@ -0,0 +1,78 @@
+"""
+Activation kernels of the steepened sigmoid 1 / (1 + exp(-4.9 * x)) used by all neurons.
+
+Every backend has a scalar kernel (for one value, used by the compiled forward pass and NetworkController) and an
+array kernel (used by batch and layered evaluation). Array kernels may overwrite their argument, so they must only be
+given arrays the caller owns.
+
+Backends:
+    numpy - np.exp on scalars and arrays, the original numerics (default),
+    math - math.exp on plain floats and in-place NumPy operations on arrays, same values up to rounding,
+    table - linear interpolation in a lookup table, absolute error below TABLE_ERROR_BOUND.
+"""
+import math
+
+import numpy as np
+
+STEEPNESS = 4.9
+
+# Lookup table covers inputs from -TABLE_RANGE to TABLE_RANGE, outside it the sigmoid is 0 or 1 within 3e-9.
+# Interpolation error is at most h^2 / 8 * max|f''| = (1/128)^2 / 8 * 4.9^2 / (6 * sqrt(3)) ~ 1.8e-5
+TABLE_RANGE = 4.0
+TABLE_STEPS = 1024
+TABLE_ERROR_BOUND = 2e-5
+_TABLE_X = np.linspace(-TABLE_RANGE, TABLE_RANGE, TABLE_STEPS + 1)
+_TABLE_Y = 1.0 / (1.0 + np.exp(-STEEPNESS * _TABLE_X))
+_TABLE_Y_LIST = _TABLE_Y.tolist()
+_TABLE_SCALE = TABLE_STEPS / (2 * TABLE_RANGE)
+
+
+def numpy_sigmoid(x):
+    return 1.0/(1 + np.exp(-STEEPNESS * x))
+
+
+def math_sigmoid(x):
+    # math.exp raises OverflowError instead of returning inf
+    if x < -144.0:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-STEEPNESS * x))
+
+
+def math_sigmoid_array(x):
+    x = np.asarray(x, dtype=np.float64)
+    np.multiply(x, -STEEPNESS, out=x)
+    np.exp(x, out=x)
+    np.add(x, 1.0, out=x)
+    return np.reciprocal(x, out=x)
+
+
+def table_sigmoid(x):
+    if x <= -TABLE_RANGE:
+        return 0.0
+    if x >= TABLE_RANGE:
+        return 1.0
+    position = (x + TABLE_RANGE) * _TABLE_SCALE
+    index = int(position)
+    fraction = position - index
+    return _TABLE_Y_LIST[index] + (_TABLE_Y_LIST[index + 1] - _TABLE_Y_LIST[index]) * fraction
+
+
+def table_sigmoid_array(x):
+    # np.interp clamps to the first and last table values outside of the table
+    return np.interp(x, _TABLE_X, _TABLE_Y)
+
+
+ACTIVATIONS = {
+    'numpy': (numpy_sigmoid, numpy_sigmoid),
+    'math': (math_sigmoid, math_sigmoid_array),
+    'table': (table_sigmoid, table_sigmoid_array),
+}
+
+
+def get_activation(name):
+    """
+    Returns (scalar kernel, array kernel) of activation backend with given name.
+    """
+    if name not in ACTIVATIONS:
+        raise Exception("Unknown activation: {!s}".format(name))
+    return ACTIVATIONS[name]
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+
+from nn.activation import get_activation
+
+# (genes key, generated function) by (genome fingerprint, activation), least recently used are dropped first
+FUNCTIONS_CACHE_SIZE = 1000
+_functions_cache = OrderedDict()
+
+
+def generate_source(network, name='forward'):
+    """
+    Returns source code of a function evaluating given network without any loops: one line per node in topological
+    order with weights inlined as constants.
+    :param network: (NeuralNetwork) - compiled network
+    :param name: (String) - name of generated function
+    """
+    nodes = network._plan_nodes
+    offsets = network._plan_offsets
+    sources = network._plan_sources
+    weights = network._plan_weights
+    input_size = network._input_size
+    output_size = network._output_size
+
+    computed = set(range(1, input_size + 1))
+    # sources closing a loop are read before they are computed, they start from 0
+    uncomputed_sources = set()
+    body = []
+    for position, node_id in enumerate(nodes):
+        terms = []
+        for k in range(offsets[position], offsets[position + 1]):
+            if sources[k] not in computed:
+                uncomputed_sources.add(sources[k])
+            terms.append("a{!s} * {!r}".format(sources[k], float(weights[k])))
+        body.append("    a{!s} = _activation({!s})".format(node_id, " + ".join(terms) if terms else "0"))
+        computed.add(node_id)
+
+    lines = ["def {!s}(X):".format(name)]
+    for index in range(1, input_size + 1):
+        lines.append("    a{!s} = _activation(X[{!s}])".format(index, index - 1))
+    for node_id in sorted(uncomputed_sources):
+        lines.append("    a{!s} = 0.0".format(node_id))
+    lines.extend(body)
+    lines.append("    return [{!s}]".format(", ".join("a{!s}".format(index) for index in
+                                                  range(input_size + 1, input_size + output_size + 1))))
+    return "\n".join(lines) + "\n"
+
+
+def compile_network(network):
+    """
+    Returns a function computing outputs of given network from a vector of inputs. Functions are cached by genome
+    fingerprint, so identical genomes are compiled only once. Genes key of cached genome is compared on a hit, so
+    a network never gets function of a different genome.
+    :param network: (NeuralNetwork) - compiled network
+    """
+    genome = network.get_genome()
+    key = None
+    if hasattr(genome, 'fingerprint'):
+        key = (genome.fingerprint(), network.get_activation())
+        genes_key = genome.get_genes_key()
+        entry = _functions_cache.get(key)
+        if entry is not None and entry[0] == genes_key:
+            _functions_cache.move_to_end(key)
+            return entry[1]
+
+    namespace = {'_activation': get_activation(network.get_activation())[0]}
+    exec(compile(generate_source(network), '<network>', 'exec'), namespace)
+    function = namespace['forward']
+
+    if key is not None:
+        _functions_cache[key] = (genes_key, function)
+        _functions_cache.move_to_end(key)
+        while len(_functions_cache) > FUNCTIONS_CACHE_SIZE:
+            _functions_cache.popitem(last=False)
+    return function
+
+
+def clear_cache():
+    _functions_cache.clear()
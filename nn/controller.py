@@ -0,0 +1,86 @@
+from array import array
+
+import numpy as np
+
+from nn.activation import get_activation
+
+
+class NetworkController:
+    """
+    Evaluator of one network for per-frame control (for example one Tetris move per frame).
+    All buffers are allocated once, so calling step() thousands of times per game creates no lists or arrays.
+    Every step gives the same outputs as NeuralNetwork.forward on the same inputs.
+
+    Usage:
+        controller = NetworkController(network)
+        controller.inputs[:] = board_features   # or controller.step(board_features)
+        actions = controller.step()             # the same array is returned on every call
+    """
+
+    def __init__(self, network, activation=None):
+        """
+        :param network: (NeuralNetwork) - compiled network to evaluate
+        :param activation: (String) - activation backend (see nn.activation), by default the network's one
+        """
+        if activation is None:
+            activation = network.get_activation()
+        self._activation_function = get_activation(activation)[0]
+        self._network = network
+        self._input_size = network._input_size
+        self._output_size = network._output_size
+
+        # NumPy views share memory with the array buffers, so callers work with arrays while the evaluation loop
+        # reads and writes plain floats
+        self._input_buffer = array('d', bytes(8 * self._input_size))
+        self._output_buffer = array('d', bytes(8 * self._output_size))
+        self._activations = array('d', bytes(8 * len(network._activations)))
+        self.inputs = np.frombuffer(self._input_buffer, dtype=np.float64)
+        self.outputs = np.frombuffer(self._output_buffer, dtype=np.float64)
+
+        # plan as (node ID, ((source, weight), ...)) so the loop doesn't index flat lists
+        offsets = network._plan_offsets
+        self._steps = tuple((node_id, tuple(zip(network._plan_sources[offsets[position]:offsets[position + 1]],
+                                                network._plan_weights[offsets[position]:offsets[position + 1]])))
+                            for position, node_id in enumerate(network._plan_nodes))
+        self._output_ids = tuple(range(self._input_size + 1, self._input_size + self._output_size + 1))
+        # sources closing a loop read 0, like in NeuralNetwork.forward
+        self._loop_sources = tuple(network._loop_sources)
+
+    def step(self, features=None):
+        """
+        Evaluates the network on current content of inputs and writes the result into outputs.
+        :param features: optional vector copied into inputs before evaluation
+        :return: outputs array (always the same object)
+        """
+        if features is not None:
+            self.inputs[:] = features
+
+        activations = self._activations
+        activation_function = self._activation_function
+        input_buffer = self._input_buffer
+        for index in range(self._input_size):
+            activations[index + 1] = activation_function(input_buffer[index])
+        for node_id in self._loop_sources:
+            activations[node_id] = 0.0
+
+        for node_id, connections in self._steps:
+            total = 0.0
+            for source, weight in connections:
+                total += activations[source] * weight
+            activations[node_id] = activation_function(total)
+
+        output_buffer = self._output_buffer
+        for index, node_id in enumerate(self._output_ids):
+            output_buffer[index] = activations[node_id]
+        return self.outputs
+
+    def reset(self):
+        """
+        Zeroes the activation buffer. Steps don't depend on previous steps, so this only drops values of the last one.
+        """
+        for index in range(len(self._activations)):
+            self._activations[index] = 0.0
+
+    def get_network(self):
+        return self._network
+
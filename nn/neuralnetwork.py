@@ -1,8 +1,31 @@
+import bisect
+import copy
 import numpy as np
 
+from nn.activation import get_activation, numpy_sigmoid
+from nn.codegen import compile_network
+from nn.sparse import build_level_matrices
+
 
 class NeuralNetwork:
-    def __init__(self, genome=None):
+    # Evaluation modes:
+    #   compiled - one linear pass over connections in topological order (default),
+    #   layered - one sparse matrix product per depth level, good for deep and wide networks,
+    #   codegen - straight-line Python function generated for the network, fastest for small and medium networks,
+    #   dfs - reference implementation walking neurons with depth-first search
+    MODES = ('compiled', 'layered', 'codegen', 'dfs')
+
+    def __init__(self, genome=None, mode='compiled', activation='numpy'):
+        """
+        :param genome: (Genome) - genome to generate the network from
+        :param mode: (String) - evaluation mode, one of MODES
+        :param activation: (String) - activation backend used by every mode (see nn.activation)
+        """
+        if mode not in NeuralNetwork.MODES:
+            raise Exception("Unknown evaluation mode: {!s}".format(mode))
+        self._mode = mode
+        self._activation = activation
+        self._scalar_activation, self._array_activation = get_activation(activation)
         self._genome = None
         self._connections = {}
         self._neurons = {}
@@ -10,6 +33,19 @@ class NeuralNetwork:
         self._output_size = 0
         self._input_neurons = {}
         self._output_neurons = {}
+        self._plan_nodes = []
+        self._plan_offsets = []
+        self._plan_sources = []
+        self._plan_destinations = []
+        self._plan_weights = []
+        self._plan_sources_array = None
+        self._plan_weights_array = None
+        self._levels = []
+        self._function = None
+        self._activations = []
+        self._loop_sources = []
+        self.pruned_nodes = 0
+        self.pruned_connections = 0
         self._genome = genome
 
         if genome is not None:
@@ -25,6 +61,9 @@ class NeuralNetwork:
         self._genome = genome
         self._input_size = genome.input_size
         self._output_size = genome.output_size
+        # input and output nodes do not need any connection, for example when their genes were archived
+        for index in range(1, self._input_size + self._output_size + 1):
+            self._neurons[index] = Neuron()
         connections = genome.get_connections()
         for source, destination, weight, enabled in connections:
             if source not in self._neurons:
@@ -41,6 +80,8 @@ class NeuralNetwork:
         for index in range(self._input_size + 1, self._input_size + self._output_size + 1):
             self._output_neurons[index] = self._neurons[index]
 
+        self._compile()
+
     def clean_network(self):
         self._connections = {}
         self._neurons = {}
@@ -48,12 +89,337 @@ class NeuralNetwork:
         self._output_size = 0
         self._input_neurons = {}
         self._output_neurons = {}
+        self._plan_nodes = []
+        self._plan_offsets = []
+        self._plan_sources = []
+        self._plan_destinations = []
+        self._plan_weights = []
+        self._plan_sources_array = None
+        self._plan_weights_array = None
+        self._levels = []
+        self._function = None
+        self._activations = []
+        self._loop_sources = []
+        self.pruned_nodes = 0
+        self.pruned_connections = 0
+
+    def _compile(self):
+        """
+        Compiles the network into a flat evaluation plan. Every non-input node is put in topological order and its
+        incoming enabled connections are stored in flat lists:
+            _plan_nodes - IDs of computed nodes in topological order,
+            _plan_offsets - _plan_offsets[i]:_plan_offsets[i + 1] is the slice of connections feeding _plan_nodes[i],
+            _plan_sources, _plan_destinations, _plan_weights - connections grouped by destination.
+        Node IDs are used directly as indexes into the activation buffer.
+        Nodes and connections which can't affect any output (for example hidden nodes whose outgoing connections were
+        all disabled by splits) are left out, their numbers are stored in pruned_nodes and pruned_connections.
+        """
+        # searching from output nodes visits only nodes which have a path to some output
+        order = self._topological_order(sorted(self._output_neurons))
+
+        self._plan_nodes = []
+        self._plan_offsets = [0]
+        self._plan_sources = []
+        self._plan_destinations = []
+        self._plan_weights = []
+        for node_id in order:
+            if node_id in self._input_neurons:
+                continue
+            for source, weight, enabled in self._neurons[node_id].incoming_connections:
+                self._plan_sources.append(source)
+                self._plan_destinations.append(node_id)
+                self._plan_weights.append(weight)
+            self._plan_nodes.append(node_id)
+            self._plan_offsets.append(len(self._plan_sources))
+
+        self.pruned_nodes = len(self._neurons) - len(self._input_neurons) - len(self._plan_nodes)
+        self.pruned_connections = len(self._connections) - len(self._plan_sources)
+        self._build_plan_arrays()
+
+    def _build_plan_arrays(self):
+        """
+        Builds everything derived from the plan lists: NumPy arrays for batch evaluation, level matrices for
+        layered mode and the activation buffer.
+        """
+        self._plan_sources_array = np.array(self._plan_sources, dtype=np.intp)
+        self._plan_weights_array = np.array(self._plan_weights, dtype=np.float64)
+
+        if self._mode == 'layered':
+            # activation rows are simply node IDs
+            rows = dict((node_id, node_id) for node_id in self._neurons)
+            self._levels = build_level_matrices([(self._plan_nodes, self._plan_offsets, self._plan_sources,
+                                                  self._plan_weights, rows)])
+        elif self._mode == 'codegen':
+            self._function = compile_network(self)
+
+        self._activations = [0.0] * (max(self._neurons) + 1 if self._neurons else 0)
+        # sources closing a loop are read before they are computed, they give 0 in every mode
+        computed = set(range(1, self._input_size + 1))
+        loop_sources = set()
+        for position, node_id in enumerate(self._plan_nodes):
+            for k in range(self._plan_offsets[position], self._plan_offsets[position + 1]):
+                if self._plan_sources[k] not in computed:
+                    loop_sources.add(self._plan_sources[k])
+            computed.add(node_id)
+        self._loop_sources = sorted(loop_sources)
+
+    def derive(self, genome):
+        """
+        Returns network of a genome which was created as a copy of this network's genome and then mutated.
+        Mutations recorded in genome.mutations are patched into a copy of this network, so it is not rebuilt
+        from scratch. This network is not changed.
+        :param genome: (Genome) - mutated copy of this network's genome
+        :return: NeuralNetwork of given genome
+        """
+        nn = NeuralNetwork(mode=self._mode, activation=self._activation)
+        nn._genome = genome
+        nn._input_size = self._input_size
+        nn._output_size = self._output_size
+        nn._connections = dict(self._connections)
+        for node_id, neuron in self._neurons.items():
+            nn._neurons[node_id] = Neuron()
+            nn._neurons[node_id].incoming_connections = list(neuron.incoming_connections)
+        for index in self._input_neurons:
+            nn._input_neurons[index] = nn._neurons[index]
+        for index in self._output_neurons:
+            nn._output_neurons[index] = nn._neurons[index]
+        nn._plan_nodes = list(self._plan_nodes)
+        nn._plan_offsets = list(self._plan_offsets)
+        nn._plan_sources = list(self._plan_sources)
+        nn._plan_destinations = list(self._plan_destinations)
+        nn._plan_weights = list(self._plan_weights)
+        nn.pruned_nodes = self.pruned_nodes
+        nn.pruned_connections = self.pruned_connections
+
+        for mutation in genome.mutations:
+            if not nn._apply_mutation(mutation):
+                # mutation can't be patched in, fall back to full compilation
+                nn.generate_network(genome)
+                return nn
+
+        nn._build_plan_arrays()
+        return nn
+
+    def share(self, genome):
+        """
+        Returns network of a genome identical to this network's genome. Compiled structures are shared with this
+        network, not copied, so neither network may be patched in place afterwards (derive always copies).
+        :param genome: (Genome) - genome with the same connections as this network's genome
+        :return: NeuralNetwork of given genome
+        """
+        nn = copy.copy(self)
+        nn._genome = genome
+        return nn
+
+    def _apply_mutation(self, mutation):
+        """
+        Patches one mutation into the network.
+        :param mutation: tuple recorded by Genome.mutate:
+            ('weight', source, destination, weight) - weight of existing connection changed,
+            ('split', source, destination, node, weight) - connection split with new node (source -> node has weight
+                1.0, node -> destination has the old weight),
+            ('connection', source, destination, weight) - new connection added
+        :return: False if the mutation can't be patched in
+        """
+        kind, source, destination = mutation[:3]
+        # mutations touching pruned nodes may make them relevant again, so they need full compilation
+        for node_id in (source, destination):
+            if node_id not in self._input_neurons and node_id not in self._plan_nodes:
+                return False
+
+        if kind == 'weight':
+            weight = mutation[3]
+            if (source, destination) not in self._connections:
+                return False
+            self._connections[(source, destination)] = weight
+            incoming = self._neurons[destination].incoming_connections
+            incoming[:] = [(s, weight, e) if s == source else (s, w, e) for s, w, e in incoming]
+            position = self._plan_nodes.index(destination)
+            k = self._plan_sources.index(source, self._plan_offsets[position], self._plan_offsets[position + 1])
+            self._plan_weights[k] = weight
+            return True
+
+        if kind == 'split':
+            node_id, weight = mutation[3:]
+            if node_id in self._neurons:
+                return False
+            self._remove_connection(source, destination)
+            self._neurons[node_id] = Neuron()
+            # the new node goes right before the old destination, after the source
+            self._plan_nodes.insert(self._plan_nodes.index(destination), node_id)
+            position = self._plan_nodes.index(node_id)
+            self._plan_offsets.insert(position, self._plan_offsets[position])
+            self._add_connection(source, node_id, 1.0)
+            self._add_connection(node_id, destination, weight)
+            return True
+
+        if kind == 'connection':
+            weight = mutation[3]
+            if source not in self._neurons or destination not in self._neurons or destination in self._input_neurons:
+                return False
+            # source has to be computed before destination to keep the plan topological
+            if source not in self._input_neurons and \
+                    self._plan_nodes.index(source) > self._plan_nodes.index(destination):
+                return False
+            self._add_connection(source, destination, weight)
+            return True
+
+        raise Exception("Unknown mutation: {!s}".format(kind))
+
+    def _add_connection(self, source, destination, weight):
+        self._connections[(source, destination)] = weight
+        incoming = self._neurons[destination].incoming_connections
+        # connections are kept ordered by source, like after full compilation, so signals are summed in the same order
+        index = bisect.bisect_left([s for s, _, _ in incoming], source)
+        incoming.insert(index, (source, weight, True))
+
+        position = self._plan_nodes.index(destination)
+        start, end = self._plan_offsets[position], self._plan_offsets[position + 1]
+        k = bisect.bisect_left(self._plan_sources, source, start, end)
+        self._plan_sources.insert(k, source)
+        self._plan_destinations.insert(k, destination)
+        self._plan_weights.insert(k, weight)
+        for i in range(position + 1, len(self._plan_offsets)):
+            self._plan_offsets[i] += 1
+
+    def _remove_connection(self, source, destination):
+        del self._connections[(source, destination)]
+        incoming = self._neurons[destination].incoming_connections
+        incoming[:] = [connection for connection in incoming if connection[0] != source]
+
+        position = self._plan_nodes.index(destination)
+        start, end = self._plan_offsets[position], self._plan_offsets[position + 1]
+        k = self._plan_sources.index(source, start, end)
+        del self._plan_sources[k]
+        del self._plan_destinations[k]
+        del self._plan_weights[k]
+        for i in range(position + 1, len(self._plan_offsets)):
+            self._plan_offsets[i] -= 1
+
+    def _topological_order(self, roots):
+        """
+        Returns IDs of given neurons and all neurons they depend on, in the order in which depth-first search fires
+        them (every source before its destination). The search is iterative, so deep networks don't hit the recursion
+        limit. If the genome contains a loop, the connection closing it reads 0 (see _loop_sources), so forward pass
+        doesn't depend on previous passes.
+        :param roots: IDs of neurons to start the search from
+        """
+        visited = set()
+        order = []
+        for root in roots:
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(self._neurons[root].incoming_connections))]
+            while stack:
+                node_id, incoming = stack[-1]
+                for source, weight, enabled in incoming:
+                    if source not in visited:
+                        visited.add(source)
+                        stack.append((source, iter(self._neurons[source].incoming_connections)))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node_id)
+        return order
 
     def forward(self, X):
         """
         Returns value of neural network output after forward propagation.
         :param X: Vector of inputs
         """
+        if self._mode == 'dfs':
+            return self._forward_dfs(X)
+
+        if len(X) != self._input_size:
+            raise Exception("Expected {!s} inputs, got {!s} instead".format(self._input_size, len(X)))
+
+        if self._mode == 'layered':
+            return list(self._forward_layered(np.asarray(X, dtype=np.float64)[np.newaxis, :])[0])
+        if self._mode == 'codegen':
+            return self._function(X)
+        return self._forward_compiled(X)
+
+    def _forward_compiled(self, X):
+        """
+        Evaluates the compiled plan in one linear pass over the connections.
+        :param X: Vector of inputs
+        """
+
+        activations = self._activations
+        sources = self._plan_sources
+        weights = self._plan_weights
+        offsets = self._plan_offsets
+        activation_function = self._scalar_activation
+
+        # Fire input nodes
+        for index in range(self._input_size):
+            activations[index + 1] = activation_function(X[index])
+        for node_id in self._loop_sources:
+            activations[node_id] = 0.0
+
+        # Every node is fired once all of its sources are already computed
+        start = 0
+        for position, node_id in enumerate(self._plan_nodes):
+            end = offsets[position + 1]
+            total = 0
+            for k in range(start, end):
+                total += activations[sources[k]] * weights[k]
+            activations[node_id] = activation_function(total)
+            start = end
+
+        # Get output signals
+        return activations[self._input_size + 1:self._input_size + self._output_size + 1]
+
+    def forward_batch(self, X):
+        """
+        Returns outputs of neural network for many input vectors at once. Every node is computed for all samples
+        with one vectorized operation.
+        :param X: 2-D array of inputs, one sample per row
+        :return: 2-D array of outputs, one row per sample
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self._input_size:
+            raise Exception("Expected {!s} inputs, got {!s} instead".format(self._input_size, X.shape[-1]))
+
+        if self._mode == 'layered':
+            return self._forward_layered(X)
+        if self._mode == 'dfs':
+            return np.array([self._forward_dfs(x) for x in X]).reshape(X.shape[0], self._output_size)
+
+        activation_function = self._array_activation
+        activations = np.zeros((len(self._activations), X.shape[0]))
+        activations[1:self._input_size + 1] = activation_function(X.T.copy())
+
+        sources = self._plan_sources_array
+        weights = self._plan_weights_array
+        offsets = self._plan_offsets
+        for position, node_id in enumerate(self._plan_nodes):
+            start, end = offsets[position], offsets[position + 1]
+            activations[node_id] = activation_function(weights[start:end].dot(activations[sources[start:end]]))
+
+        return activations[self._input_size + 1:self._input_size + self._output_size + 1].T
+
+    def _forward_layered(self, X):
+        """
+        Evaluates the network level by level. Nodes on the same depth don't depend on each other, so every level is
+        one sparse matrix product.
+        :param X: 2-D array of inputs, one sample per row
+        :return: 2-D array of outputs, one row per sample
+        """
+        activation_function = self._array_activation
+        activations = np.zeros((len(self._activations), X.shape[0]))
+        activations[1:self._input_size + 1] = activation_function(X.T.copy())
+        for level in self._levels:
+            activations[level.rows] = activation_function(level.dot(activations))
+
+        return activations[self._input_size + 1:self._input_size + self._output_size + 1].T
+
+    def _forward_dfs(self, X):
+        """
+        Reference implementation of forward propagation which walks the neurons with depth-first search on every call.
+        :param X: Vector of inputs
+        """
         self._clear_neurons()
         if len(X) != self._input_size:
             raise Exception("Expected {!s} inputs, got {!s} instead".format(self._input_size, len(X)))
@@ -65,7 +431,7 @@ class NeuralNetwork:
 
         # Fire output nodes
         for output_neuron in self._output_neurons.values():
-            output_neuron.fire()
+            output_neuron.fire(self._scalar_activation)
 
         # Get output signals
         y = []
@@ -77,21 +443,23 @@ class NeuralNetwork:
         for neuron in self._neurons.values():
             neuron._input_signals.clear()
 
-    def _DFSUtil(self, v, visited):
-        visited[v-1] = True
+    def _DFSUtil(self, v, visited, computed):
+        visited.add(v)
 
         # Go deeper into connected nodes
         for source, weight, enabled in self._neurons[v].incoming_connections:
-            if visited[source-1] == False:
-                self._DFSUtil(source, visited)
+            if source not in visited:
+                self._DFSUtil(source, visited, computed)
 
-        # After handling all connected nodes calculate signal in this node
+        # After handling all connected nodes calculate signal in this node, source closing a loop isn't computed yet
+        # and gives 0 like in other modes
         for source, weight, enabled in self._neurons[v].incoming_connections:
-            if enabled:
+            if enabled and source in computed:
                 source_id = source
-                output_signal = self._neurons[source_id].fire()
+                output_signal = self._neurons[source_id].fire(self._scalar_activation)
                 connection_value = output_signal * weight
                 self._neurons[v].take_input_signal(connection_value)
+        computed.add(v)
 
 
     def _DFS(self):
@@ -99,16 +467,24 @@ class NeuralNetwork:
         Depth-first search
         :return:
         """
-        visited = [False]*(len(self._neurons))
+        # node IDs do not have to be contiguous, so visited nodes are kept in a set
+        visited = set()
+        computed = set()
 
         # We start depth-first search with node with ID 1
-        for v, index in zip(visited, range(len(visited))):
-            if(v == False):
-                self._DFSUtil(index + 1, visited)
+        for node_id in sorted(self._neurons):
+            if node_id not in visited:
+                self._DFSUtil(node_id, visited, computed)
 
     def get_genome(self):
         return self._genome
 
+    def get_mode(self):
+        return self._mode
+
+    def get_activation(self):
+        return self._activation
+
 class Neuron:
     def __init__(self):
         self._input_signals = []
@@ -118,8 +494,15 @@ class Neuron:
     def take_input_signal(self, input_signal):
         self._input_signals.append(input_signal)
 
-    def fire(self):
-        self._output_signal = self._activation_function(self._input_signals)
+    def fire(self, activation_function=None):
+        """
+        Computes output signal from the sum of input signals.
+        :param activation_function: scalar kernel of activation backend (see nn.activation), numpy by default
+        """
+        if activation_function is None:
+            self._output_signal = self._activation_function(self._input_signals)
+        else:
+            self._output_signal = activation_function(sum(self._input_signals))
         return self._output_signal
 
     def get_output_signal(self):
@@ -127,4 +510,4 @@ class Neuron:
 
     @staticmethod
     def _activation_function(input_signal):
-        return 1.0/(1 + np.exp(-4.9 * sum(input_signal)))
+        return numpy_sigmoid(sum(input_signal))
@@ -0,0 +1,91 @@
+import numpy as np
+
+from nn.activation import get_activation
+from nn.neuralnetwork import NeuralNetwork
+from nn.sparse import build_level_matrices
+
+
+class PopulationNetwork:
+    """
+    Evaluates many neural networks on the same inputs at once. All networks are merged into one block-structured
+    sparse computation grouped by node depth, so the whole population is evaluated with one NumPy pass per depth.
+    """
+
+    def __init__(self, phenotypes=None, activation='numpy'):
+        """
+        :param phenotypes: list of NeuralNetwork or Genome objects, all of them with the same input and output sizes
+        :param activation: (String) - activation backend (see nn.activation)
+        """
+        self._activation_function = get_activation(activation)[1]
+        self._networks = []
+        self._input_size = 0
+        self._output_size = 0
+        self._rows_count = 0
+        self._levels = []
+        self._output_rows = None
+
+        if phenotypes is not None:
+            self.generate_network(phenotypes)
+
+    def generate_network(self, phenotypes):
+        """
+        Merges compiled plans of all phenotypes into level matrices.
+        :param phenotypes: list of NeuralNetwork or Genome objects
+        """
+        self._networks = [phenotype if isinstance(phenotype, NeuralNetwork) else NeuralNetwork(phenotype)
+                          for phenotype in phenotypes]
+        if not self._networks:
+            raise Exception("Population is empty")
+
+        self._input_size = self._networks[0]._input_size
+        self._output_size = self._networks[0]._output_size
+
+        # input nodes are shared by all networks and take first rows
+        self._rows_count = self._input_size
+        plans = []
+        output_rows = []
+        for nn in self._networks:
+            if nn._input_size != self._input_size or nn._output_size != self._output_size:
+                raise Exception("All networks in population must have the same input and output sizes")
+
+            rows = dict((index, index - 1) for index in range(1, self._input_size + 1))
+            for node_id in nn._plan_nodes:
+                rows[node_id] = self._rows_count
+                self._rows_count += 1
+            plans.append((nn._plan_nodes, nn._plan_offsets, nn._plan_sources, nn._plan_weights, rows))
+            output_rows.append([rows[index]
+                                for index in range(self._input_size + 1, self._input_size + self._output_size + 1)])
+
+        self._levels = build_level_matrices(plans)
+        self._output_rows = np.array(output_rows, dtype=np.intp)
+
+    def forward(self, X):
+        """
+        Returns outputs of every network for one input vector.
+        :param X: Vector of inputs
+        :return: 2-D array of outputs, one row per network
+        """
+        if len(X) != self._input_size:
+            raise Exception("Expected {!s} inputs, got {!s} instead".format(self._input_size, len(X)))
+        return self.forward_batch(np.asarray(X, dtype=np.float64)[np.newaxis, :])[:, 0, :]
+
+    def forward_batch(self, X):
+        """
+        Returns outputs of every network for many input vectors.
+        :param X: 2-D array of inputs, one sample per row
+        :return: 3-D array of outputs indexed by (network, sample, output)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self._input_size:
+            raise Exception("Expected {!s} inputs, got {!s} instead".format(self._input_size, X.shape[-1]))
+
+        activation_function = self._activation_function
+        activations = np.zeros((self._rows_count, X.shape[0]))
+        activations[:self._input_size] = activation_function(X.T.copy())
+        for level in self._levels:
+            activations[level.rows] = activation_function(level.dot(activations))
+
+        return activations[self._output_rows].transpose(0, 2, 1)
+
+    def get_networks(self):
+        return self._networks
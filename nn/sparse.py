@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class LevelMatrix:
+    """
+    Connections feeding one depth level of a network stored in CSR format. Row i of the matrix computes the input
+    signal of node rows[i]: connections indptr[i]:indptr[i + 1] read activations of nodes indices[...] and multiply
+    them by data[...].
+    """
+
+    def __init__(self, rows, indptr, indices, data):
+        """
+        :param rows: (array of int) - activation rows computed by this level
+        :param indptr: (array of int) - len(rows) + 1 offsets into indices and data
+        :param indices: (array of int) - activation rows of connection sources
+        :param data: (array of float) - connection weights
+        """
+        self.rows = np.asarray(rows, dtype=np.intp)
+        self.indptr = np.asarray(indptr, dtype=np.intp)
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.data = np.asarray(data, dtype=np.float64)
+
+        # reduceat can't handle empty rows, so only starts of non-empty rows are used
+        self._nonempty = self.indptr[:-1] < self.indptr[1:]
+        self._starts = self.indptr[:-1][self._nonempty]
+
+    def dot(self, activations):
+        """
+        Sparse matrix product with activations.
+        :param activations: 2-D array with one row per node and one column per sample
+        :return: 2-D array of input signals, one row per node in rows
+        """
+        signals = np.zeros((len(self.rows), activations.shape[1]))
+        if len(self.indices):
+            products = activations[self.indices] * self.data[:, np.newaxis]
+            signals[self._nonempty] = np.add.reduceat(products, self._starts, axis=0)
+        return signals
+
+
+def build_level_matrices(plans):
+    """
+    Groups nodes of compiled networks by depth and builds one LevelMatrix per depth. Nodes on the same depth don't
+    depend on each other, so they can be computed together.
+    :param plans: list of tuples (nodes, offsets, sources, weights, rows) where first four items are compiled plan
+        of a network (see NeuralNetwork._compile) and rows is a dictionary mapping node IDs to activation rows
+    :return: list of LevelMatrix objects ordered by depth
+    """
+    levels = []
+    for nodes, offsets, sources, weights, rows in plans:
+        depths = {}
+        for position, node_id in enumerate(nodes):
+            # input nodes and sources closing a loop (not computed yet) have depth 0
+            source_depths = [depths.get(source, 0) for source in sources[offsets[position]:offsets[position + 1]]]
+            depth = max(source_depths, default=0) + 1
+            depths[node_id] = depth
+            while len(levels) < depth:
+                levels.append([])
+            levels[depth - 1].append((rows[node_id],
+                                      [rows[source] for source in sources[offsets[position]:offsets[position + 1]]],
+                                      weights[offsets[position]:offsets[position + 1]]))
+
+    level_matrices = []
+    for level in levels:
+        indptr = [0]
+        indices = []
+        data = []
+        for row, row_sources, row_weights in level:
+            indices.extend(row_sources)
+            data.extend(row_weights)
+            indptr.append(len(indices))
+        level_matrices.append(LevelMatrix([row for row, _, _ in level], indptr, indices, data))
+    return level_matrices
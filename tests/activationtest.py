@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+from nn.activation import get_activation, numpy_sigmoid, TABLE_ERROR_BOUND
+from nn.neuralnetwork import NeuralNetwork
+from tests.neuralnetworktest import GenomeMock
+
+
+class ActivationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.x = np.linspace(-8, 8, 40001)
+        self.expected = numpy_sigmoid(self.x)
+
+    def test_math_backend(self):
+        scalar, array = get_activation('math')
+        np.testing.assert_allclose(array(self.x.copy()), self.expected, rtol=1e-12, atol=1e-15)
+        for value in self.x[::97]:
+            self.assertAlmostEqual(scalar(float(value)), numpy_sigmoid(value), places=12)
+        self.assertEqual(scalar(-1000.0), 0.0)
+        self.assertEqual(scalar(1000.0), 1.0)
+
+    def test_table_backend_error_bound(self):
+        scalar, array = get_activation('table')
+        self.assertLess(np.max(np.abs(array(self.x) - self.expected)), TABLE_ERROR_BOUND)
+        for value in self.x[::97]:
+            self.assertLess(abs(scalar(float(value)) - numpy_sigmoid(value)), TABLE_ERROR_BOUND)
+
+    def test_unknown_activation_exception(self):
+        with self.assertRaises(Exception) as e:
+            get_activation('relu')
+        self.assertEqual(str(e.exception), "Unknown activation: relu")
+
+    def test_network_backends(self):
+        genome = GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (1, 6, -1, True), (5, 6, -3.4, True), (3, 6, 4, True),
+                             (6, 4, 5, True)], 3, 1)
+        X = np.array([[0.2, 2, -0.02], [1, 0, 0], [-3, 0.5, 7]])
+        expected = NeuralNetwork(genome).forward_batch(X)
+        for activation in ('math', 'table'):
+            for mode in ('compiled', 'layered'):
+                nn = NeuralNetwork(genome, mode=mode, activation=activation)
+                self.assertEqual(nn.get_activation(), activation)
+                np.testing.assert_allclose(nn.forward_batch(X), expected, atol=1e-4)
+                np.testing.assert_allclose(nn.forward(X[0]), expected[0], atol=1e-4)
+        # input array must not be overwritten by in-place kernels
+        np.testing.assert_array_equal(X, [[0.2, 2, -0.02], [1, 0, 0], [-3, 0.5, 7]])
+
+    def test_modes_use_backend(self):
+        genome = GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (1, 6, -1, True), (5, 6, -3.4, True), (3, 6, 4, True),
+                             (6, 4, 5, True)], 3, 1)
+        X = [0.2, 0.1, -0.02]
+        for activation in ('numpy', 'math', 'table'):
+            expected = NeuralNetwork(genome, activation=activation).forward(X)
+            for mode in NeuralNetwork.MODES:
+                self.assertAlmostEqual(NeuralNetwork(genome, mode=mode, activation=activation).forward(X)[0],
+                                       expected[0], places=12)
+        # table interpolation differs from the exact sigmoid
+        self.assertNotAlmostEqual(NeuralNetwork(genome, mode='dfs', activation='table').forward(X)[0],
+                                  NeuralNetwork(genome, mode='dfs').forward(X)[0], places=12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import random
+import unittest
+
+import numpy as np
+
+from evolution.arraygenome import ArrayGenome
+from evolution.generation import Generation, Group
+from evolution.genome import Genome, ConnectionGene
+from nn.neuralnetwork import NeuralNetwork
+from tests.genomecase import GenomeTestCase
+
+
+class ArrayGenomeTestCase(GenomeTestCase):
+    def test_uniqueness_of_connections(self):
+        with self.assertRaises(Exception):
+            ArrayGenome([[1, 2, 0, True], [1, 2, 0, True]], 1, 1)
+
+    def test_uniqueness_of_innovation_numbers(self):
+        with self.assertRaises(Exception):
+            ArrayGenome([[1, 3, 0, True, 0], [2, 3, 0, True, 0]], 2, 1)
+        genome = ArrayGenome([[1, 3, 0, True, 1], [2, 3, 0, True, 2]], 2, 1)
+        with self.assertRaises(Exception):
+            genome._append_genes([2, 4], [4, 3], [1.0, 1.0], [1, 3])
+        # genome is not changed by rejected genes
+        self.assertEqual(genome._get_connections_with_innovations(), [(1, 3, 0, True, 1), (2, 3, 0, True, 2)])
+
+    def test_explicit_innovation_numbers_are_not_given_out(self):
+        for genome_class in (Genome, ArrayGenome):
+            ConnectionGene._innovation_number = 0
+            genome = genome_class([[1, 3, 0, True, 7], [2, 3, 0, True, 4]], 2, 1)
+            self.assertEqual(ConnectionGene._innovation_number, 8)
+            genome._mutate_split_connection()
+            innovation_numbers = [connection[4] for connection in genome._get_connections_with_innovations()]
+            self.assertEqual(sorted(innovation_numbers), [4, 7, 8, 9])
+
+    def test_genome_creation_with_loop(self):
+        with self.assertRaises(Exception):
+            ArrayGenome([[1, 1, 0, True]], 1, 0)
+
+    def test_get_connections(self):
+        genome = ArrayGenome([[2, 3, 0, True], [1, 4, 0.5, False], [1, 3, 0, True], [2, 4, 0, True]], 2, 2)
+        self.assertEqual(genome.get_connections(), [(1, 3, 0, True), (1, 4, 0.5, False), (2, 3, 0, True),
+                                                    (2, 4, 0, True)])
+        self.assertEqual(genome.get_connections_ids(), [(1, 3), (1, 4), (2, 3), (2, 4)])
+        self.assertEqual([node.node_type for node in genome.get_nodes()], ['input', 'input', 'output', 'output'])
+
+    def test_conversion(self):
+        genome = Genome([[1, 3, 0.5, True], [1, 4, 1, True], [2, 3, -1, False], [2, 4, 0, True]], 2, 2)
+        genome._mutate_split_connection()
+        array_genome = ArrayGenome.from_genome(genome)
+        self.assertEqual(array_genome.get_connections(), genome.get_connections())
+        self.assertEqual(array_genome.fingerprint(), genome.fingerprint())
+        self.assertEqual(array_genome.to_genome().get_connections(), genome.get_connections())
+        self.assertEqual(NeuralNetwork(array_genome).forward([0.2, 1]), NeuralNetwork(genome).forward([0.2, 1]))
+
+    def test_mutate_new_connection(self):
+        genome = ArrayGenome([[1, 3, 0, True], [1, 4, 0, True], [2, 3, 0, True]], 2, 2)
+        genome._mutate_new_connection(1.0)
+        self.assertEqual([(1, 3), (1, 4), (2, 3), (2, 4)], genome.get_connections_ids())
+        genome._mutate_new_connection(1.0)
+        self.assertEqual([(1, 3), (1, 4), (2, 3), (2, 4)], genome.get_connections_ids())
+
+    def test_mutate_new_connection_does_not_create_loop(self):
+        # 1 -> 3 -> 4 -> 2, the only new connections not closing a loop are 1 -> 2, 1 -> 4 and 3 -> 2
+        genome = ArrayGenome([[1, 3, 0, True], [3, 4, 0, True], [4, 2, 0, True]], 1, 1)
+        for _ in range(3):
+            genome._mutate_new_connection(1.0)
+        self.assertEqual([(1, 2), (1, 3), (1, 4), (3, 2), (3, 4), (4, 2)], genome.get_connections_ids())
+        genome._mutate_new_connection(1.0)
+        self.assertEqual(6, len(genome.get_connections()))
+
+    def test_mutations_do_not_create_loops(self):
+        for i in range(50):
+            genome = ArrayGenome([[1, 3, 0.5, True], [2, 3, 0.5, True]], 2, 1)
+            for j in range(2):
+                genome._mutate_split_connection()
+            for j in range(4):
+                genome._mutate_new_connection(1.0)
+            # adjacency index kept up to date by mutations is the same as a newly built one
+            successors = genome._get_successors()
+            rebuilt = ArrayGenome(genome._get_connections_with_innovations(), 2, 1)
+            self.assertEqual(successors, rebuilt._get_successors())
+            for source_id, destination_id in genome.get_connections_ids():
+                self.assertNotIn(source_id, Genome._get_reachable(destination_id, successors))
+
+    def test_mutate_split_connection(self):
+        genome = ArrayGenome([[1, 2, 0.5, True]], 1, 1)
+        genome._mutate_split_connection()
+        self.assertEqual([(1, 2, 0.5, False), (1, 3, 1.0, True), (3, 2, 0.5, True)], genome.get_connections())
+        self.assertEqual(genome.mutations, [('split', 1, 2, 3, 0.5)])
+
+    def test_mutate_change_weight(self):
+        genome = ArrayGenome([[1, 2, 0.0, True], [1, 3, 0.0, False]], 1, 2)
+        genome._mutate_change_weight(1.0)
+        self.assertNotAlmostEqual(genome.get_connections()[0][2], 0.0)
+        self.assertEqual(genome.get_connections()[1][2], 0.0)
+
+    def test_compatibility_distance_matches_genome(self):
+        random.seed(1)
+        coefficients = dict(excess_factor=1.0, disjoint_factor=2.0, weight_difference_factor=0.5)
+        mutation_coefficients = {'add_connection': 0.5, 'split_connection': 0.5, 'change_weight': 0.8,
+                                 'new_connection_abs_max_weight': 1.0, 'max_weight_mutation': 0.5}
+        genome1 = Genome([[1, 4, 0.5, True], [2, 4, -1, True], [3, 5, 1, True]], 3, 2)
+        genome2 = Genome._reproduce_equal_genomes(genome1, genome1)
+        for i in range(20):
+            genome1.mutate(mutation_coefficients)
+            genome2.mutate(mutation_coefficients)
+            self.assertAlmostEqual(ArrayGenome.from_genome(genome1).compatibility_distance(
+                ArrayGenome.from_genome(genome2), coefficients), genome1.compatibility_distance(genome2, coefficients))
+
+    def test_reproduce(self):
+        genome1 = ArrayGenome([[1, 3, 0, True], [2, 4, 0, True], [1, 4, 1, True]], 2, 2)
+        genome2 = ArrayGenome(genome1._get_connections_with_innovations(), 2, 2)
+        genome2.weights[genome2.innovations == genome1.innovations[2]] = 5
+        genome2._append_genes([2], [3], [0])
+        genome1.fitness = 2.0
+        genome2.fitness = 1.0
+        child = ArrayGenome.reproduce(genome1, genome2)
+        self.assertEqual([(1, 3), (1, 4), (2, 4)], child.get_connections_ids())
+        self.assertIn(child.get_connections()[1][2], (1, 5))
+
+        genome1.fitness = 1.0
+        child = ArrayGenome.reproduce(genome1, genome2)
+        self.assertEqual([(1, 3), (1, 4), (2, 3), (2, 4)], child.get_connections_ids())
+        self.assertIs(ArrayGenome.reproduce(genome1, genome1).parent, genome1)
+
+    def test_reproduce_with_seed(self):
+        connections = [[source, destination, 0.0, True] for source in (1, 2, 3) for destination in (4, 5)]
+        for genome_class in (Genome, ArrayGenome):
+            genome1 = genome_class(connections, 3, 2)
+            genome2 = genome_class([list(connection[:2]) + [1.0, False, connection[4]]
+                                    for connection in genome1._get_connections_with_innovations()], 3, 2)
+            children = []
+            for numpy_seed in (1, 2):
+                # crossover depends only on seed of random
+                random.seed(0)
+                np.random.seed(numpy_seed)
+                children.append([genome_class.reproduce(genome1, genome2).get_connections() for i in range(10)])
+            self.assertEqual(children[0], children[1])
+            self.assertGreater(len(set(tuple(child) for child in children[0])), 1)
+
+    def test_json_generation(self):
+        genome = ArrayGenome([[1, 3, 0, True], [1, 4, 0, True], [2, 3, 0, True], [2, 4, 0, True]], 2, 2)
+        genome_from_json = ArrayGenome.from_json(genome.to_json())
+        self.assertEqual(genome.get_connections(), genome_from_json.get_connections())
+        self.assertEqual(genome.to_json(), Genome.from_json(genome.to_json()).to_json())
+
+    def test_bytes_generation(self):
+        genome = ArrayGenome([[1, 3, 0.5, True, 4], [1, 4, 0.25, False, 2], [2, 3, 0.0, True, 7]], 2, 2)
+        genome.fitness = 3.5
+        genome_from_bytes = ArrayGenome.from_bytes(genome.to_bytes())
+        self.assertEqual(genome.get_connections(), genome_from_bytes.get_connections())
+        self.assertEqual(genome.innovations.tolist(), genome_from_bytes.innovations.tolist())
+        self.assertEqual(genome_from_bytes.fitness, 3.5)
+        self.assertIsNone(genome_from_bytes.adjusted_fitness)
+        self.assertEqual(genome.fingerprint(), Genome.from_bytes(genome.to_bytes()).fingerprint())
+
+    def test_generation_of_array_genomes(self):
+        group = Group()
+        for i in range(10):
+            group.add_genome(ArrayGenome([[1, 3, random.normalvariate(mu=0.0, sigma=1.0), True, 0],
+                                          [2, 3, random.normalvariate(mu=0.0, sigma=1.0), True, 1]], 2, 1))
+        generation = Generation([group])
+        for i in range(3):
+            generation = generation.create_new_generation()
+        for group in generation.groups.values():
+            for genome in group.genomes:
+                self.assertIsInstance(genome, ArrayGenome)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from nn.controller import NetworkController
+from nn.neuralnetwork import NeuralNetwork
+from tests.neuralnetworktest import GenomeMock
+
+
+class NetworkControllerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.genome = GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (1, 7, -1, True), (5, 7, -3.4, True),
+                                  (3, 7, 4, True), (7, 6, 2, True), (6, 4, 0.3, True), (3, 8, 1, True)], 3, 2)
+        self.network = NeuralNetwork(self.genome)
+
+    def test_step_matches_forward(self):
+        controller = NetworkController(self.network)
+        for X in ([0.2, 2, -0.02], [1, 0, 0], [-3, 0.5, 7]):
+            np.testing.assert_allclose(controller.step(np.array(X)), self.network.forward(X))
+
+    def test_buffers_are_reused(self):
+        controller = NetworkController(self.network)
+        inputs = controller.inputs
+        outputs = controller.outputs
+        controller.inputs[:] = [0.2, 2, -0.02]
+        y = controller.step()
+        self.assertIs(y, outputs)
+        self.assertIs(controller.inputs, inputs)
+        np.testing.assert_allclose(y, self.network.forward([0.2, 2, -0.02]))
+
+    def test_extreme_inputs(self):
+        controller = NetworkController(NeuralNetwork(GenomeMock([(1, 2, -1000, True)], 1, 1), activation='math'))
+        self.assertEqual(controller.step([1])[0], 0.0)
+        controller = NetworkController(NeuralNetwork(GenomeMock([(1, 2, 1000, True)], 1, 1), activation='math'))
+        self.assertEqual(controller.step([1])[0], 1.0)
+
+    def test_network_activation(self):
+        network = NeuralNetwork(self.genome, activation='table')
+        controller = NetworkController(network)
+        X = [0.2, 2, -0.02]
+        np.testing.assert_allclose(controller.step(np.array(X)), network.forward(X))
+        self.assertNotEqual(list(controller.step(np.array(X))), NeuralNetwork(self.genome).forward(X))
+
+    def test_loop(self):
+        network = NeuralNetwork(GenomeMock([(1, 2, 1, True), (1, 3, 0.5, True), (3, 4, 1, True), (4, 3, 1, True),
+                                            (4, 2, 1, True)], 1, 1))
+        controller = NetworkController(network)
+        for X in ([0.3], [-2.0], [0.3]):
+            np.testing.assert_allclose(controller.step(X), network.forward(X))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import random
+import unittest
+
+import numpy as np
+
+import evolution.distance
+from evolution.arraygenome import ArrayGenome
+from evolution.distance import compatibility_distances
+from evolution.genome import Genome
+from tests.genomecase import GenomeTestCase
+
+
+class CompatibilityDistancesTestCase(GenomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.coefficients = dict(excess_factor=1.0, disjoint_factor=2.0, weight_difference_factor=0.4)
+        mutation_coefficients = dict(add_connection=0.5, split_connection=0.5, change_weight=1.0,
+                                     new_connection_abs_max_weight=1.0, max_weight_mutation=2.0)
+        self.genomes = [Genome([[1, 4, 0.5, True], [2, 4, 0.5, True], [3, 5, 0.5, True]], 3, 2) for i in range(3)]
+        for i in range(30):
+            parent = random.choice(self.genomes)
+            parent.fitness = 1.0
+            child = Genome.reproduce(parent, parent)
+            for j in range(random.randint(1, 30)):
+                child.mutate(mutation_coefficients)
+            self.genomes.append(child)
+
+    def assert_distances(self, distances, genomes, representatives):
+        self.assertEqual(distances.shape, (len(genomes), len(representatives)))
+        for genome, genome_distances in zip(genomes, distances):
+            for representative, distance in zip(representatives, genome_distances):
+                self.assertAlmostEqual(distance, genome.compatibility_distance(representative, self.coefficients))
+
+    def test_all_pairs(self):
+        distances = compatibility_distances(self.genomes, self.coefficients)
+        self.assert_distances(distances, self.genomes, self.genomes)
+        self.assertTrue(np.allclose(distances, distances.T))
+
+    def test_representatives(self):
+        representatives = self.genomes[:4]
+        distances = compatibility_distances(self.genomes, self.coefficients, representatives)
+        self.assert_distances(distances, self.genomes, representatives)
+
+    def test_array_genomes(self):
+        array_genomes = [ArrayGenome.from_genome(genome) for genome in self.genomes]
+        distances = compatibility_distances(array_genomes, self.coefficients, self.genomes[:5])
+        self.assert_distances(distances, self.genomes, self.genomes[:5])
+
+    def test_chunks_in_processes(self):
+        self.addCleanup(setattr, evolution.distance, 'CHUNK_ELEMENTS', evolution.distance.CHUNK_ELEMENTS)
+        evolution.distance.CHUNK_ELEMENTS = 100
+        distances = compatibility_distances(self.genomes, self.coefficients, processes=2)
+        self.assert_distances(distances, self.genomes, self.genomes)
+
+    def test_chunks(self):
+        self.addCleanup(setattr, evolution.distance, 'CHUNK_ELEMENTS', evolution.distance.CHUNK_ELEMENTS)
+        evolution.distance.CHUNK_ELEMENTS = 2000
+        matrices = evolution.distance._build_gene_matrices(self.genomes, self.genomes[:3], self.coefficients)
+        chunks = evolution.distance._get_chunks(matrices)
+        self.assertEqual([start for start, stop in chunks[1:]], [stop for start, stop in chunks[:-1]])
+        self.assertEqual((chunks[0][0], chunks[-1][1]), (0, len(self.genomes)))
+        for start, stop in chunks:
+            width = len(set(matrices['columns'][matrices['offsets'][start]:matrices['offsets'][stop]]))
+            self.assertTrue(stop - start == 1 or (stop - start) * 3 * width <= 2000)
+        distances = compatibility_distances(self.genomes, self.coefficients, self.genomes[:3])
+        self.assert_distances(distances, self.genomes, self.genomes[:3])
+
+    def test_empty(self):
+        self.assertEqual(compatibility_distances([], self.coefficients, self.genomes).shape, (0, len(self.genomes)))
+        self.assertEqual(compatibility_distances(self.genomes, self.coefficients, []).shape, (len(self.genomes), 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
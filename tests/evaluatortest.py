@@ -0,0 +1,145 @@
+import math
+import unittest
+
+import numpy as np
+
+from evolution.evaluator import Evaluator, XorEvaluator, ProcessEvaluator, TetrisEvaluator, xor_fitness
+from evolution.generation import Generation, Group
+from evolution.genome import Genome
+from evolution.phenotypecache import PhenotypeCache
+from evolution.tetris import TetrisGame, play_tetris, ROWS, COLS
+from nn.neuralnetwork import NeuralNetwork
+from tests.genomecase import GenomeTestCase
+
+
+class ConstantEvaluator(Evaluator):
+    def __init__(self):
+        self.calls = 0
+
+    def evaluate(self, genomes, phenotypes=None):
+        self.calls += 1
+        return [float(len(genome.get_connections())) for genome in genomes]
+
+
+def tetris_genome(weights):
+    # every output is connected to every input, the same weight for all inputs of an output
+    return Genome([[source, ROWS * COLS + 1 + output, weight, True]
+                   for output, weight in enumerate(weights) for source in range(1, ROWS * COLS + 1)],
+                  ROWS * COLS, 4)
+
+
+class XorEvaluatorTestCase(GenomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.genomes = [Genome([[1, 3, 0.5 * i, True], [2, 3, -0.25 * i, True], [1, 4, 1.0, True],
+                                [4, 3, 0.1 * i, i % 2 == 0]], 2, 1) for i in range(5)]
+
+    def test_same_fitness_as_xor_fitness(self):
+        fitnesses = XorEvaluator().evaluate(self.genomes)
+        self.assertEqual(len(fitnesses), len(self.genomes))
+        for genome, fitness in zip(self.genomes, fitnesses):
+            self.assertAlmostEqual(fitness, xor_fitness(NeuralNetwork(genome)))
+
+    def test_phenotypes_are_used(self):
+        phenotypes = [NeuralNetwork(genome) for genome in self.genomes]
+        self.assertEqual(XorEvaluator().evaluate(self.genomes, phenotypes), XorEvaluator().evaluate(self.genomes))
+
+    def test_cache(self):
+        cache = PhenotypeCache()
+        evaluator = XorEvaluator(cache=cache)
+        fitnesses = evaluator.evaluate(self.genomes)
+        self.assertEqual(evaluator.evaluate(self.genomes), fitnesses)
+        self.assertEqual(cache.fitness_hits, len(self.genomes))
+
+    def test_more_bits(self):
+        genome = Genome([[source, destination, 1.0, True] for source in range(1, 9) for destination in range(9, 13)],
+                        8, 4)
+        Y = NeuralNetwork(genome).forward_batch(XorEvaluator(bits=4)._X)
+        y_d = XorEvaluator(bits=4)._y_d
+        self.assertEqual(y_d.shape, (256, 4))
+        self.assertAlmostEqual(XorEvaluator(bits=4).evaluate([genome])[0], 256 * 4 - np.sum((Y - y_d) ** 2))
+
+    def test_empty_population(self):
+        self.assertEqual(XorEvaluator().evaluate([]), [])
+        self.assertEqual(ProcessEvaluator(xor_fitness, 1).evaluate([]), [])
+
+    def test_not_implemented(self):
+        self.assertRaises(Exception, Evaluator().evaluate, self.genomes)
+
+
+class TetrisEvaluatorTestCase(GenomeTestCase):
+    def test_game(self):
+        game = TetrisGame(0)
+        stone_x = game.stone_x
+        game.play('left')
+        self.assertEqual(game.stone_x, stone_x - 1)
+        self.assertEqual(game.stone_y, 1)
+        game.play('drop')
+        self.assertEqual(game.stones, 1)
+        self.assertEqual(game.board[:ROWS].sum(), 4)
+        self.assertGreater(game.score, 0)
+
+        features = np.zeros(ROWS * COLS)
+        game.write_features(features)
+        self.assertEqual(features.sum(), 8)
+
+    def test_cleared_rows(self):
+        game = TetrisGame(0)
+        game.board[ROWS - 1, :] = True
+        game.board[ROWS - 1, 0] = False
+        game.board[ROWS - 2, 3] = True
+        game.stone = np.ones((2, 1), dtype=bool)
+        game.stone_x, game.stone_y = 0, ROWS - 2
+        game.drop()
+        self.assertEqual(game.lines, 1)
+        self.assertEqual(game.score, 40)
+        self.assertEqual(game.board[:ROWS].sum(), 2)
+        self.assertTrue(game.board[ROWS - 1, 0])
+        self.assertTrue(game.board[ROWS - 1, 3])
+
+    def test_fitness(self):
+        # the first network always drops stones at once, the second one moves them left first
+        genomes = [tetris_genome([0.0, 0.0, 0.0, 1.0]), tetris_genome([1.0, 0.0, 0.0, 0.0])]
+        fitnesses = TetrisEvaluator(max_frames=200, workers=1).evaluate(genomes)
+        self.assertEqual(len(fitnesses), 2)
+        for genome, fitness in zip(genomes, fitnesses):
+            self.assertTrue(math.isfinite(fitness))
+            self.assertGreater(fitness, 0)
+            self.assertEqual(fitness, play_tetris(NeuralNetwork(genome), max_frames=200))
+        self.assertEqual(TetrisEvaluator(max_frames=200, workers=2).evaluate(genomes), fitnesses)
+
+    def test_wrong_network_size(self):
+        self.assertRaises(Exception, play_tetris, NeuralNetwork(Genome([[1, 2, 1.0, True]], 1, 1)))
+
+
+class GenerationEvaluatorTestCase(GenomeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.group = Group()
+        for i in range(6):
+            self.group.add_genome(Genome([[1, 3, 0.5 * i, True], [2, 3, -0.25 * i, True], [1, 4, 1.0, True],
+                                          [4, 3, 0.1 * i, i % 2 == 0]], 2, 1))
+
+    def test_default_evaluator(self):
+        generation = Generation([self.group])
+        self.assertIsInstance(generation.evaluator, XorEvaluator)
+        generation.create_phenotypes()
+        generation.run_evaluator()
+        for genome in self.group.genomes:
+            self.assertAlmostEqual(genome.fitness, xor_fitness(NeuralNetwork(genome)))
+
+    def test_custom_evaluator(self):
+        evaluator = ConstantEvaluator()
+        generation = Generation([self.group], evaluator=evaluator)
+        generation.create_phenotypes()
+        generation.run_evaluator()
+        self.assertEqual(evaluator.calls, 1)
+        self.assertEqual(generation.get_phenotypes_fitness_scores(), [4.0] * 6)
+
+        new_generation = generation.create_new_generation()
+        self.assertIs(new_generation.evaluator, evaluator)
+        self.assertEqual(evaluator.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,17 @@
+import multiprocessing
+import random
 import unittest
 
-from evolution.generation import Generation, Group
+from evolution.generation import Generation, Group, xor_fitness
 from evolution.genome import *
+from evolution.innovationregistry import InnovationRegistry
 from evolution.logger import Logger
 import math
 import matplotlib.pyplot as plt
+import numpy as np
 
 from nn.neuralnetwork import NeuralNetwork
+from tests.genomecase import GenomeTestCase
 
 
 class TestGroupCase(unittest.TestCase):
@@ -127,7 +132,38 @@ class TestGroupCase(unittest.TestCase):
         self.assertAlmostEqual(genome5.adjusted_fitness, 0.5)
 
 
-class TestGenerationSecondCase(unittest.TestCase):
+class TestPhenotypesInProcessesCase(unittest.TestCase):
+    def setUp(self):
+        self.group = Group()
+        for i in range(7):
+            self.group.add_genome(Genome([[1, 3, 0.5 * i, True], [2, 3, -0.25 * i, True], [1, 4, 1.0, True],
+                                          [4, 3, 0.1 * i, i % 2 == 0]], 2, 1))
+
+    def test_same_fitness_as_in_one_process(self):
+        generation = Generation([self.group])
+        generation.create_phenotypes()
+        generation.run_phenotypes2()
+        expected = [genome.fitness for genome in self.group.genomes]
+
+        for workers, chunk_size in ((2, 3), (1, None), (3, None)):
+            for genome in self.group.genomes:
+                genome.fitness = None
+            generation.run_phenotypes_in_processes(xor_fitness, workers, chunk_size)
+            for genome, fitness in zip(self.group.genomes, expected):
+                self.assertAlmostEqual(genome.fitness, fitness)
+            self.assertEqual(generation.get_phenotypes_fitness_scores(),
+                             [genome.fitness for genome in self.group.genomes])
+
+    def test_existing_pool(self):
+        generation = Generation([self.group])
+        generation.create_phenotypes()
+        with multiprocessing.Pool(2) as pool:
+            generation.run_phenotypes_in_processes(xor_fitness, pool=pool)
+        for genome in self.group.genomes:
+            self.assertAlmostEqual(genome.fitness, xor_fitness(NeuralNetwork(genome)))
+
+
+class TestGenerationSecondCase(GenomeTestCase):
     @unittest.skip("skipping")
     def test_calculating_offsprings(self):
         Group._GROUP_ID = 0
@@ -188,6 +224,52 @@ class TestGenerationSecondCase(unittest.TestCase):
      #       generation = generation.create_new_generation()
         print("Done")
 
+    def test_innovation_numbers_of_loaded_population(self):
+        # genomes with explicit innovation numbers the global counter hasn't given out yet
+        group = Group()
+        for i in range(20):
+            group.add_genome(Genome([[1, 3, random.normalvariate(mu=0.0, sigma=1.0), True, 50],
+                                     [2, 3, random.normalvariate(mu=0.0, sigma=1.0), True, 51]], 2, 1))
+        generation = Generation([group])
+        self.assertEqual(ConnectionGene._innovation_number, 52)
+        self.assertEqual(generation.innovation_registry.get_connection_innovation(1, 2), 52)
+
+        for i in range(10):
+            generation = generation.create_new_generation()
+        for group in generation.groups.values():
+            for genome in group.genomes:
+                innovation_numbers = [connection[4] for connection in genome._get_connections_with_innovations()]
+                self.assertEqual(len(innovation_numbers), len(set(innovation_numbers)))
+
+    def test_run_with_seed(self):
+        populations = []
+        for numpy_seed in (1, 2):
+            # the whole run depends only on seed of random
+            ConnectionGene._innovation_number = 0
+            random.seed(0)
+            np.random.seed(numpy_seed)
+            group = Group()
+            for i in range(30):
+                group.add_genome(Genome([[1, 3, random.normalvariate(mu=0.0, sigma=1.0), True],
+                                         [2, 3, random.normalvariate(mu=0.0, sigma=1.0), True]], 2, 1))
+            generation = Generation([group])
+            for i in range(5):
+                generation = generation.create_new_generation()
+            populations.append(sorted(genome.to_json() for group in generation.groups.values()
+                                      for genome in group.genomes))
+        self.assertEqual(populations[0], populations[1])
+
+    def test_given_innovation_registry(self):
+        group = Group()
+        for i in range(5):
+            group.add_genome(Genome([[1, 4, 0.5, True], [2, 4, 0.5, True], [4, 3, 0.5, True], [1, 7, 0.5, False]],
+                                    2, 1))
+        # registry with default next node ID does not know hidden nodes 4 and 7
+        registry = InnovationRegistry()
+        generation = Generation([group], innovation_registry=registry)
+        self.assertIs(generation.innovation_registry, registry)
+        self.assertEqual(registry.get_split(1, 4)[0], 8)
+
 class TestLoggerCase(unittest.TestCase):
     def setUp(self):
         Group._GROUP_ID = 0
@@ -220,6 +302,14 @@ class TestLoggerCase(unittest.TestCase):
     def test_logging(self):
         self.assertIs(self.logger.log[0].groups_log[0], self.group)
 
+    def test_logging_gene_counts(self):
+        self.generation.compaction_age = 1
+        self.genome1._mutate_split_connection()
+        self.generation.innovation_registry.next_generation()
+        self.generation.compact_genomes()
+        self.assertEqual(self.logger.log[0].gene_counts_log, [(7 * 4 + 2, 7 * 4 + 1)])
+        self.assertEqual(len(self.genome1.get_archived_connections()), 1)
+
 
     #TODO test logging fitness scores and other things
 
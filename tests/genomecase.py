@@ -0,0 +1,14 @@
+import unittest
+
+from evolution.genome import ConnectionGene
+
+
+class GenomeTestCase(unittest.TestCase):
+    """
+    Base of test cases creating genomes. Every test starts with the global innovation counter at 0, like in a fresh
+    process, and the counter is restored afterwards, so tests don't depend on genomes created by other tests.
+    """
+
+    def setUp(self):
+        self.addCleanup(setattr, ConnectionGene, '_innovation_number', ConnectionGene._innovation_number)
+        ConnectionGene._innovation_number = 0
@@ -1,11 +1,14 @@
+import random
 import unittest
 
 from evolution.genome import ConnectionGene, NodeGene, Genome
 from evolution.util import sort_connections_by_innovation_number
+from tests.genomecase import GenomeTestCase
 
 
-class TestConnectionGeneCase(unittest.TestCase):
+class TestConnectionGeneCase(GenomeTestCase):
     def setUp(self):
+        super().setUp()
         self.connectionGene1 = ConnectionGene(NodeGene(), NodeGene())
         self.connectionGene2 = ConnectionGene(NodeGene(), NodeGene())
         self.connectionGene3 = ConnectionGene(NodeGene(), NodeGene())
@@ -60,6 +63,16 @@ class TestGenomeCase(unittest.TestCase):
         self.assertEqual(nodes[3].node_type, 'hidden')
         self.assertEqual(nodes[3].node_id, 4)
 
+    def test_split_connection_creates_hidden_node_id(self):
+        genome = Genome([[1, 2, 0.5, True]], 1, 1)
+        genome._mutate_split_connection()
+        self.assertEqual(genome.node_ids, {1, 2, 3})
+        self.assertEqual(genome.get_node_type(3), 'hidden')
+        self.assertEqual(genome.connection_genes[(1, 3)].get_connection(), (1, 3, 1.0, True))
+        self.assertEqual(genome.connection_genes[(3, 2)].get_connection(), (3, 2, 0.5, True))
+        with self.assertRaises(AttributeError):
+            genome.connection_genes[(1, 3)].source_node = None
+
     def test_connections_sorting_by_innovation_number(self):
         genome = Genome([[1, 3, 0, True], [1, 4, 0, True], [2, 3, 0, True], [2, 4, 0, True]], 2, 1)
         connections = sort_connections_by_innovation_number(genome.connection_genes)
@@ -77,6 +90,22 @@ class TestGenomeCase(unittest.TestCase):
         full_genome._mutate_new_connection(1.0)
         self.assertEqual([(1, 3), (1, 4), (2, 3), (2, 4)], full_genome.get_connections_ids())
 
+    def test_mutate_new_connection_does_not_create_loop(self):
+        # 1 -> 3 -> 4 -> 2, the only new connections not closing a loop are 1 -> 2, 1 -> 4 and 3 -> 2
+        genome = Genome([[1, 3, 0, True], [3, 4, 0, True], [4, 2, 0, True]], 1, 1)
+        for _ in range(3):
+            genome._mutate_new_connection(1.0)
+        self.assertEqual([(1, 2), (1, 3), (1, 4), (3, 2), (3, 4), (4, 2)], genome.get_connections_ids())
+        genome._mutate_new_connection(1.0)
+        self.assertEqual(6, len(genome.connection_genes))
+
+    def test_adjacency_index_follows_mutations(self):
+        genome = Genome([[1, 2, 0, True]], 1, 1)
+        genome._mutate_split_connection()
+        self.assertEqual({1: {2, 3}, 2: set(), 3: {2}}, genome._get_successors())
+        self.assertEqual([1, 3], sorted(genome._source_ids))
+        self.assertEqual([2, 3], sorted(genome._destination_ids))
+
     def test_mutate_split_conneciton_to_genome_with_enabled_connection(self):
         genome = Genome([[1, 2, 0, True]], 1, 1)
         genome._mutate_split_connection()
@@ -208,6 +237,165 @@ class TestGenomeCase(unittest.TestCase):
         weight = overlapping_connection.weight
         self.assertTrue(weight == 1 or weight == 5)
 
+    def test_reproduce_same_connection_with_different_innovations(self):
+        genome1 = Genome([[1, 3, 0, True, 0], [2, 3, 0, True, 1], [1, 4, 0, True, 2]], 2, 2)
+        genome2 = Genome([[1, 3, 1, True, 0], [2, 3, 1, True, 1], [1, 4, 1, True, 3], [2, 4, 1, True, 4]], 2, 2)
+        genome1.fitness = 1.0
+        genome2.fitness = 1.0
+        child = Genome.reproduce(genome1, genome2)
+        self.assertEqual([(1, 3), (1, 4), (2, 3), (2, 4)], child.get_connections_ids())
+        self.assertEqual(child.connection_genes[(1, 4)].innovation_number, 2)
+        self.assertEqual(child.connection_genes[(1, 4)].weight, 0)
+        self.assertIsNone(child.parent)
+        self.assertEqual(child.node_ids, {1, 2, 3, 4})
+        self.assertIsNot(child.connection_genes[(2, 4)], genome2.connection_genes[(2, 4)])
+
+    def test_reproduce_shares_genes_until_changed(self):
+        genome1 = Genome([[1, 3, 0.5, True], [2, 3, 0.5, True]], 2, 1)
+        genome1.fitness = 1.0
+        child1 = Genome.reproduce(genome1, genome1)
+        child2 = Genome.reproduce(genome1, genome1)
+        self.assertIs(child1._connection_genes[(1, 3)], genome1._connection_genes[(1, 3)])
+        self.assertIs(child2._connection_genes[(1, 3)], genome1._connection_genes[(1, 3)])
+
+        child1._mutate_change_weight(1.0)
+        child1._mutate_split_connection()
+        self.assertEqual(genome1.get_connections(), [(1, 3, 0.5, True), (2, 3, 0.5, True)])
+        self.assertEqual(child2.get_connections(), [(1, 3, 0.5, True), (2, 3, 0.5, True)])
+
+        genome1.connection_genes[(1, 3)].weight = 2.0
+        self.assertEqual(child2.get_connections(), [(1, 3, 0.5, True), (2, 3, 0.5, True)])
+        self.assertEqual(genome1.get_connections(), [(1, 3, 2.0, True), (2, 3, 0.5, True)])
+
+    def test_views_follow_changes_of_connection_genes(self):
+        genome = Genome([[1, 3, 0.5, True], [2, 3, 0.5, True]], 2, 1)
+        fingerprint = genome.fingerprint()
+        self.assertEqual(genome.get_connections(), [(1, 3, 0.5, True), (2, 3, 0.5, True)])
+        genome.connection_genes[(1, 3)].weight = 9.0
+        self.assertEqual(genome.get_connections(), [(1, 3, 9.0, True), (2, 3, 0.5, True)])
+        self.assertNotEqual(genome.fingerprint(), fingerprint)
+
+    def test_sorted_views_follow_changes(self):
+        coefficients = dict(add_connection=0.5, split_connection=0.5, change_weight=1.0,
+                            new_connection_abs_max_weight=1.0, max_weight_mutation=1.0)
+        population = [Genome([[1, 4, 0.5, True], [2, 4, 0.5, True], [3, 5, 0.5, True]], 3, 2) for i in range(4)]
+        for genome in population:
+            genome.fitness = 1.0
+            genome.get_connections()
+        for i in range(30):
+            parent1, parent2 = random.choice(population), random.choice(population)
+            child = Genome.reproduce(parent1, parent2)
+            child.mutate(coefficients)
+            child.fitness = random.choice([1.0, 2.0])
+            population.append(child)
+
+        for genome in population:
+            rebuilt = Genome(genome._get_connections_with_innovations(), 3, 2)
+            self.assertEqual(genome.get_connections(), rebuilt.get_connections())
+            self.assertEqual(genome.get_connections_ids(), rebuilt.get_connections_ids())
+            self.assertEqual([node.node_id for node in genome.get_nodes()],
+                             [node.node_id for node in rebuilt.get_nodes()])
+            self.assertEqual(genome._get_sorted_genes(), sorted(genome._connection_genes.values(),
+                                                                key=lambda connection: connection.innovation_number))
+            self.assertEqual(genome.fingerprint(), rebuilt.fingerprint())
+
+    def test_compact_archives_long_disabled_genes(self):
+        genome = Genome([[1, 2, 0.5, True], [1, 3, 0.5, True]], 1, 2)
+        disabled_at = ConnectionGene._innovation_number
+        genome._mutate_split_connection()
+        self.assertEqual(genome.compact(disabled_at), 0)
+        self.assertEqual(genome.compact(disabled_at + 1), 1)
+
+        archived = genome.get_archived_connections()
+        self.assertEqual(len(archived), 1)
+        self.assertFalse(archived[0][3])
+        self.assertNotIn(archived[0][:2], genome.get_connections_ids())
+        self.assertEqual(len(genome.get_connections()), 3)
+        self.assertEqual(len(genome._get_connections_with_innovations()), 4)
+        # archived connection can not be added again
+        self.assertIn(archived[0][1], genome._get_successors()[archived[0][0]])
+        with self.assertRaises(Exception):
+            genome._add_connection_gene(archived[0][0], archived[0][1], 0.5, True)
+
+    def test_reproduce_can_enable_archived_gene(self):
+        genome1 = Genome([[1, 2, 0.5, False, 0], [1, 3, 0.5, True, 1], [2, 3, 0.5, True, 2]], 1, 2)
+        genome2 = Genome([[1, 2, 0.5, True, 0], [1, 3, 0.5, True, 1], [2, 3, 0.5, True, 2]], 1, 2)
+        genome1.compact(ConnectionGene._innovation_number + 1)
+        self.assertEqual(genome1.get_archived_connections(), [(1, 2, 0.5, False)])
+
+        for fitness1, fitness2 in ((1.0, 1.0), (2.0, 1.0), (1.0, 2.0)):
+            genome1.fitness, genome2.fitness = fitness1, fitness2
+            enabled, disabled = 0, 0
+            for i in range(100):
+                child = Genome.reproduce(genome1, genome2)
+                connections = child.get_connections() + child.get_archived_connections()
+                self.assertEqual([connection[:2] for connection in connections].count((1, 2)), 1)
+                if (1, 2, 0.5, True) in connections:
+                    self.assertEqual(child.get_archived_connections(), [])
+                    self.assertIsNot(child.parent, genome1)
+                    enabled += 1
+                else:
+                    self.assertIn((1, 2, 0.5, False), connections)
+                    self.assertIsNot(child.parent, genome2)
+                    disabled += 1
+            self.assertGreater(enabled, 0)
+            self.assertGreater(disabled, 0)
+        self.assertEqual(genome1.get_archived_connections(), [(1, 2, 0.5, False)])
+        self.assertEqual(genome2.get_connections_ids(), [(1, 2), (1, 3), (2, 3)])
+
+    def test_reproduce_keeps_archived_genes_of_equally_fit_parent(self):
+        genome1 = Genome([[1, 2, 0.5, True, 0]], 1, 1)
+        genome2 = Genome([[1, 2, 0.5, True, 0], [1, 3, 0.5, False, 1], [3, 2, 0.5, False, 2]], 1, 1)
+        genome2.compact(ConnectionGene._innovation_number + 1)
+        genome1.fitness, genome2.fitness = 1.0, 1.0
+        child = Genome.reproduce(genome1, genome2)
+        self.assertEqual(child.get_connections_ids(), [(1, 2)])
+        self.assertEqual(child.get_archived_connections(), [(1, 3, 0.5, False), (3, 2, 0.5, False)])
+        self.assertEqual(child.node_ids, {1, 2, 3})
+        # genome2 has the same genes in use and in the archive
+        self.assertIs(child.parent, genome2)
+
+    def test_mutations_are_recorded(self):
+        genome = Genome([[1, 2, 0.5, True]], 1, 1)
+        genome._mutate_split_connection()
+        genome._mutate_change_weight(1.0)
+        self.assertEqual(genome.mutations[0], ('split', 1, 2, 3, 0.5))
+        self.assertEqual(genome.mutations[1][0], 'weight')
+
+    def test_reproduce_copy_of_parent(self):
+        genome1 = Genome([[1, 3, 0, True], [2, 4, 0, True]], 2, 2)
+        genome2 = Genome([[1, 4, 0, True], [2, 3, 0, True]], 2, 2)
+        genome1.fitness = 2.0
+        genome2.fitness = 1.0
+        self.assertIs(Genome.reproduce(genome1, genome2).parent, genome1)
+        self.assertIs(Genome.reproduce(genome2, genome2).parent, genome2)
+        genome2.fitness = 2.0
+        self.assertIsNone(Genome.reproduce(genome1, genome2).parent)
+
+    def test_fingerprint(self):
+        genome1 = Genome([[1, 3, 0, True], [2, 4, 0.5, True], [1, 4, 1, True]], 2, 2)
+        genome2 = Genome._reproduce_equal_genomes(genome1, genome1)
+        self.assertEqual(genome1.fingerprint(), genome2.fingerprint())
+        genome2.connection_genes[(1, 4)].weight = 5
+        self.assertNotEqual(genome1.fingerprint(), genome2.fingerprint())
+        genome2.connection_genes[(1, 4)].weight = 1
+        genome2.connection_genes[(1, 4)].enabled = False
+        self.assertNotEqual(genome1.fingerprint(), genome2.fingerprint())
+
+    def test_fingerprints_of_similar_genomes(self):
+        # genomes with swapped enabled flags of two genes
+        genome1 = Genome([[1, 3, 0.5, True, 0], [2, 3, 0.5, False, 1]], 2, 1)
+        genome2 = Genome([[1, 3, 0.5, False, 0], [2, 3, 0.5, True, 1]], 2, 1)
+        self.assertNotEqual(genome1.get_genes_key(), genome2.get_genes_key())
+        self.assertNotEqual(genome1.fingerprint(), genome2.fingerprint())
+
+        # hash(-1.0) == hash(-2.0), so hashes of these genes are equal
+        genome1 = Genome([[1, 3, -1.0, True, 0], [2, 3, 0.5, True, 1]], 2, 1)
+        genome2 = Genome([[1, 3, -2.0, True, 0], [2, 3, 0.5, True, 1]], 2, 1)
+        self.assertNotEqual(genome1.fingerprint(), genome2.fingerprint())
+        genome2.connection_genes[(1, 3)].weight = -1.0
+        self.assertEqual(genome1.fingerprint(), genome2.fingerprint())
+
     def test_compatibility_distance(self):
         genome = Genome([[1, 3, 0, True], [1, 4, 0, True], [2, 3, 0, True], [2, 4, 0, True]], 2, 2)
         genome2 = Genome([[1, 4, 0, True], [1, 2, 0, True], [1, 3, 0, True]], 1, 3)
@@ -215,6 +403,28 @@ class TestGenomeCase(unittest.TestCase):
         coefficients = dict(excess_factor=1.0, disjoint_factor=1.0, weight_difference_factor=1.0)
         genome.compatibility_distance(genome2, coefficients)
 
+    def test_is_compatible(self):
+        population = [Genome([[1, 4, 0.5, True], [2, 4, 0.5, True], [3, 5, 0.5, True]], 3, 2) for i in range(3)]
+        coefficients = dict(add_connection=0.5, split_connection=0.5, change_weight=1.0,
+                            new_connection_abs_max_weight=1.0, max_weight_mutation=2.0)
+        for i in range(40):
+            genome = random.choice(population)
+            genome.fitness = 1.0
+            child = Genome.reproduce(genome, genome)
+            for j in range(random.randint(1, 10)):
+                child.mutate(coefficients)
+            population.append(child)
+
+        for factors in ((1.0, 1.0, 0.4), (2.0, 0.5, 1.0), (1.0, 1.0, 0.0)):
+            distance_coefficients = dict(excess_factor=factors[0], disjoint_factor=factors[1],
+                                         weight_difference_factor=factors[2])
+            for i in range(100):
+                genome1, genome2 = random.choice(population), random.choice(population)
+                distance = genome1.compatibility_distance(genome2, distance_coefficients)
+                for threshold in (0.5, 1.0, 3.0, distance):
+                    self.assertEqual(genome1.is_compatible(genome2, distance_coefficients, threshold),
+                                     distance < threshold)
+
     def test_json_generation(self):
         genome = Genome([[1, 3, 0, True], [1, 4, 0, True], [2, 3, 0, True], [2, 4, 0, True]], 2, 2)
 
@@ -226,6 +436,36 @@ class TestGenomeCase(unittest.TestCase):
         self.assertEqual(genome.input_node_ids, genome_from_json.input_node_ids)
         self.assertEqual(genome.output_node_ids, genome_from_json.output_node_ids)
 
+    def test_bytes_generation(self):
+        genome = Genome([[1, 2, 0.5, True, 10], [1, 3, -0.25, True, 3]], 1, 2)
+        genome._mutate_split_connection()
+        genome.compact(ConnectionGene._innovation_number + 1)
+        genome.fitness = 2.0
+
+        genome_from_bytes = Genome.from_bytes(genome.to_bytes())
+        self.assertEqual(genome.get_connections(), genome_from_bytes.get_connections())
+        self.assertEqual(genome.get_archived_connections(), genome_from_bytes.get_archived_connections())
+        self.assertEqual(sorted(genome._get_connections_with_innovations()),
+                         sorted(genome_from_bytes._get_connections_with_innovations()))
+        self.assertEqual(genome.fingerprint(), genome_from_bytes.fingerprint())
+        self.assertEqual(genome.input_node_ids, genome_from_bytes.input_node_ids)
+        self.assertEqual(genome.output_node_ids, genome_from_bytes.output_node_ids)
+        self.assertEqual(genome.node_ids, genome_from_bytes.node_ids)
+        self.assertEqual(genome_from_bytes.fitness, 2.0)
+        self.assertIsNone(genome_from_bytes.adjusted_fitness)
+        with self.assertRaises(Exception):
+            Genome.from_bytes(genome.to_bytes()[:-1])
+
+    def test_json_with_archived_genes(self):
+        genome = Genome([[1, 2, 0.5, True], [1, 3, 0.5, True]], 1, 2)
+        genome._mutate_split_connection()
+        genome.compact(ConnectionGene._innovation_number + 1)
+
+        genome_from_json = Genome.from_json(genome.to_json())
+        self.assertEqual(genome.get_connections(), genome_from_json.get_connections())
+        self.assertEqual(genome.get_archived_connections(), genome_from_json.get_archived_connections())
+        self.assertEqual(len(genome_from_json.get_archived_connections()), 1)
+
 if __name__ == '__main__':
     firstSuite = unittest.TestLoader().loadTestsFromTestCase(TestGenomeCase)
     secondSuite = unittest.TestLoader().loadTestsFromTestCase(TestConnectionGeneCase)
@@ -0,0 +1,110 @@
+import multiprocessing
+import unittest
+
+from evolution.arraygenome import ArrayGenome
+from evolution.genome import Genome, ConnectionGene
+from evolution.innovationregistry import InnovationRegistry
+from nn.neuralnetwork import NeuralNetwork
+from tests.genomecase import GenomeTestCase
+
+
+def _register_mutations(registry):
+    return registry.get_connection_innovation(1, 4), registry.get_split(1, 3)
+
+
+class InnovationRegistryTestCase(GenomeTestCase):
+    def test_same_mutation_gets_same_numbers(self):
+        registry = InnovationRegistry(100, 10)
+        self.assertEqual(registry.get_connection_innovation(1, 3), 100)
+        self.assertEqual(registry.get_connection_innovation(2, 3), 101)
+        self.assertEqual(registry.get_connection_innovation(1, 3), 100)
+        self.assertEqual(registry.get_split(1, 3), (10, 102, 103))
+        self.assertEqual(registry.get_split(1, 3, 20), (10, 102, 103))
+        self.assertEqual(registry.get_split(2, 3, 20), (20, 104, 105))
+        self.assertGreaterEqual(ConnectionGene._innovation_number, 106)
+
+    def test_advance(self):
+        registry = InnovationRegistry(100, 10)
+        registry.advance(90, 20)
+        self.assertEqual(registry.get_split(1, 3), (20, 100, 101))
+        registry.advance(next_innovation_number=110)
+        self.assertEqual(registry.get_split(2, 3), (21, 110, 111))
+
+    def test_next_generation(self):
+        registry = InnovationRegistry(0, 5)
+        registry.get_connection_innovation(1, 3)
+        registry.get_split(1, 3)
+        registry.next_generation()
+        self.assertEqual(registry.get_connection_innovation(1, 3), 3)
+        self.assertEqual(registry.get_split(1, 3), (6, 4, 5))
+
+    def test_genomes_mutated_the_same_way_share_innovations(self):
+        registry = InnovationRegistry(next_node_id=4)
+        genome1 = Genome([[1, 3, 0.5, True], [2, 3, 0.5, False]], 2, 1)
+        genome2 = Genome([c.get_connection() + (c.innovation_number,) for c in genome1.connection_genes.values()], 2, 1)
+        array_genome = ArrayGenome.from_genome(genome1)
+        for genome in (genome1, genome2, array_genome):
+            # (1, 3) is the only enabled connection and then (2, 4) is the only possible new connection
+            genome._mutate_split_connection(registry)
+            genome._mutate_new_connection(1.0, registry)
+
+        self.assertEqual(genome1.get_connections_ids(), [(1, 3), (1, 4), (2, 3), (2, 4), (4, 3)])
+        self.assertEqual(genome1.get_connections_ids(), genome2.get_connections_ids())
+        self.assertEqual(genome1.get_connections_ids(), array_genome.get_connections_ids())
+        self.assertEqual(sorted(c.innovation_number for c in genome1.connection_genes.values()), [0, 1, 2, 3, 4])
+        self.assertEqual(sorted(c.innovation_number for c in genome2.connection_genes.values()), [0, 1, 2, 3, 4])
+        self.assertEqual(array_genome.innovations.tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(genome1.connection_genes[(2, 4)].innovation_number, 4)
+        self.assertEqual(genome1.compatibility_distance(genome2, {'excess_factor': 1.0, 'disjoint_factor': 1.0,
+                                                                  'weight_difference_factor': 0.0}), 0.0)
+
+    def test_array_genome_stays_sorted_with_older_innovation(self):
+        registry = InnovationRegistry(5, 4)
+        registry.get_connection_innovation(2, 3)
+        array_genome = ArrayGenome([[1, 3, 0.5, True, 0], [2, 4, 0.5, True, 10]], 2, 2)
+        array_genome._mutate_new_connection(1.0, registry)
+        array_genome._mutate_new_connection(1.0, registry)
+        self.assertEqual(array_genome.get_connections_ids(), [(1, 3), (1, 4), (2, 3), (2, 4)])
+        self.assertEqual(array_genome.innovations.tolist(), sorted(array_genome.innovations.tolist()))
+        self.assertIn(5, array_genome.innovations.tolist())
+
+    def test_network_with_registry_node_ids(self):
+        registry = InnovationRegistry(next_node_id=10)
+        genome = Genome([[1, 2, 0.5, True]], 1, 1)
+        genome._mutate_split_connection(registry)
+        self.assertEqual(genome.get_connections_ids(), [(1, 2), (1, 10), (10, 2)])
+        for mode in NeuralNetwork.MODES:
+            self.assertAlmostEqual(NeuralNetwork(genome, mode=mode).forward([1.0])[0],
+                                   NeuralNetwork(genome, mode='dfs').forward([1.0])[0])
+
+    def test_generation_clocks(self):
+        registry = InnovationRegistry()
+        self.assertIsNone(registry.get_generation_clock(1))
+        registry.next_generation()
+        Genome([[1, 2, 0.5, False]], 1, 1)
+        registry.next_generation()
+        self.assertEqual(registry.get_generation_clock(1), 1)
+        self.assertEqual(registry.get_generation_clock(2), 0)
+        self.assertIsNone(registry.get_generation_clock(3))
+        self.assertEqual(InnovationRegistry.from_json(registry.to_json()).get_generation_clock(2), 0)
+
+    def test_json(self):
+        registry = InnovationRegistry(7, 3)
+        registry.get_connection_innovation(1, 2)
+        registry.get_split(1, 2)
+        registry_from_json = InnovationRegistry.from_json(registry.to_json())
+        self.assertEqual(registry_from_json.get_connection_innovation(1, 2), 7)
+        self.assertEqual(registry_from_json.get_split(1, 2), (3, 8, 9))
+        self.assertEqual(registry_from_json.get_connection_innovation(2, 3), 10)
+
+    def test_shared_registry(self):
+        with multiprocessing.Manager() as manager:
+            registry = InnovationRegistry.shared(manager, 0, 5)
+            with multiprocessing.Pool(2) as pool:
+                results = pool.map(_register_mutations, [registry] * 4)
+            self.assertEqual(results, [(0, (5, 1, 2))] * 4)
+            self.assertEqual(registry.get_connection_innovation(2, 4), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
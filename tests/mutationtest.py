@@ -0,0 +1,53 @@
+import unittest
+
+from evolution.arraygenome import ArrayGenome
+from evolution.genome import Genome
+from evolution.mutation import mutate_population
+from tests.genomecase import GenomeTestCase
+
+
+def coefficients(add_connection=0.0, split_connection=0.0, change_weight=0.0):
+    return dict(add_connection=add_connection, split_connection=split_connection, change_weight=change_weight,
+                new_connection_abs_max_weight=1.0, max_weight_mutation=1.0)
+
+
+class MutatePopulationTestCase(GenomeTestCase):
+    def test_weight_mutation(self):
+        genomes = [Genome([[1, 3, 0.0, True], [2, 3, 0.0, False], [1, 4, 0.0, True]], 2, 2) for i in range(50)]
+        genomes.append(ArrayGenome([[1, 3, 0.0, True], [2, 3, 0.0, False], [1, 4, 0.0, True]], 2, 2))
+        mutate_population(genomes, coefficients(change_weight=1.0))
+        for genome in genomes:
+            changed = [(s, d) for s, d, w, e in genome.get_connections() if w != 0.0]
+            self.assertEqual(len(changed), 1)
+            self.assertIn(changed[0], [(1, 3), (1, 4)])
+            self.assertEqual(len(genome.mutations), 1)
+            self.assertEqual(genome.mutations[0][:3], ('weight',) + changed[0])
+
+    def test_weight_mutation_without_enabled_connections(self):
+        genomes = [Genome([[1, 2, 0.0, False]], 1, 1), ArrayGenome([[1, 2, 0.0, False]], 1, 1)]
+        mutate_population(genomes, coefficients(change_weight=1.0))
+        for genome in genomes:
+            self.assertEqual(genome.get_connections(), [(1, 2, 0.0, False)])
+            self.assertEqual(genome.mutations, [])
+
+    def test_no_mutation(self):
+        genomes = [Genome([[1, 3, 0.0, True], [2, 3, 0.0, True]], 2, 1) for i in range(10)]
+        mutate_population(genomes, coefficients())
+        for genome in genomes:
+            self.assertEqual(genome.get_connections(), [(1, 3, 0.0, True), (2, 3, 0.0, True)])
+
+    def test_structural_mutations(self):
+        genomes = [Genome([[1, 3, 0.0, True], [2, 3, 0.0, True], [1, 4, 0.0, True]], 2, 2),
+                   ArrayGenome([[1, 3, 0.0, True], [2, 3, 0.0, True], [1, 4, 0.0, True]], 2, 2)]
+        mutate_population(genomes, coefficients(add_connection=1.0, split_connection=1.0))
+        for genome in genomes:
+            # (2, 4) is added and one connection is split into two
+            self.assertEqual(len(genome.get_connections()), 6)
+            self.assertEqual([mutation[0] for mutation in genome.mutations], ['connection', 'split'])
+
+    def test_empty_population(self):
+        mutate_population([], coefficients(1.0, 1.0, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
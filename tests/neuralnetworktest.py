@@ -1,19 +1,25 @@
 import unittest
+import random
+import numpy as np
 from nn.neuralnetwork import Neuron, NeuralNetwork
+from evolution.genome import Genome, ConnectionGene
+from tests.genomecase import GenomeTestCase
 
 
 class GenomeMock:
-    def __init__(self, connections, input_size, output_size):
+    def __init__(self, connections, input_size, output_size, mutations=None):
         self.connections = connections
         self.input_size = input_size
         self.output_size = output_size
+        self.mutations = mutations if mutations is not None else []
 
     def get_connections(self):
         return sorted(self.connections)
 
 
-class NeuronTestCase(unittest.TestCase):
+class NeuronTestCase(GenomeTestCase):
     def setUp(self):
+        super().setUp()
         self.test_neuron = Neuron()
 
     def test_activation_function(self):
@@ -77,7 +83,7 @@ class NeuronTestCase(unittest.TestCase):
         genome = GenomeMock([(2, 4, 0, True), (1, 3, 0, True), (2, 3, 0, True), (1, 4, 0, True)], 2, 2)
         nn = NeuralNetwork()
         nn.generate_network(genome)
-        nn.forward([3, 22])
+        nn._forward_dfs([3, 22])
         self.assertEqual(nn._input_neurons[1]._input_signals, [3])
         self.assertEqual(nn._input_neurons[2]._input_signals, [22])
 
@@ -121,6 +127,178 @@ class NeuronTestCase(unittest.TestCase):
         y = nn.forward([0.2, 2, -0.02])
         self.assertAlmostEqual(y[0], 0.6778, places=4)
 
+    def test_compiled_plan_is_topological(self):
+        genome = GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (1, 7, -1, True), (5, 7, -3.4, True), (3, 7, 4, True),
+                             (7, 6, 2, True), (6, 4, 0.3, True), (2, 4, 1, False)], 3, 1)
+        nn = NeuralNetwork(genome)
+        self.assertEqual(nn._plan_nodes, [5, 7, 6, 4])
+        self.assertEqual(nn._plan_offsets, [0, 2, 5, 6, 7])
+        self.assertEqual(nn._plan_sources, [1, 2, 1, 3, 5, 7, 6])
+        self.assertEqual(nn._plan_destinations, [5, 5, 7, 7, 7, 6, 4])
+        self.assertEqual(nn._plan_weights, [3, -2, -1, 4, -3.4, 2, 0.3])
+
+    def test_compiled_forward_matches_dfs(self):
+        genome = GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (1, 7, -1, True), (5, 7, -3.4, True), (3, 7, 4, True),
+                             (7, 6, 2, True), (6, 4, 0.3, True), (1, 8, 0.5, True), (8, 4, -1, True)], 3, 1)
+        nn = NeuralNetwork(genome)
+        for X in ([0.2, 2, -0.02], [1, 0, 0], [-3, 0.5, 7]):
+            self.assertEqual(nn.forward(X), nn._forward_dfs(X))
+
+    def test_compiled_plan_with_loop(self):
+        genome = GenomeMock([(1, 3, 1, True), (3, 4, 1, True), (4, 3, 1, True), (4, 2, 1, True)], 1, 1)
+        nn = NeuralNetwork(genome)
+        self.assertEqual(sorted(nn._plan_nodes), [2, 3, 4])
+        self.assertEqual(nn._loop_sources, [4])
+
+    def test_modes_agree_with_loop(self):
+        genome = GenomeMock([(1, 2, 1, True), (1, 3, 0.5, True), (3, 4, 1, True), (4, 3, 1, True), (4, 2, 1, True)],
+                            1, 1)
+        networks = [NeuralNetwork(genome, mode=mode) for mode in NeuralNetwork.MODES]
+        expected = networks[0].forward([0.3])
+        for nn in networks:
+            for X in ([0.3], [-2.0], [0.3]):
+                y = nn.forward(X)
+                # the same input gives the same output, nothing is kept between calls
+                np.testing.assert_allclose(y, networks[0].forward(X))
+                np.testing.assert_allclose(nn.forward_batch([X])[0], y)
+            np.testing.assert_allclose(nn.forward([0.3]), expected)
+
+    def test_forward_batch_matches_forward(self):
+        genome = GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (1, 7, -1, True), (5, 7, -3.4, True), (3, 7, 4, True),
+                             (7, 6, 2, True), (6, 4, 0.3, True), (3, 8, 1, True), (8, 9, 1, False)], 3, 2)
+        nn = NeuralNetwork(genome)
+        X = np.array([[0.2, 2, -0.02], [1, 0, 0], [-3, 0.5, 7], [0, 0, 0]])
+        Y = nn.forward_batch(X)
+        self.assertEqual(Y.shape, (4, 2))
+        for x, y in zip(X, Y):
+            np.testing.assert_allclose(y, nn.forward(x))
+
+    def test_forward_batch_input_length_exception(self):
+        genome = GenomeMock([(2, 4, 0, True), (1, 3, 0, True), (2, 3, 0, True), (1, 4, 0, True)], 2, 2)
+        nn = NeuralNetwork(genome)
+        with self.assertRaises(Exception) as e:
+            nn.forward_batch(np.ones((5, 3)))
+        self.assertEqual(str(e.exception), "Expected 2 inputs, got 3 instead")
+    def test_layered_mode_matches_compiled(self):
+        genome = GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (1, 7, -1, True), (5, 7, -3.4, True), (3, 7, 4, True),
+                             (7, 6, 2, True), (6, 4, 0.3, True), (1, 8, 0.5, True), (8, 4, -1, True)], 3, 1)
+        compiled = NeuralNetwork(genome)
+        layered = NeuralNetwork(genome, mode='layered')
+        self.assertEqual([sorted(level.rows) for level in layered._levels], [[5, 8], [7], [6], [4]])
+        np.testing.assert_allclose(layered.forward([0.2, 2, -0.02]), compiled.forward([0.2, 2, -0.02]))
+        X = np.array([[0.2, 2, -0.02], [1, 0, 0], [-3, 0.5, 7]])
+        np.testing.assert_allclose(layered.forward_batch(X), compiled.forward_batch(X))
+
+    def test_dfs_mode(self):
+        genome = GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (1, 6, -1, True), (5, 6, -3.4, True), (3, 6, 4, True),
+                             (6, 4, 5, True)], 3, 1)
+        nn = NeuralNetwork(genome, mode='dfs')
+        self.assertAlmostEqual(nn.forward([0.2, 2, -0.02])[0], 0.5144, places=4)
+        self.assertAlmostEqual(nn.forward_batch(np.array([[0.2, 2, -0.02]]))[0, 0], 0.5144, places=4)
+
+    def test_unknown_mode_exception(self):
+        with self.assertRaises(Exception) as e:
+            NeuralNetwork(mode='recursive')
+        self.assertEqual(str(e.exception), "Unknown evaluation mode: recursive")
+    def test_derive_patches_mutations(self):
+        parent = GenomeMock([(1, 3, 1, True), (2, 3, -2, True), (1, 4, 0.5, True), (2, 4, 3, True)], 2, 2)
+        child = GenomeMock([(1, 3, 1, True), (2, 3, 0.7, True), (1, 4, 0.5, False), (2, 4, 3, True), (1, 5, 1.0, True),
+                            (5, 4, 0.5, True), (5, 3, -1, True)], 2, 2,
+                           [('weight', 2, 3, 0.7), ('split', 1, 4, 5, 0.5), ('connection', 5, 3, -1)])
+        parent_nn = NeuralNetwork(parent)
+        parent_y = parent_nn.forward([0.3, -0.4])
+        child_nn = parent_nn.derive(child)
+        fresh_nn = NeuralNetwork(child)
+
+        self.assertIs(child_nn.get_genome(), child)
+        self.assertEqual(child_nn._connections, fresh_nn._connections)
+        self.assertEqual(child_nn.forward([0.3, -0.4]), fresh_nn.forward([0.3, -0.4]))
+        self.assertEqual(child_nn._forward_dfs([0.3, -0.4]), fresh_nn._forward_dfs([0.3, -0.4]))
+        # parent network stays untouched
+        self.assertEqual(parent_nn.forward([0.3, -0.4]), parent_y)
+
+    def test_derive_falls_back_to_compilation(self):
+        parent = GenomeMock([(1, 2, 1, True), (1, 3, 1, True), (3, 2, 1, True)], 1, 1)
+        child = GenomeMock([(1, 2, 1, True), (1, 3, 1, True), (3, 2, 1, True), (2, 3, 2, True)], 1, 1,
+                           [('connection', 2, 3, 2)])
+        child_nn = NeuralNetwork(parent).derive(child)
+        self.assertEqual(child_nn._connections, NeuralNetwork(child)._connections)
+
+    def test_derive_from_mutated_genomes(self):
+        random.seed(3)
+        coefficients = {'add_connection': 0.5, 'split_connection': 0.5, 'change_weight': 0.8,
+                        'new_connection_abs_max_weight': 1.0, 'max_weight_mutation': 0.5}
+        genome = Genome([[1, 4, 0.5, True], [2, 4, -1, True], [3, 5, 1, True]], 3, 2)
+        nn = NeuralNetwork(genome, mode='layered')
+        for i in range(30):
+            genome.fitness = 1.0
+            child = Genome.reproduce(genome, genome)
+            self.assertIs(child.parent, genome)
+            child.mutate(coefficients)
+            nn = nn.derive(child)
+            fresh_nn = NeuralNetwork(child, mode='layered')
+            self.assertEqual(nn._connections, fresh_nn._connections)
+            np.testing.assert_allclose(nn.forward([0.1, -2, 1]), fresh_nn.forward([0.1, -2, 1]))
+            genome = child
+    def test_pruning(self):
+        # 5 was split into 5 -> 6 -> 3 and its connection disabled, 7 and 8 lead nowhere
+        genome = GenomeMock([(1, 3, 1, True), (1, 5, 1, True), (5, 3, 1, False), (5, 6, 1.0, True), (6, 3, 1, True),
+                             (2, 7, 1, True), (7, 8, 1, True), (5, 8, -1, True), (2, 4, 1, True), (6, 5, 1, False)],
+                            2, 2)
+        nn = NeuralNetwork(genome)
+        self.assertEqual(sorted(nn._plan_nodes), [3, 4, 5, 6])
+        self.assertEqual(nn.pruned_nodes, 2)
+        self.assertEqual(nn.pruned_connections, 3)
+        self.assertEqual(nn.forward([0.5, -1]), nn._forward_dfs([0.5, -1]))
+
+    def test_network_of_compacted_genome(self):
+        # the only gene of input 1 is archived
+        genome = Genome([[1, 3, 0.5, False, 0], [2, 4, 0.5, True, 1], [2, 3, -0.5, True, 2]], 2, 2)
+        expected = NeuralNetwork(genome).forward([1, -1])
+        self.assertEqual(genome.compact(ConnectionGene._innovation_number + 1), 1)
+        self.assertEqual(genome.get_connections_ids(), [(2, 3), (2, 4)])
+        for mode in NeuralNetwork.MODES:
+            nn = NeuralNetwork(genome, mode=mode)
+            self.assertEqual(sorted(nn._input_neurons), [1, 2])
+            self.assertEqual(sorted(nn._output_neurons), [3, 4])
+            np.testing.assert_allclose(nn.forward([1, -1]), expected)
+
+    def test_derive_with_pruned_nodes(self):
+        parent = GenomeMock([(1, 3, 1, True), (2, 4, 1, True), (4, 3, 1, False), (1, 5, 1, True)], 2, 1)
+        child = GenomeMock([(1, 3, 1, True), (2, 4, 1, True), (4, 3, 1, False), (1, 5, 1, True), (5, 3, 2, True)], 2, 1,
+                           [('connection', 5, 3, 2)])
+        parent_nn = NeuralNetwork(parent)
+        self.assertEqual(parent_nn.pruned_nodes, 2)
+        child_nn = parent_nn.derive(child)
+        self.assertEqual(child_nn.pruned_nodes, 1)
+        self.assertEqual(child_nn.forward([0.5, -1]), NeuralNetwork(child).forward([0.5, -1]))
+    def test_codegen_mode_matches_compiled(self):
+        genome = GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (1, 7, -1, True), (5, 7, -3.4, True), (3, 7, 4, True),
+                             (7, 6, 2, True), (6, 4, 0.3, True), (1, 8, 0.5, True), (8, 4, -1, True), (9, 4, 1, True)],
+                            3, 1)
+        compiled = NeuralNetwork(genome)
+        generated = NeuralNetwork(genome, mode='codegen')
+        for X in ([0.2, 2, -0.02], [1, 0, 0], [-3, 0.5, 7]):
+            self.assertEqual(generated.forward(X), compiled.forward(X))
+
+    def test_codegen_functions_are_cached(self):
+        genome1 = Genome([[1, 3, 0.5, True], [2, 3, -1, True]], 2, 1)
+        genome2 = Genome._reproduce_equal_genomes(genome1, genome1)
+        genome3 = Genome([[1, 3, 0.5, True], [2, 3, 1, True]], 2, 1)
+        nn1 = NeuralNetwork(genome1, mode='codegen')
+        self.assertIs(NeuralNetwork(genome2, mode='codegen')._function, nn1._function)
+        self.assertIsNot(NeuralNetwork(genome3, mode='codegen')._function, nn1._function)
+        self.assertIsNot(NeuralNetwork(genome1, mode='codegen', activation='math')._function, nn1._function)
+
+    def test_codegen_cache_compares_genes(self):
+        genome1 = Genome([[1, 3, 0.5, True], [2, 3, -1, True]], 2, 1)
+        genome2 = Genome([[1, 3, 0.5, True], [2, 3, 1, True]], 2, 1)
+        # fingerprint collision
+        genome2.fingerprint = genome1.fingerprint
+        nn1 = NeuralNetwork(genome1, mode='codegen')
+        nn2 = NeuralNetwork(genome2, mode='codegen')
+        self.assertIsNot(nn2._function, nn1._function)
+        self.assertEqual(nn2.forward([1, 1]), NeuralNetwork(genome2).forward([1, 1]))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from evolution.generation import Generation, Group
+from evolution.genome import Genome
+from evolution.phenotypecache import PhenotypeCache
+from nn.neuralnetwork import NeuralNetwork
+
+
+class PhenotypeCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.genome1 = Genome([[1, 3, 0.5, True], [2, 3, -1, True]], 2, 1)
+        self.genome2 = Genome._reproduce_equal_genomes(self.genome1, self.genome1)
+        self.genome3 = Genome([[1, 3, 0.5, True], [2, 3, 1, True]], 2, 1)
+
+    def test_phenotype_hit(self):
+        cache = PhenotypeCache()
+        self.assertIsNone(cache.get_phenotype(self.genome1))
+        cache.add_phenotype(NeuralNetwork(self.genome1))
+        phenotype = cache.get_phenotype(self.genome2)
+        self.assertIs(phenotype.get_genome(), self.genome2)
+        self.assertEqual(phenotype.forward([1, 0.5]), NeuralNetwork(self.genome2).forward([1, 0.5]))
+        self.assertIsNone(cache.get_phenotype(self.genome3))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_fitness_hit(self):
+        cache = PhenotypeCache()
+        self.assertIsNone(cache.get_fitness(self.genome2))
+        cache.add_fitness(self.genome1, 3.5)
+        self.assertEqual(cache.get_fitness(self.genome2), 3.5)
+        self.assertEqual(cache.get_statistics(),
+                         dict(size=1, hits=0, misses=0, fitness_hits=1, fitness_misses=1))
+
+    def test_fingerprint_collision(self):
+        cache = PhenotypeCache()
+        self.genome3.fingerprint = self.genome1.fingerprint
+        cache.add_phenotype(NeuralNetwork(self.genome1))
+        cache.add_fitness(self.genome1, 1.0)
+        self.assertIsNone(cache.get_phenotype(self.genome3))
+        self.assertIsNone(cache.get_fitness(self.genome3))
+        cache.add_fitness(self.genome3, 2.0)
+        self.assertEqual(cache.get_fitness(self.genome3), 2.0)
+        self.assertIsNone(cache.get_fitness(self.genome1))
+        self.assertEqual(len(cache), 1)
+
+    def test_least_recently_used_eviction(self):
+        cache = PhenotypeCache(max_size=2)
+        genome4 = Genome([[1, 3, 2, True], [2, 3, 1, True]], 2, 1)
+        cache.add_fitness(self.genome1, 1.0)
+        cache.add_fitness(self.genome3, 2.0)
+        cache.get_fitness(self.genome1)
+        cache.add_fitness(genome4, 3.0)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_fitness(self.genome1), 1.0)
+        self.assertIsNone(cache.get_fitness(self.genome3))
+
+    def test_generation_skips_evaluated_genomes(self):
+        cache = PhenotypeCache()
+        group = Group()
+        group.add_genome(self.genome1)
+        group.add_genome(self.genome2)
+        group.add_genome(self.genome3)
+        generation = Generation([group], phenotype_cache=cache)
+        generation.create_phenotypes()
+        generation.run_phenotypes2()
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.fitness_hits, 0)
+        self.assertEqual(self.genome1.fitness, self.genome2.fitness)
+
+        generation = Generation([group], phenotype_cache=cache)
+        generation.create_phenotypes()
+        generation.run_phenotypes2()
+        self.assertEqual(cache.fitness_hits, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
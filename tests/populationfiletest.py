@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from evolution.arraygenome import ArrayGenome
+from evolution.generation import Generation, Group
+from evolution.genome import Genome, ConnectionGene
+from evolution.populationfile import PopulationWriter, PopulationReader
+from tests.genomecase import GenomeTestCase
+
+
+class PopulationFileTestCase(GenomeTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'population.bin')
+
+    def test_write_and_read_generation(self):
+        groups = [Group(), Group()]
+        for i in range(6):
+            genome = Genome([[1, 3, 0.1 * i, True], [2, 3, 0.5, i % 2 == 0]], 2, 1)
+            genome.fitness = float(i)
+            groups[i % 2].add_genome(genome)
+        generation = Generation(groups)
+        with PopulationWriter(self.path) as writer:
+            writer.write_generation(generation)
+            writer.write_genome(ArrayGenome([[1, 3, 1.0, True], [2, 3, 1.0, True]], 2, 1))
+
+        with PopulationReader(self.path) as reader:
+            records = list(reader)
+            read_groups = reader.read_groups()
+        self.assertEqual(len(records), 7)
+        self.assertEqual(records[-1][0], -1)
+        self.assertEqual([len(group.genomes) for group in read_groups], [3, 3, 1])
+        for group, read_group in zip(groups, read_groups):
+            self.assertEqual(group.id, read_group.id)
+            for genome, read_genome in zip(group.genomes, read_group.genomes):
+                self.assertEqual(genome.fingerprint(), read_genome.fingerprint())
+                self.assertEqual(genome.fitness, read_genome.fitness)
+        Generation(read_groups)
+
+    def test_resume_generation(self):
+        self.addCleanup(setattr, Group, '_GROUP_ID', Group._GROUP_ID)
+        Group._GROUP_ID = 0
+        groups = [Group(), Group(), Group()]
+        for i in range(30):
+            genome = Genome([[1, 3, 0.1 * i, True], [2, 3, -0.05 * i, True]], 2, 1)
+            groups[i % 3].add_genome(genome)
+        with PopulationWriter(self.path) as writer:
+            writer.write_generation(Generation(groups))
+            writer.write_genome(Genome([[1, 3, 1.0, True], [2, 3, 1.0, True]], 2, 1))
+
+        # like in a new process, where no group was created yet
+        Group._GROUP_ID = 0
+        ConnectionGene._innovation_number = 0
+        with PopulationReader(self.path) as reader:
+            read_groups = reader.read_groups()
+        self.assertEqual([group.id for group in read_groups], [0, 1, 2, 3])
+        self.assertEqual(Group().id, 4)
+
+        # generation raises exception if new groups get IDs of read groups
+        generation = Generation(read_groups)
+        for i in range(5):
+            generation = generation.create_new_generation()
+
+    def test_read_array_genomes(self):
+        genome = Genome([[1, 3, 0.5, True], [2, 3, 0.5, False]], 2, 1)
+        with PopulationWriter(self.path) as writer:
+            writer.write_genome(genome, 4)
+        with PopulationReader(self.path, ArrayGenome) as reader:
+            (group_id, read_genome), = list(reader)
+        self.assertEqual(group_id, 4)
+        self.assertIsInstance(read_genome, ArrayGenome)
+        self.assertEqual(genome.get_connections(), read_genome.get_connections())
+
+    def test_not_population_file(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'{"input_size": 2}')
+        with self.assertRaises(Exception):
+            PopulationReader(self.path)
+
+    def test_truncated_file(self):
+        with PopulationWriter(self.path) as writer:
+            writer.write_genome(Genome([[1, 2, 0.5, True]], 1, 1))
+        with open(self.path, 'rb+') as file:
+            file.truncate(os.path.getsize(self.path) - 1)
+        with PopulationReader(self.path) as reader:
+            with self.assertRaises(Exception):
+                list(reader)
+
+
+if __name__ == '__main__':
+    unittest.main()
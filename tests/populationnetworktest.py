@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from nn.neuralnetwork import NeuralNetwork
+from nn.populationnetwork import PopulationNetwork
+from nn.sparse import LevelMatrix
+from tests.neuralnetworktest import GenomeMock
+
+
+class LevelMatrixTestCase(unittest.TestCase):
+    def test_dot_with_empty_rows(self):
+        level = LevelMatrix([3, 4, 5], [0, 2, 2, 3], [0, 1, 2], [1.0, 2.0, -1.0])
+        activations = np.array([[1.0, 0.0], [0.5, 1.0], [3.0, 2.0], [0.0, 0.0], [0.0, 0.0], [0.0, 0.0]])
+        np.testing.assert_allclose(level.dot(activations), [[2.0, 2.0], [0.0, 0.0], [-3.0, -2.0]])
+
+
+class PopulationNetworkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.genomes = [
+            GenomeMock([(2, 4, 0, True), (1, 3, -3, True), (2, 3, 4, True), (1, 4, 22, True)], 2, 2),
+            GenomeMock([(1, 5, 3, True), (2, 5, -2, True), (5, 6, -3.4, True), (6, 3, 2, True), (6, 4, 0.3, True),
+                        (1, 4, 1, False)], 2, 2),
+            GenomeMock([(1, 3, 1, True), (1, 5, 2, True), (5, 4, -1, True), (2, 6, 1, True)], 2, 2),
+        ]
+
+    def test_levels_grouped_by_depth(self):
+        population = PopulationNetwork(self.genomes)
+        self.assertEqual(len(population._levels), 3)
+        # every node except the inputs is computed exactly once
+        rows = np.concatenate([level.rows for level in population._levels])
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertEqual(len(rows) + 2, population._rows_count)
+
+    def test_forward_batch_matches_networks(self):
+        population = PopulationNetwork(self.genomes)
+        X = np.array([[0.0, 0.0], [0.0, 1.0], [1.0, 0.0], [1.0, 1.0], [-0.3, 2.5]])
+        Y = population.forward_batch(X)
+        self.assertEqual(Y.shape, (3, 5, 2))
+        for genome, y in zip(self.genomes, Y):
+            np.testing.assert_allclose(y, NeuralNetwork(genome).forward_batch(X))
+
+    def test_forward_matches_networks(self):
+        population = PopulationNetwork([NeuralNetwork(genome) for genome in self.genomes])
+        Y = population.forward([0.4, -1.2])
+        for genome, y in zip(self.genomes, Y):
+            np.testing.assert_allclose(y, NeuralNetwork(genome).forward([0.4, -1.2]))
+
+    def test_different_sizes_exception(self):
+        with self.assertRaises(Exception) as e:
+            PopulationNetwork([self.genomes[0], GenomeMock([(1, 2, 1, True)], 1, 1)])
+        self.assertEqual(str(e.exception), "All networks in population must have the same input and output sizes")
+
+
+if __name__ == '__main__':
+    unittest.main()
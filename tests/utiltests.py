@@ -45,6 +45,25 @@ class UtilTestCase(unittest.TestCase):
     def test_count_avg_weight_difference(self):
         self.assertEqual(0, count_avg_weight_difference(self.connections_a, self.connections_b))
 
+    def test_compare_connection_genes(self):
+        self.assertEqual((2, 3, 0), compare_connection_genes(self.connections_a, self.connections_b))
+        self.assertEqual((2, 3, 0), compare_connection_genes(self.connections_b, self.connections_a))
+
+    def test_compare_connection_genes_weight_difference(self):
+        connections_a = [ConnectionGene(1, 2, 0.5, True, 1), ConnectionGene(1, 3, 1.0, True, 2),
+                         ConnectionGene(2, 3, 1.0, True, 4)]
+        connections_b = [ConnectionGene(1, 2, 1.5, True, 1), ConnectionGene(2, 3, 0.0, True, 4),
+                         ConnectionGene(3, 4, 0.0, True, 5), ConnectionGene(4, 5, 0.0, True, 6)]
+        self.assertEqual((2, 1, 1.0), compare_connection_genes(connections_a, connections_b))
+        self.assertEqual(1.0, count_avg_weight_difference(connections_a, list(reversed(connections_b))))
+
+    def test_is_compatibility_distance_lower(self):
+        coefficients = dict(excess_factor=1.0, disjoint_factor=1.0, weight_difference_factor=1.0)
+        # distance is 2 excess + 3 disjoint
+        self.assertTrue(is_compatibility_distance_lower(self.connections_a, self.connections_b, coefficients, 1.0, 5.5))
+        self.assertFalse(is_compatibility_distance_lower(self.connections_a, self.connections_b, coefficients, 1.0, 5.0))
+        self.assertFalse(is_compatibility_distance_lower(self.connections_a, self.connections_b, coefficients, 1.0, 1.0))
+
 
 if __name__ == '__main__':
     firstSuite = unittest.TestLoader().loadTestsFromTestCase(UtilTestCase)